@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Reading a 2D sliced array in blocks of rows and columns.
+
+    Inspectors that show only a small part of a large slice at a time (e.g. the table inspector)
+    read only the blocks that are visible, and the blocks around them in advance. The blocks are
+    made a multiple of the chunks in which the RTI is stored, so that a chunk is not read (and
+    decompressed) for every block that it overlaps.
+"""
+from __future__ import division
+
+import logging
+
+from collections import OrderedDict
+
+from argos.utils.masks import ArrayWithMask
+
+logger = logging.getLogger(__name__)
+
+# The (minimum) number of rows and columns of a block.
+DEFAULT_BLOCK_SHAPE = (256, 32)
+
+# Blocks that are enlarged to a multiple of the chunk shape have at most this many elements.
+MAX_BLOCK_ELEMENTS = 1024 * 1024
+
+# The number of blocks that a BlockedArray keeps in memory.
+DEFAULT_MAX_BLOCKS = 64
+
+
+def blockShapeForChunks(chunkShape, targetShape=DEFAULT_BLOCK_SHAPE,
+                        maxElements=MAX_BLOCK_ELEMENTS):
+    """ Returns the block shape in which an array that is stored in chunks is read.
+
+        Each length of the target shape is rounded up to a multiple of the chunk length of its
+        dimension. The target shape is returned if the blocks would then get more than
+        maxElements elements.
+
+        :param chunkShape: the chunk length per dimension. None for the dimensions that are not
+            chunked (or if the chunks are unknown). Can be None if no dimension is chunked.
+        :param targetShape: the block shape if the array is not chunked.
+        :param maxElements: the maximum number of elements of the enlarged blocks.
+    """
+    if chunkShape is None:
+        return tuple(targetShape)
+
+    blockShape = []
+    numElements = 1
+    for target, chunk in zip(targetShape, chunkShape):
+        length = -(-target // chunk) * chunk if chunk else target
+        blockShape.append(length)
+        numElements *= length
+
+    if numElements > maxElements:
+        logger.debug("Chunks {} too large for blocks, using: {}".format(chunkShape, targetShape))
+        return tuple(targetShape)
+    return tuple(blockShape)
+
+
+
+class BlockedArray(object):
+    """ A 2D array of which the blocks are only read when they are accessed.
+
+        The most recently used blocks are kept in memory. Blocks can also be read in advance by
+        another reader that shares a cache with the read function (see blocksAround).
+    """
+    def __init__(self, shape, readBlock, blockShape=DEFAULT_BLOCK_SHAPE,
+                 maxBlocks=DEFAULT_MAX_BLOCKS):
+        """ Constructor.
+
+            :param shape: the (rows, columns) shape of the complete array.
+            :param readBlock: function that is called with a (rowSlice, colSlice) tuple and that
+                returns the ArrayWithMask of that region. The slices have an explicit start and
+                stop, and no step.
+            :param blockShape: the number of rows and columns of a block.
+            :param maxBlocks: the number of blocks that are kept in memory.
+        """
+        if len(shape) != 2:
+            raise ValueError("Shape must be 2D, got: {}".format(shape))
+
+        self._shape = tuple(shape)
+        self._readBlock = readBlock
+        self._blockShape = tuple(max(1, length) for length in blockShape)
+        self._maxBlocks = max(1, maxBlocks)
+        self._blocks = OrderedDict() # from least to most recently used
+
+
+    @classmethod
+    def fromArray(cls, awm, blockShape=DEFAULT_BLOCK_SHAPE):
+        """ Returns a BlockedArray of an ArrayWithMask that is already in memory.
+            The blocks are views on the array.
+        """
+        def readBlock(blockSlices):
+            """ Returns a region of the array """
+            return ArrayWithMask(awm.data[blockSlices], awm.maskAt(blockSlices), awm.fill_value)
+
+        return cls(awm.shape, readBlock, blockShape=blockShape)
+
+
+    @property
+    def shape(self):
+        """ The (rows, columns) shape of the complete array.
+        """
+        return self._shape
+
+
+    @property
+    def blockShape(self):
+        """ The number of rows and columns of a block. The blocks at the end can be smaller.
+        """
+        return self._blockShape
+
+
+    @property
+    def numBlocks(self):
+        """ The number of blocks per dimension.
+        """
+        return tuple(-(-length // blockLength)
+                     for length, blockLength in zip(self._shape, self._blockShape))
+
+
+    @property
+    def dtype(self):
+        """ The dtype of the array. The first block is read if no block has been read yet.
+        """
+        if self._blocks:
+            return self._blocks[next(reversed(self._blocks))].dtype
+        return self.block((0, 0)).dtype
+
+
+    def blockIndex(self, row, col):
+        """ Returns the (blockRow, blockCol) index of the block that contains the element.
+        """
+        blockRows, blockCols = self._blockShape
+        return row // blockRows, col // blockCols
+
+
+    def blockSlices(self, blockIndex):
+        """ Returns the (rowSlice, colSlice) of the elements of a block.
+        """
+        return tuple(slice(idx * blockLength, min((idx + 1) * blockLength, length))
+                     for idx, blockLength, length
+                     in zip(blockIndex, self._blockShape, self._shape))
+
+
+    def hasBlock(self, blockIndex):
+        """ Returns True if the block is kept in memory.
+        """
+        return blockIndex in self._blocks
+
+
+    def block(self, blockIndex):
+        """ Returns the ArrayWithMask of a block. Reads it if it is not kept in memory.
+        """
+        blocks = self._blocks
+        try:
+            awm = blocks.pop(blockIndex)
+        except KeyError:
+            blockSlices = self.blockSlices(blockIndex)
+            logger.debug("Reading block {}: {}".format(blockIndex, blockSlices))
+            awm = self._readBlock(blockSlices)
+            while len(blocks) >= self._maxBlocks:
+                blocks.popitem(last=False)
+        blocks[blockIndex] = awm # Most recently used
+        return awm
+
+
+    def _blockAndOffsets(self, row, col):
+        """ Returns the block that contains the element, and the row and column of the element
+            within the block.
+        """
+        blockRows, blockCols = self._blockShape
+        blockRow, blockCol = row // blockRows, col // blockCols
+        blocks = self._blocks
+        awm = blocks.get((blockRow, blockCol))
+        if awm is None or next(reversed(blocks)) != (blockRow, blockCol):
+            awm = self.block((blockRow, blockCol))
+        return awm, row - blockRow * blockRows, col - blockCol * blockCols
+
+
+    def valueAt(self, row, col):
+        """ Returns the value of an element.
+        """
+        awm, blockRow, blockCol = self._blockAndOffsets(row, col)
+        return awm.data[blockRow, blockCol]
+
+
+    def maskAt(self, row, col):
+        """ Returns the mask of an element. Can be an array for structured arrays.
+        """
+        awm, blockRow, blockCol = self._blockAndOffsets(row, col)
+        return awm.maskAt((blockRow, blockCol))
+
+
+    def blocksAround(self, rowRange, colRange, margin=1):
+        """ Returns the indices of the blocks that contain the elements of a region, and of the
+            blocks within margin blocks around them. The blocks are ordered by their distance to
+            the region, the blocks of the region itself come first.
+
+            :param rowRange: (start, stop) tuple of the rows of the region.
+            :param colRange: (start, stop) tuple of the columns of the region.
+            :param margin: the number of blocks around the region.
+        """
+        numBlockRows, numBlockCols = self.numBlocks
+        firstRow, firstCol = self.blockIndex(rowRange[0], colRange[0])
+        lastRow, lastCol = self.blockIndex(max(rowRange[0], rowRange[1] - 1),
+                                           max(colRange[0], colRange[1] - 1))
+
+        def distance(idx, first, last):
+            """ Distance in blocks of a block to the range of blocks """
+            return max(first - idx, idx - last, 0)
+
+        indices = []
+        for blockRow in range(max(0, firstRow - margin), min(numBlockRows, lastRow + margin + 1)):
+            for blockCol in range(max(0, firstCol - margin),
+                                  min(numBlockCols, lastCol + margin + 1)):
+                indices.append((blockRow, blockCol))
+
+        indices.sort(key=lambda idx: max(distance(idx[0], firstRow, lastRow),
+                                         distance(idx[1], firstCol, lastCol)))
+        return indices
@@ -18,28 +18,117 @@
 """
 from __future__ import print_function
 
-import logging, os
+import logging, os, time
 import numpy as np
 import numpy.ma as ma
 
-from argos.collect.collectortree import CollectorTree, CollectorSpinBox
+from collections import deque
+from functools import partial
+
+from argos.collect.collectortree import CollectorTree, CollectorSpinBox, CollectorRangeEditor
+from argos.collect.decimation import normalizeSlice
+from argos.collect.projection import (NO_PROJECTION, PROJECTION_FUNCTIONS,
+                                      DEFAULT_BLOCK_SIZE_MB, projectSlice)
+from argos.collect.slicecache import (SliceCache, FrameRingBuffer, DEFAULT_CACHE_SIZE_MB, MB,
+                                      invalidateSliceCaches)
+from argos.collect.sliceloader import SliceLoader
+from argos.collect.slicereader import ReadAheadWorker
+from argos.config.groupcti import MainGroupCti
+from argos.config.intcti import IntCti
 from argos.inspector.abstract import UpdateReason
 from argos.qt import Qt, QtWidgets, QtGui, QtCore, QtSignal, QtSlot
-from argos.repo.baserti import BaseRti
+from argos.repo.baserti import BaseRti, RTI_READ_LOCK, addCloseHook
 from argos.utils.cls import check_class, check_is_a_sequence, check_is_an_array, is_an_array
 from argos.utils.masks import ArrayWithMask
 from argos.widgets.constants import TOP_DOCK_HEIGHT, DOCK_SPACING, DOCK_MARGIN
+from argos.widgets.redraw import DEFAULT_FRAME_TIME
 
 logger = logging.getLogger(__name__)
 
 FAKE_DIM_NAME = '-'     # The name of the fake dimension with length 1
 FAKE_DIM_OFFSET = 1000  # Fake dimensions start here (so all arrays must have a smaller ndim)
 
+DEFAULT_PLAYBACK_FPS = 10          # Frames per second when playing a dimension
+DEFAULT_PLAYBACK_BUFFER_SIZE = 32  # Number of frames that are read ahead when playing
+DEFAULT_PACK_MASK_SIZE_MB = 256    # Masks of at least this size are stored with one bit per element
+
+# The cached slices of an RTI are removed when it is closed, so that a closed or reloaded file
+# never serves stale data.
+addCloseHook(invalidateSliceCaches)
+
 
 # Qt classes have many ancestors
 #pylint: disable=R0901
 
 
+class CollectorCti(MainGroupCti):
+    """ Configuration tree item for the collector settings.
+    """
+    def __init__(self, collector, nodeName='data collector'):
+        """ Constructor
+
+            Maintains a link to the target collector, so that changes in the configuration can be
+            applied to the target by simply calling the apply method.
+        """
+        super(CollectorCti, self).__init__(nodeName)
+
+        check_class(collector, Collector)
+        self.collector = collector
+
+        self.cacheSizeCti = self.insertChild(
+            IntCti("cache size", DEFAULT_CACHE_SIZE_MB, minValue=0, maxValue=64 * 1024,
+                   stepSize=64, suffix=" MB", specialValueText="disabled"))
+
+        # Number of slices that are read in the background in the direction the user is scrolling.
+        self.readAheadCti = self.insertChild(
+            IntCti("read-ahead", 2, minValue=0, maxValue=100, stepSize=1,
+                   suffix=" slices", specialValueText="disabled"))
+
+        # Minimum time between two redraws of the inspector, so that quick successive changes
+        # (e.g. auto-repeat of a spin box) don't each cause a complete read and render.
+        self.frameTimeCti = self.insertChild(
+            IntCti("frame time", DEFAULT_FRAME_TIME, minValue=0, maxValue=2000, stepSize=10,
+                   suffix=" ms", specialValueText="no limit"))
+
+        # Playing a dimension as an animation. The frames are read ahead in a ring buffer.
+        self.playbackFpsCti = self.insertChild(
+            IntCti("playback speed", DEFAULT_PLAYBACK_FPS, minValue=1, maxValue=100, stepSize=1,
+                   suffix=" fps"))
+
+        self.playbackBufferCti = self.insertChild(
+            IntCti("playback buffer", DEFAULT_PLAYBACK_BUFFER_SIZE, minValue=1, maxValue=1024,
+                   stepSize=8, suffix=" frames"))
+
+        # Projected dimensions are read in blocks of at most this size.
+        self.projectionBlockSizeCti = self.insertChild(
+            IntCti("projection block size", DEFAULT_BLOCK_SIZE_MB, minValue=1, maxValue=4 * 1024,
+                   stepSize=16, suffix=" MB"))
+
+        # Large masks are bit-packed, which makes them 8 times smaller (see PackedMask).
+        self.packMaskSizeCti = self.insertChild(
+            IntCti("compact masks from", DEFAULT_PACK_MASK_SIZE_MB, minValue=0,
+                   maxValue=64 * 1024, stepSize=64, suffix=" MB", specialValueText="never"))
+
+        # Polls the shape of the RTI, so that data that is appended (e.g. by a process that writes
+        # an HDF-5 file in SWMR mode) is shown.
+        self.followIntervalCti = self.insertChild(
+            IntCti("follow appended data", 0, minValue=0, maxValue=60 * 1000, stepSize=100,
+                   suffix=" ms", specialValueText="off"))
+
+
+    def _updateTargetFromNode(self):
+        """ Applies the configuration to the collector.
+        """
+        self.collector.sliceCache.maxBytes = self.cacheSizeCti.configValue * MB
+        self.collector.readAheadDepth = self.readAheadCti.configValue
+        self.collector.frameTime = self.frameTimeCti.configValue
+        self.collector.projectionBlockBytes = self.projectionBlockSizeCti.configValue * MB
+        self.collector.packMaskBytes = self.packMaskSizeCti.configValue * MB
+        self.collector.setPlaybackSettings(self.playbackFpsCti.configValue,
+                                           self.playbackBufferCti.configValue)
+        self.collector.setFollowInterval(self.followIntervalCti.configValue)
+
+
 
 class Collector(QtWidgets.QWidget):
     """ Widget for collecting the selected data.
@@ -50,6 +139,16 @@ class Collector(QtWidgets.QWidget):
     """
     sigContentsChanged = QtSignal(str) # one of the UpdateReason values.
 
+    # Emitted when the slice that was requested with requestSlicedArray is available.
+    # The parameter is the ArrayWithMask, or None if the RTI is not sliceable or the read failed.
+    sigSliceLoaded = QtSignal(object)
+
+    # Emitted with True when a slice is being loaded in the background, and with False when done.
+    sigBusyChanged = QtSignal(bool)
+
+    # Emitted with the fraction (between 0 and 1) of a projection that has been read.
+    sigLoadProgress = QtSignal(float)
+
     def __init__(self, windowNumber):
         """ Constructor
         """
@@ -65,7 +164,42 @@ class Collector(QtWidgets.QWidget):
         self._axisNames = []         # Axis names. Correspond to the independent variables
         self._fullAxisNames = []       # Will be set in clearAndSetComboBoxes
         self._comboBoxes = []        # Will be set in clearAndSetComboBoxes
+        self._rangeEditors = []      # Sub range per combo box. Will be set in _createComboBoxes
         self._spinBoxes = []         # Will be set in createSpinBoxes
+        self._playButtons = []       # Play button per spin box. See createSpinBoxes
+        self._projectionComboBoxes = []  # Projection function per spin box. See createSpinBoxes
+        self._projectionRangeEditors = [] # Projected range per spin box. See createSpinBoxes
+
+        # Recently read slices, so that going back to a previous index requires no I/O.
+        self._sliceCache = SliceCache()
+        self._readAheadWorker = ReadAheadWorker(self._sliceCache)
+        self.readAheadDepth = 2 # Number of slices that are read ahead when a spin box changes.
+        self.frameTime = DEFAULT_FRAME_TIME # Minimum time in ms between redraws of the inspector
+        self.projectionBlockBytes = DEFAULT_BLOCK_SIZE_MB * MB # Block size of projection reads
+        self.packMaskBytes = DEFAULT_PACK_MASK_SIZE_MB * MB # Masks of this size are bit-packed
+        self._config = CollectorCti(collector=self)
+
+        # Reads the slices that are requested with requestSlicedArray in worker threads.
+        self._sliceLoader = SliceLoader(self._sliceCache, parent=self)
+        self._sliceLoader.sigSliceLoaded.connect(self._sliceLoaded)
+        self._sliceLoader.sigBusyChanged.connect(self.sigBusyChanged)
+        self._sliceLoader.sigProgress.connect(self.sigLoadProgress)
+        self._loadedSlice = None # (cacheKey, ArrayWithMask, cache generation) of the last load
+        self._lastComboSlices = None # The comboSlices of the last request, used for read-ahead
+
+        # Playback of a spin box dimension. The frames are read ahead into a ring buffer by a
+        # separate worker, the timer steps the spin box to the next frame if it is ready.
+        self._frameBuffer = FrameRingBuffer(DEFAULT_PLAYBACK_BUFFER_SIZE)
+        self._frameReader = ReadAheadWorker(self._frameBuffer)
+        self._playingSpinBox = None
+        self._shownFrameTimes = deque() # Times at which frames were shown in the last second
+        self._playbackTimer = QtCore.QTimer(self)
+        self._playbackTimer.setInterval(1000 // DEFAULT_PLAYBACK_FPS)
+        self._playbackTimer.timeout.connect(self._playbackTick)
+
+        # Polls the shape of the RTI when following data that is appended. Off by default.
+        self._followTimer = QtCore.QTimer(self)
+        self._followTimer.timeout.connect(self._followTick)
 
         self.layout = QtWidgets.QHBoxLayout(self)
         self.layout.setSpacing(DOCK_SPACING)
@@ -77,6 +211,11 @@ class Collector(QtWidgets.QWidget):
         self.tree = CollectorTree(self)
         self.layout.addWidget(self.tree)
 
+        # Shows the achieved frame rate and buffer fill level while playing.
+        self.playbackLabel = QtWidgets.QLabel()
+        self.playbackLabel.setVisible(False)
+        self.layout.addWidget(self.playbackLabel)
+
         # Add buttons (not yet implemented)
         # self.addVisItemButton = QtWidgets.QPushButton("Add")
         # self.addVisItemButton.setEnabled(False) # not yet implemented
@@ -90,6 +229,24 @@ class Collector(QtWidgets.QWidget):
         self._updateRtiInfo()
 
 
+    def finalize(self):
+        """ Is called before destruction. Stops the background reading.
+        """
+        logger.debug("Finalizing: {}".format(self))
+        self.stopPlayback()
+        self._playbackTimer.timeout.disconnect(self._playbackTick)
+        self._followTimer.stop()
+        self._followTimer.timeout.disconnect(self._followTick)
+        self._frameReader.stop()
+        self._sliceLoader.sigSliceLoaded.disconnect(self._sliceLoaded)
+        self._sliceLoader.sigBusyChanged.disconnect(self.sigBusyChanged)
+        self._sliceLoader.sigProgress.disconnect(self.sigLoadProgress)
+        self._sliceLoader.stop()
+        self._readAheadWorker.stop()
+        self._loadedSlice = None
+        self._sliceCache.clear()
+
+
     def sizeHint(self):
         """ The recommended size for the widget."""
         return QtCore.QSize(300, TOP_DOCK_HEIGHT)
@@ -100,6 +257,20 @@ class Collector(QtWidgets.QWidget):
         """
         return self._windowNumber
 
+    @property
+    def config(self):
+        """ The root config tree item for the collector settings.
+        """
+        return self._config
+
+
+    @property
+    def sliceCache(self):
+        """ The SliceCache with the recently read slices of this collector.
+        """
+        return self._sliceCache
+
+
     @property
     def rti(self):
         """ The current repository tree item. Can be None.
@@ -149,8 +320,16 @@ class Collector(QtWidgets.QWidget):
         logger.debug("Blocking collector signals")
         for spinBox in self._spinBoxes:
             spinBox.blockSignals(block)
+        for playButton in self._playButtons:
+            playButton.blockSignals(block)
         for comboBox in self._comboBoxes:
             comboBox.blockSignals(block)
+        for rangeEditor in self._rangeEditors:
+            rangeEditor.blockSignals(block)
+        for comboBox in self._projectionComboBoxes:
+            comboBox.blockSignals(block)
+        for rangeEditor in self._projectionRangeEditors:
+            rangeEditor.blockSignals(block)
         result = self._signalsBlocked
         self._signalsBlocked = block
         return result
@@ -226,6 +405,10 @@ class Collector(QtWidgets.QWidget):
         check_class(rti, BaseRti)
         #assert rti.isSliceable, "RTI must be sliceable" # TODO: maybe later
 
+        self.stopPlayback()
+        self._readAheadWorker.cancel()
+        self._loadedSlice = None
+        self._lastComboSlices = None
         self._rti = rti
         self._updateWidgets()
         self._updateRtiInfo()
@@ -260,7 +443,8 @@ class Collector(QtWidgets.QWidget):
 
 
     def _createComboBoxes(self, row):
-        """ Creates a combo box for each of the fullAxisNames
+        """ Creates a combo box for each of the fullAxisNames. Next to each combo box is a range
+            editor for selecting the sub range of the dimension that is read.
         """
         tree = self.tree
         model = self.tree.model()
@@ -273,8 +457,18 @@ class Collector(QtWidgets.QWidget):
             comboBox.activated.connect(self._comboBoxActivated)
             self._comboBoxes.append(comboBox)
 
+            rangeEditor = CollectorRangeEditor()
+            rangeEditor.sigRangeChanged.connect(self._rangeEditorChanged)
+            self._rangeEditors.append(rangeEditor)
+
             #editor = LabeledWidget(QtWidgets.QLabel(comboLabel), comboBox)
-            tree.setIndexWidget(model.index(row, col), comboBox)
+            cellWidget = QtWidgets.QWidget()
+            cellLayout = QtWidgets.QHBoxLayout(cellWidget)
+            cellLayout.setContentsMargins(0, 0, 0, 0)
+            cellLayout.setSpacing(DOCK_SPACING)
+            cellLayout.addWidget(comboBox)
+            cellLayout.addWidget(rangeEditor)
+            tree.setIndexWidget(model.index(row, col), cellWidget)
 
 
     def _deleteComboBoxes(self, row):
@@ -288,6 +482,7 @@ class Collector(QtWidgets.QWidget):
             tree.setIndexWidget(model.index(row, col), None)
 
         self._comboBoxes = []
+        self._rangeEditors = []
 
 
     # TODO: why again don't we create the comboxes when a new RTI is selected (just like the spins)?
@@ -303,6 +498,7 @@ class Collector(QtWidgets.QWidget):
             for comboBoxNr, comboBox in enumerate(self._comboBoxes):
                 comboBox.addItem('', userData=None)
                 comboBox.setEnabled(False)
+            self._resetRangeEditors()
             return
 
         nDims = self._rti.nDims
@@ -335,6 +531,8 @@ class Collector(QtWidgets.QWidget):
             comboBox.setEnabled(True)
             #comboBox.adjustSize() # necessary?
 
+        self._resetRangeEditors()
+
 
     # def getComboBoxDimensionName(self, comboBoxNr):
     #     """ Returns the currently selected dimension index of combo box nr comboBoxNr
@@ -365,6 +563,10 @@ class Collector(QtWidgets.QWidget):
 
     def _createSpinBoxes(self, row):
         """ Creates a spinBox for each dimension that is not selected in a combo box.
+
+            Next to each spin box is a combo box with which the dimension can be projected (e.g.
+            the maximum over the dimension is shown instead of the value at the spin box index),
+            and a range editor with the range over which is projected.
         """
         assert len(self._spinBoxes) == 0, "Spinbox list not empty. Call _deleteSpinBoxes first"
 
@@ -399,12 +601,44 @@ class Collector(QtWidgets.QWidget):
             spinBox.setPrefix("{}: ".format(self._rti.dimensionNames[dimNr]))
             spinBox.setSuffix("/{}".format(spinBox.maximum()))
             spinBox.setProperty("dim_nr", dimNr)
+            spinBox.setProperty("prev_value", spinBox.value())
             #spinBox.adjustSize() # necessary?
 
             # This must be done after setValue to prevent emitting too many signals
             spinBox.valueChanged[int].connect(self._spinboxValueChanged)
 
-            tree.setIndexWidget(model.index(row, col), spinBox)
+            playButton = QtWidgets.QToolButton()
+            playButton.setCheckable(True)
+            playButton.setAutoRaise(True)
+            playButton.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_MediaPlay))
+            playButton.setToolTip("Play the {} dimension".format(self._rti.dimensionNames[dimNr]))
+            playButton.toggled.connect(self._playButtonToggled)
+            self._playButtons.append(playButton)
+
+            projectionComboBox = QtWidgets.QComboBox()
+            projectionComboBox.addItems([NO_PROJECTION] + list(PROJECTION_FUNCTIONS))
+            projectionComboBox.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToContents)
+            projectionComboBox.setToolTip("Show the value at the index, or a projection over "
+                                          "the range of the dimension")
+            projectionComboBox.activated.connect(self._projectionChanged)
+            self._projectionComboBoxes.append(projectionComboBox)
+
+            projectionRangeEditor = CollectorRangeEditor()
+            projectionRangeEditor.setDimensionLength(dimSize)
+            projectionRangeEditor.setVisible(False)
+            projectionRangeEditor.sigRangeChanged.connect(self._projectionChanged)
+            self._projectionRangeEditors.append(projectionRangeEditor)
+
+            cellWidget = QtWidgets.QWidget()
+            cellLayout = QtWidgets.QHBoxLayout(cellWidget)
+            cellLayout.setContentsMargins(0, 0, 0, 0)
+            cellLayout.setSpacing(DOCK_SPACING)
+            cellLayout.addWidget(spinBox)
+            cellLayout.addWidget(playButton)
+            cellLayout.addWidget(projectionComboBox)
+            cellLayout.addWidget(projectionRangeEditor)
+
+            tree.setIndexWidget(model.index(row, col), cellWidget)
             col += 1
 
         # Resize the spinbox columns to their new contents
@@ -417,10 +651,21 @@ class Collector(QtWidgets.QWidget):
         tree = self.tree
         model = self.tree.model()
 
+        self.stopPlayback()
+        for playButton in self._playButtons:
+            playButton.toggled.disconnect(self._playButtonToggled)
+        self._playButtons = []
+
         for col, spinBox in enumerate(self._spinBoxes, self.COL_FIRST_COMBO + self.maxCombos):
             spinBox.valueChanged[int].disconnect(self._spinboxValueChanged)
             tree.setIndexWidget(model.index(row, col), None)
+        for comboBox in self._projectionComboBoxes:
+            comboBox.activated.disconnect(self._projectionChanged)
+        for rangeEditor in self._projectionRangeEditors:
+            rangeEditor.sigRangeChanged.disconnect(self._projectionChanged)
         self._spinBoxes = []
+        self._projectionComboBoxes = []
+        self._projectionRangeEditors = []
 
         self._setColumnCountForContents()
 
@@ -437,6 +682,7 @@ class Collector(QtWidgets.QWidget):
         assert comboBox, "comboBox not defined and not the sender"
 
         blocked = self.blockChildrenSignals(True)
+        self._lastComboSlices = None # Refer to the previously selected dimensions
 
         # If one of the other combo boxes has the same value, set it to the fake dimension
         curDimIdx = self._comboBoxDimensionIndex(comboBox)
@@ -452,6 +698,7 @@ class Collector(QtWidgets.QWidget):
         row = 0
         self._deleteSpinBoxes(row)
         self._createSpinBoxes(row)
+        self._resetRangeEditors()
         self._updateRtiInfo()
 
         self.blockChildrenSignals(blocked)
@@ -461,6 +708,75 @@ class Collector(QtWidgets.QWidget):
         self.sigContentsChanged.emit(UpdateReason.COLLECTOR_COMBO_BOX)
 
 
+    def _resetRangeEditors(self):
+        """ Sets the range editors to the complete dimensions that are selected in the combo boxes.
+        """
+        shape = self.getSlicedArrayShape()
+        for comboBoxNr, rangeEditor in enumerate(self._rangeEditors):
+            dimNr = self._comboBoxDimensionIndex(self._comboBoxes[comboBoxNr])
+            if shape is None or dimNr is None or dimNr >= FAKE_DIM_OFFSET:
+                rangeEditor.setDimensionLength(0) # Fake dimensions can't be sliced
+            else:
+                rangeEditor.setDimensionLength(shape[comboBoxNr])
+
+
+    @QtSlot()
+    def _rangeEditorChanged(self):
+        """ Is called when the user has changed the sub range of one of the combo box dimensions.
+        """
+        self._readAheadWorker.cancel()
+        self._lastComboSlices = None
+        self._updateRtiInfo()
+
+        logger.debug("{} sigContentsChanged signal (range)"
+                      .format("Blocked" if self.signalsBlocked() else "Emitting"))
+        self.sigContentsChanged.emit(UpdateReason.COLLECTOR_RANGE)
+
+
+    def getComboRanges(self):
+        """ Returns a list with, per combo box, the sub range that is selected in the collector.
+            The ranges are slices with explicit start, stop and step in the coordinates of the
+            complete dimension. Fake dimensions yield slice(0, 1, 1).
+
+            Inspectors that read a region of the slice themselves (using comboSlices) should keep
+            within these ranges. Returns None if the RTI is not sliceable.
+        """
+        shape = self.getSlicedArrayShape()
+        if shape is None:
+            return None
+        return [normalizeSlice(rangeEditor.getSlice(), length)
+                for rangeEditor, length in zip(self._rangeEditors, shape)]
+
+
+    def setComboRanges(self, comboRanges):
+        """ Sets the sub ranges of the combo box dimensions. E.g. called by an inspector after the
+            user has zoomed in so that only the visible region is read from then on.
+
+            Emits sigContentsChanged with the COLLECTOR_RANGE reason if a range has changed.
+            Returns True in that case, False otherwise.
+
+            :param comboRanges: list with a slice per combo box. Slices of combo boxes that select
+                the fake dimension are ignored. Use None to select the complete dimensions.
+        """
+        if not self.rtiIsSliceable:
+            return False
+
+        if comboRanges is None:
+            comboRanges = [slice(None)] * len(self._rangeEditors)
+
+        assert len(comboRanges) == len(self._rangeEditors), \
+            "Expected {} combo ranges, got: {}".format(len(self._rangeEditors), len(comboRanges))
+
+        changed = False
+        for rangeEditor, comboRange in zip(self._rangeEditors, comboRanges):
+            if rangeEditor.length > 1:
+                changed = rangeEditor.setSlice(comboRange) or changed
+
+        if changed:
+            self._rangeEditorChanged()
+        return changed
+
+
     @QtSlot(int)
     def _spinboxValueChanged(self, index, spinBox=None):
         """ Is called when a spin box value was changed.
@@ -472,19 +788,561 @@ class Collector(QtWidgets.QWidget):
             spinBox = self.sender()
         assert spinBox, "spinBox not defined and not the sender"
 
+        # Read the next slices in the direction the user is moving while this one is drawn.
+        # During playback the frames are read ahead by the frame reader.
+        prevValue = spinBox.property("prev_value")
+        spinBox.setProperty("prev_value", index)
+        direction = -1 if prevValue is not None and index < prevValue else 1
+        if self._playingSpinBox is None:
+            self._scheduleReadAhead(spinBox, direction)
+
         logger.debug("{} sigContentsChanged signal (spinBox)"
                       .format("Blocked" if self.signalsBlocked() else "Emitting"))
         self.sigContentsChanged.emit(UpdateReason.COLLECTOR_SPIN_BOX)
 
 
-    def getSlicedArray(self, copy=True):
+    def _projectionChanged(self, *_args):
+        """ Is called when the projection function or range of a spin box dimension has changed.
+
+            The spin box is disabled while its dimension is projected.
+        """
+        for spinBox, playButton, comboBox, rangeEditor in zip(
+                self._spinBoxes, self._playButtons, self._projectionComboBoxes,
+                self._projectionRangeEditors):
+            isProjected = comboBox.currentText() != NO_PROJECTION
+            if isProjected and spinBox is self._playingSpinBox:
+                self.stopPlayback()
+            spinBox.setEnabled(not isProjected)
+            playButton.setEnabled(not isProjected)
+            rangeEditor.setVisible(isProjected)
+
+        self._readAheadWorker.cancel()
+        self._updateRtiInfo()
+        self.tree.resizeColumnsToContents(startCol=self.COL_FIRST_COMBO + self.maxCombos)
+
+        logger.debug("{} sigContentsChanged signal (projection)"
+                      .format("Blocked" if self.signalsBlocked() else "Emitting"))
+        self.sigContentsChanged.emit(UpdateReason.COLLECTOR_SPIN_BOX)
+
+
+    @property
+    def hasProjections(self):
+        """ True if one or more of the spin box dimensions are projected.
+        """
+        return bool(self._projections())
+
+
+    def _projections(self):
+        """ Returns a list of (dimNr, function) tuples of the dimensions that are projected.
+        """
+        projections = []
+        for spinBox, comboBox in zip(self._spinBoxes, self._projectionComboBoxes):
+            function = comboBox.currentText()
+            if function != NO_PROJECTION:
+                projections.append((spinBox.property("dim_nr"), function))
+        return projections
+
+
+    def _sliceListAndPermutations(self, comboSlices=None):
+        """ Returns the list of slices made from the values of the spin boxes, and the permutations
+            that put the dimensions in the order of the combo boxes.
+
+            :param comboSlices: optional list with a slice per combo box. See getSlicedArray.
+                If None, the sub ranges of the range editors are used.
+        """
+        # The dimensions that are selected in the combo boxes will be set to their range,
+        # the values from the spin boxes will be set as a single integer value
+        nDims = self.rti.nDims
+        sliceList = [slice(None)] * nDims
+
+        for spinBox, comboBox, rangeEditor in zip(self._spinBoxes, self._projectionComboBoxes,
+                                                  self._projectionRangeEditors):
+            dimNr = spinBox.property("dim_nr")
+            if comboBox.currentText() == NO_PROJECTION:
+                sliceList[dimNr] = spinBox.value()
+            else:
+                sliceList[dimNr] = rangeEditor.getSlice() # Range that is projected
+
+        # The order in which the dimensions are shuffled as specified by the combo boxes
+        comboDims = [self._comboBoxDimensionIndex(cb) for cb in self._comboBoxes]
+        permutations = np.argsort(comboDims)
+
+        if comboSlices is None:
+            comboSlices = [rangeEditor.getSlice() for rangeEditor in self._rangeEditors]
+
+        assert len(comboSlices) == len(comboDims), \
+            "Expected {} combo slices, got: {}".format(len(comboDims), len(comboSlices))
+        for dimNr, comboSlice in zip(comboDims, comboSlices):
+            if dimNr < FAKE_DIM_OFFSET: # Fake dimensions have length 1 and are not sliced.
+                sliceList[dimNr] = comboSlice
+
+        return sliceList, permutations
+
+
+    def getSlicedArrayShape(self):
+        """ Returns the shape that the sliced array has when the complete combo box dimensions are
+            read (i.e. without comboSlices). Returns None if the RTI is not sliceable.
+        """
+        if not self.rtiIsSliceable:
+            return None
+
+        arrayShape = self.rti.arrayShape
+        shape = []
+        for comboBox in self._comboBoxes:
+            dimNr = self._comboBoxDimensionIndex(comboBox)
+            shape.append(1 if dimNr >= FAKE_DIM_OFFSET else arrayShape[dimNr])
+        return tuple(shape)
+
+
+    def getSlicedArrayChunkShape(self):
+        """ Returns, per combo box, the chunk length of its dimension in the RTI (see
+            BaseRti.chunkShape). The length is None if the dimension is not chunked (or if this is
+            unknown). Returns None if the RTI is not sliceable.
+        """
+        if not self.rtiIsSliceable:
+            return None
+
+        chunkShape = self.rti.chunkShape
+        result = []
+        for comboBox in self._comboBoxes:
+            dimNr = self._comboBoxDimensionIndex(comboBox)
+            if chunkShape is None or dimNr is None or dimNr >= FAKE_DIM_OFFSET:
+                result.append(None)
+            else:
+                result.append(chunkShape[dimNr])
+        return tuple(result)
+
+
+    def createReadJob(self, comboSlices=None):
+        """ Returns a (cacheKey, readFunction) job that reads a region of the current slice.
+
+            The read function does not use the collector widgets, so the job can be executed
+            in a worker thread, e.g. by a ReadAheadWorker that stores the result in the slice
+            cache. Afterwards readSlice returns the region without reading it again.
+            The read function must be called while holding the RTI_READ_LOCK.
+
+            :param comboSlices: list with a slice per combo box. See getSlicedArray.
+        """
+        sliceList, permutations, projections, cacheKey = \
+            self._currentCacheKey(comboSlices=comboSlices)
+        return cacheKey, partial(self._readSlice, self.rti, sliceList, permutations,
+                                 self.maxCombos, projections=projections,
+                                 blockBytes=self.projectionBlockBytes,
+                                 packMaskBytes=self.packMaskBytes)
+
+
+    def _scheduleReadAhead(self, spinBox, direction):
+        """ Schedules background reads of the next readAheadDepth slices along the dimension of
+            the spin box. The slices are stored in the slice cache.
+
+            :param spinBox: the spin box that has changed
+            :param direction: 1 if the user is moving forward, -1 if moving backward.
+        """
+        if (self.readAheadDepth <= 0 or self._sliceCache.maxBytes <= 0 or
+                not self.rtiIsSliceable or self._projections()):
+            # Projections read large parts of the RTI, so they are not read ahead.
+            self._readAheadWorker.cancel()
+            return
+
+        indices = []
+        for step in range(1, self.readAheadDepth + 1):
+            idx = spinBox.value() + direction * step
+            if not (spinBox.minimum() <= idx <= spinBox.maximum()):
+                break
+            indices.append(idx)
+
+        self._readAheadWorker.schedule(self._readJobs(spinBox, indices))
+
+
+    def _readJobs(self, spinBox, indices):
+        """ Returns a list of (cacheKey, readFunction) jobs for the ReadAheadWorker, which read
+            the slices at the indices of the spin box dimension. The other dimensions are sliced
+            as in the last request.
+        """
+        rti = self.rti
+        dimNr = spinBox.property("dim_nr")
+        comboSlices = self._lastComboSlices
+        if comboSlices is not None and len(comboSlices) != len(self._comboBoxes):
+            comboSlices = None
+        sliceList, permutations = self._sliceListAndPermutations(comboSlices=comboSlices)
+        projections = self._projections()
+
+        jobs = []
+        for idx in indices:
+            aheadSliceList = list(sliceList)
+            aheadSliceList[dimNr] = idx
+            key = SliceCache.createKey(rti.fileName, rti.nodePath, aheadSliceList, permutations,
+                                       projections=projections)
+            jobs.append((key, partial(self._readSlice, rti, aheadSliceList, permutations,
+                                      self.maxCombos, projections=projections,
+                                      blockBytes=self.projectionBlockBytes,
+                                      packMaskBytes=self.packMaskBytes)))
+        return jobs
+
+
+    @property
+    def isPlaying(self):
+        """ True if one of the spin box dimensions is being played.
+        """
+        return self._playingSpinBox is not None
+
+
+    def setPlaybackSettings(self, fps, bufferSize):
+        """ Sets the playback speed in frames per second and the size of the frame ring buffer.
+        """
+        self._playbackTimer.setInterval(max(1, int(round(1000 / fps))))
+        if bufferSize != self._frameBuffer.capacity:
+            self._frameBuffer.capacity = bufferSize
+            if self._playingSpinBox is not None:
+                self._scheduleFrameReads()
+
+
+    def startPlayback(self, spinBox):
+        """ Starts stepping through the dimension of the spin box. Stops the current playback.
+        """
+        self.stopPlayback()
+        if not self.rtiIsSliceable:
+            return
+
+        logger.debug("Starting playback of dimension: {}".format(spinBox.property("dim_nr")))
+        self._playingSpinBox = spinBox
+        self._readAheadWorker.cancel()
+        self._frameBuffer.clear()
+        self._shownFrameTimes.clear()
+
+        playButton = self._playButtons[self._spinBoxes.index(spinBox)]
+        playButton.blockSignals(True)
+        playButton.setChecked(True)
+        playButton.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_MediaStop))
+        playButton.blockSignals(False)
+
+        self._scheduleFrameReads()
+        self._updatePlaybackLabel()
+        self.playbackLabel.setVisible(True)
+        self._playbackTimer.start()
+
+
+    def stopPlayback(self):
+        """ Stops the playback (if any).
+        """
+        if self._playingSpinBox is None:
+            return
+
+        logger.debug("Stopping playback")
+        self._playbackTimer.stop()
+        self._frameReader.cancel()
+        self._frameBuffer.clear()
+
+        for playButton in self._playButtons:
+            playButton.blockSignals(True)
+            playButton.setChecked(False)
+            playButton.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_MediaPlay))
+            playButton.blockSignals(False)
+
+        self._playingSpinBox = None
+        self.playbackLabel.setVisible(False)
+
+
+    @QtSlot(bool)
+    def _playButtonToggled(self, checked):
+        """ Starts or stops playing the dimension of the spin box next to the button.
+        """
+        if checked:
+            self.startPlayback(self._spinBoxes[self._playButtons.index(self.sender())])
+        else:
+            self.stopPlayback()
+
+
+    def _nextFrameIndices(self, numFrames):
+        """ Returns the next numFrames indices of the dimension that is played. Wraps around at
+            the end of the dimension.
+        """
+        spinBox = self._playingSpinBox
+        minIndex = spinBox.minimum()
+        length = spinBox.maximum() - minIndex + 1
+        offset = spinBox.value() - minIndex
+        return [minIndex + (offset + step) % length
+                for step in range(1, min(numFrames, length - 1) + 1)]
+
+
+    def _scheduleFrameReads(self):
+        """ Lets the frame reader fill the ring buffer with the frames that will be shown next.
+        """
+        indices = self._nextFrameIndices(self._frameBuffer.capacity)
+        self._frameReader.schedule(self._readJobs(self._playingSpinBox, indices))
+
+
+    @QtSlot()
+    def _playbackTick(self):
+        """ Shows the next frame if it has been read. Otherwise the tick is skipped, so that the
+            GUI never waits for the storage.
+        """
+        spinBox = self._playingSpinBox
+        if spinBox is None or not self.rtiIsSliceable:
+            self.stopPlayback()
+            return
+
+        nextIndices = self._nextFrameIndices(1)
+        if not nextIndices:
+            return # A dimension of length 1 can't be played.
+
+        key, _readFunction = self._readJobs(spinBox, nextIndices)[0]
+        awm = self._frameBuffer.take(key)
+        if awm is not None:
+            # The inspector will get the slice from the _loadedSlice without reading the RTI.
+            self._loadedSlice = (key, awm, self._sliceCache.generation())
+            spinBox.setValue(nextIndices[0])
+            self._shownFrameTimes.append(time.time())
+            self._scheduleFrameReads()
+
+        self._updatePlaybackLabel()
+
+
+    def _updatePlaybackLabel(self):
+        """ Shows the achieved frames per second and the fill level of the ring buffer.
+        """
+        # The number of frames that were shown in the last second.
+        oneSecondAgo = time.time() - 1.0
+        while self._shownFrameTimes and self._shownFrameTimes[0] < oneSecondAgo:
+            self._shownFrameTimes.popleft()
+
+        self.playbackLabel.setText("{:d} fps\nbuffer {:d}/{:d}".format(
+            len(self._shownFrameTimes), len(self._frameBuffer), self._frameBuffer.capacity))
+
+
+    def setFollowInterval(self, interval):
+        """ Sets the interval in ms with which the shape of the RTI is polled to follow the data
+            that is appended to it. Use 0 to stop following.
+        """
+        if interval > 0:
+            self._followTimer.setInterval(interval)
+            self._followTimer.start()
+        else:
+            self._followTimer.stop()
+
+
+    @QtSlot()
+    def _followTick(self):
+        """ Polls the shape of the RTI. If elements have been appended, the spin boxes and range
+            editors are extended and sigContentsChanged is emitted with the DATA_APPENDED reason.
+            The inspectors can then read only the appended elements with getAppendedArray.
+
+            Spin boxes that are at the last index move to the new last index.
+        """
+        if not self.rtiIsSliceable:
+            return
+
+        oldShape = self.rti.arrayShape
+        try:
+            with RTI_READ_LOCK:
+                changed = self.rti.refreshShape()
+        except Exception as ex:
+            # This is a slot and thus must not throw exceptions.
+            logger.warning("Unable to refresh the shape of {}: {}".format(self.rti.nodePath, ex))
+            return
+
+        if not changed:
+            return
+
+        newShape = self.rti.arrayShape
+        logger.debug("Shape of {} has changed: {} -> {}"
+                     .format(self.rti.nodePath, oldShape, newShape))
+
+        # Slices of the complete dimensions that were read before are incomplete now.
+        self._readAheadWorker.cancel()
+        invalidateSliceCaches(self.rti.fileName, self.rti.nodePath)
+        self._loadedSlice = None
+
+        if len(newShape) != len(oldShape) or any(new < old for new, old in zip(newShape, oldShape)):
+            self._updateWidgets() # Only appending is followed, start anew otherwise.
+            return
+
+        reason = UpdateReason.DATA_APPENDED
+        for comboBoxNr, rangeEditor in enumerate(self._rangeEditors):
+            dimNr = self._comboBoxDimensionIndex(self._comboBoxes[comboBoxNr])
+            if dimNr is not None and dimNr < FAKE_DIM_OFFSET:
+                self._extendRange(rangeEditor, newShape[dimNr])
+
+        spinBoxesAtEnd = []
+        for spinBox, comboBox, rangeEditor in zip(self._spinBoxes, self._projectionComboBoxes,
+                                                  self._projectionRangeEditors):
+            dimSize = newShape[spinBox.property("dim_nr")]
+            if spinBox.value() == spinBox.maximum():
+                spinBoxesAtEnd.append((spinBox, dimSize - 1))
+            spinBox.blockSignals(True)
+            spinBox.setMaximum(dimSize - 1)
+            spinBox.setSuffix("/{}".format(spinBox.maximum()))
+            spinBox.blockSignals(False)
+
+            # The projection of an extended range has to be read again.
+            if self._extendRange(rangeEditor, dimSize) and comboBox.currentText() != NO_PROJECTION:
+                reason = UpdateReason.COLLECTOR_SPIN_BOX
+
+        self._updateRtiInfo()
+
+        logger.debug("{} sigContentsChanged signal (follow)"
+                      .format("Blocked" if self.signalsBlocked() else "Emitting"))
+        self.sigContentsChanged.emit(reason)
+
+        # Emits COLLECTOR_SPIN_BOX, which is merged with the DATA_APPENDED redraw.
+        for spinBox, lastIndex in spinBoxesAtEnd:
+            if spinBox.value() != lastIndex and spinBox is not self._playingSpinBox:
+                spinBox.setValue(lastIndex)
+
+
+    @staticmethod
+    def _extendRange(rangeEditor, length):
+        """ Sets the dimension length of a range editor. If the complete dimension was selected,
+            the range is extended to the new length, otherwise the range is kept.
+
+            Returns True if the range has been extended.
+        """
+        if length == rangeEditor.length:
+            return False
+        isFullRange = rangeEditor.isFullRange()
+        oldSlice = rangeEditor.getSlice()
+        rangeEditor.setDimensionLength(length)
+        if not isFullRange:
+            rangeEditor.setSlice(oldSlice)
+        return isFullRange
+
+
+    def getAppendedArray(self, oldShape, copy=True):
+        """ Reads only the elements that have been appended to the sliced array since it had
+            oldShape. Is used by inspectors that follow growing data (see appendsData).
+
+            The complete dimensions of the combo boxes must be selected and only one of them may
+            have grown.
+
+            :param oldShape: the shape of the sliced array that the inspector has shown.
+            :param copy: if True a copy is returned, otherwise a read-only view. See
+                getSlicedArray.
+            :return: (axis, ArrayWithMask) tuple with the axis of the sliced array to which
+                elements have been appended and the appended elements. Both are None if nothing
+                has been appended. Returns None if the elements can't be appended, e.g. if a
+                sub range is selected. The complete slice must then be read.
+        """
+        shape = self.getSlicedArrayShape()
+        if shape is None or len(shape) != len(oldShape):
+            return None
+
+        if not all(rangeEditor.isFullRange() for rangeEditor in self._rangeEditors):
+            return None
+
+        grownAxes = [axis for axis, (length, oldLength) in enumerate(zip(shape, oldShape))
+                     if length != oldLength]
+        if not grownAxes:
+            return None, None
+
+        axis = grownAxes[0]
+        if len(grownAxes) > 1 or shape[axis] < oldShape[axis]:
+            return None
+
+        comboSlices = [slice(None)] * len(shape)
+        comboSlices[axis] = slice(oldShape[axis], shape[axis])
+        logger.debug("Reading appended elements: {}".format(comboSlices))
+
+        sliceList, permutations, projections, _cacheKey = \
+            self._currentCacheKey(comboSlices=comboSlices)
+        with RTI_READ_LOCK:
+            awm = self._readSlice(self.rti, sliceList, permutations, self.maxCombos,
+                                  projections=projections,
+                                  blockBytes=self.projectionBlockBytes,
+                                  packMaskBytes=self.packMaskBytes)
+
+        return axis, (awm.copy() if copy else awm.asReadOnly())
+
+
+    def _currentCacheKey(self, comboSlices=None):
+        """ Returns the slice list, permutations, projections and slice cache key of the
+            current slice.
+        """
+        sliceList, permutations = self._sliceListAndPermutations(comboSlices=comboSlices)
+        projections = self._projections()
+        cacheKey = SliceCache.createKey(self.rti.fileName, self.rti.nodePath,
+                                        sliceList, permutations, projections=projections)
+        return sliceList, permutations, projections, cacheKey
+
+
+    def requestSlicedArray(self, comboSlices=None):
+        """ Starts loading the current slice in a worker thread so that the GUI stays responsive.
+
+            Emits sigSliceLoaded when the slice is available; immediately if it is cached or
+            if the RTI is not sliceable. A new request cancels the previous one. Afterwards
+            getSlicedArray returns the loaded slice without reading the RTI again, provided that
+            it is called with the same comboSlices.
+        """
+        if not self.rtiIsSliceable:
+            self._sliceLoader.cancel()
+            self.sigSliceLoaded.emit(None)
+            return
+
+        self._lastComboSlices = comboSlices
+        sliceList, permutations, projections, cacheKey = \
+            self._currentCacheKey(comboSlices=comboSlices)
+        awm = self._getLoadedSlice(cacheKey)
+        if awm is not None:
+            self._sliceLoader.cancel()
+            self.sigSliceLoaded.emit(awm)
+            return
+
+        # Projections can take long, they report their progress and stop when cancelled.
+        self._sliceLoader.load(cacheKey, partial(self._readSlice, self.rti, sliceList,
+                                                 permutations, self.maxCombos,
+                                                 projections=projections,
+                                                 blockBytes=self.projectionBlockBytes,
+                                                 packMaskBytes=self.packMaskBytes),
+                               reportsProgress=bool(projections))
+
+
+    @property
+    def isLoading(self):
+        """ True while a slice is being loaded in the background (see requestSlicedArray).
+        """
+        return self._sliceLoader.isBusy
+
+
+    @QtSlot(object, object)
+    def _sliceLoaded(self, cacheKey, awm):
+        """ Is called when the slice loader has read the requested slice.
+        """
+        if awm is not None:
+            self._loadedSlice = (cacheKey, awm, self._sliceCache.generation())
+        self.sigSliceLoaded.emit(awm)
+
+
+    def _getLoadedSlice(self, cacheKey):
+        """ Returns the last loaded slice if it has the cacheKey and the RTIs have not been closed
+            since it was loaded. Returns None otherwise.
+        """
+        if self._loadedSlice is None:
+            return None
+        loadedKey, awm, generation = self._loadedSlice
+        if loadedKey != cacheKey or self._sliceCache.isStale(cacheKey, generation):
+            return None
+        return awm
+
+
+    def getSlicedArray(self, copy=True, comboSlices=None):
         """ Slice the rti using a tuple of slices made from the values of the combo and spin boxes.
 
             :param copy: If True (the default), a copy is made so that inspectors cannot
-                accidentally modify the underlying of the RTIs. You can set copy=False as a
-                potential optimization, but only if you are absolutely sure that you don't modify
-                the the slicedArray in your inspector! Note that this function calls transpose,
-                which can still make a copy of the array for certain permutations.
+                accidentally modify the underlying of the RTIs. If False, no data is copied and
+                read-only views are returned; an inspector that needs to modify the slice must
+                make a copy itself (e.g. with slicedArray.copy()). Writing to the views raises
+                a ValueError. The built-in inspectors use copy=False.
+
+            Recently read slices are kept in the slice cache of the collector, so that going back
+            to a previously inspected index does not read the RTI again. The slice that was loaded
+            in the background by requestSlicedArray is also returned without reading.
+
+            :param comboSlices: optional list with a slice object per combo box (in the order of
+                the combo boxes). The dimension of the combo box is then sliced with it instead
+                of being read completely. This can be used to read a region, or to decimate a
+                large array by using a step (see the decimation module). Slices for combo boxes
+                with the fake dimension are ignored. The slices are in the coordinates of the
+                complete dimension and should be kept within the sub ranges of getComboRanges.
+                If None, the sub ranges that are selected in the collector are read.
 
             :return: Numpy masked array with the same number of dimension as the number of
                 comboboxes (this can be zero!).
@@ -492,36 +1350,105 @@ class Collector(QtWidgets.QWidget):
                 Returns None if no slice can be made (i.e. the RTI is not sliceable).
         """
         #logger.debug("getSlicedArray() called")
+        return self.readSlice(comboSlices=comboSlices, copy=copy, remember=True)
 
+
+    def readSlice(self, comboSlices=None, copy=True, remember=False):
+        """ Reads a region of the current slice like getSlicedArray does.
+
+            If remember is False, the comboSlices are not remembered as the region that the
+            read-ahead of the spin boxes reads (see _scheduleReadAhead). Inspectors that read
+            their slice in blocks use this to read a block; the blocks can be read in advance
+            in a worker thread with the jobs of createReadJob.
+        """
         if not self.rtiIsSliceable:
             return None
 
-        # The dimensions that are selected in the combo boxes will be set to slice(None),
-        # the values from the spin boxes will be set as a single integer value
-        nDims = self.rti.nDims
-        sliceList = [slice(None)] * nDims
+        if remember:
+            self._lastComboSlices = comboSlices
+        sliceList, permutations, projections, cacheKey = \
+            self._currentCacheKey(comboSlices=comboSlices)
+
+        awm = self._getLoadedSlice(cacheKey)
+        if awm is None:
+            awm = self._sliceCache.get(cacheKey)
+
+        if awm is None:
+            with RTI_READ_LOCK:
+                awm = self._readSlice(self.rti, sliceList, permutations, self.maxCombos,
+                                      projections=projections,
+                                      blockBytes=self.projectionBlockBytes,
+                                      packMaskBytes=self.packMaskBytes)
+            self._sliceCache.put(cacheKey, awm)
+        else:
+            logger.debug("Slice cache hit: {}".format(str(sliceList)))
 
-        for spinBox in self._spinBoxes:
-            dimNr = spinBox.property("dim_nr")
-            sliceList[dimNr] = spinBox.value()
+        # Make a copy or read-only view to prevent inspectors from modifying the underlying array
+        # (which is also stored in the slice cache).
+        if copy:
+            awm = awm.copy()
+        else:
+            awm = awm.asReadOnly()
+
+        return awm
+
+
+    def getLoadedSlicedArray(self, copy=True, comboSlices=None):
+        """ Returns the slice like getSlicedArray does, but only if it has been loaded by
+            requestSlicedArray or is in the slice cache. Returns None otherwise; the RTI is
+            never read, so this can be called from the GUI thread at any time.
+        """
+        if not self.rtiIsSliceable:
+            return None
+
+        _sliceList, _permutations, _projections, cacheKey = \
+            self._currentCacheKey(comboSlices=comboSlices)
+        awm = self._getLoadedSlice(cacheKey)
+        if awm is None:
+            awm = self._sliceCache.get(cacheKey)
+        if awm is None:
+            return None
 
+        return awm.copy() if copy else awm.asReadOnly()
+
+
+    @staticmethod
+    def _readSlice(rti, sliceList, permutations, nCombos, projections=None,
+                   blockBytes=DEFAULT_BLOCK_SIZE_MB * MB,
+                   packMaskBytes=DEFAULT_PACK_MASK_SIZE_MB * MB, progress=None):
+        """ Reads the slice from the RTI and converts it to an ArrayWithMask that has the
+            dimensions in the order of the combo boxes.
+
+            The result is not copied and may therefore share memory with the RTI.
+            Does not use the collector widgets so it can be called from a worker thread.
+
+            :param rti: the repo tree item that is sliced
+            :param sliceList: list with, per RTI dimension, a slice object or an integer
+            :param permutations: the transposition that puts the dimensions in combo box order.
+            :param nCombos: the number of combo boxes (i.e. the dimensionality of the result)
+            :param projections: optional list of (dimNr, function) tuples. These dimensions
+                are reduced by streaming blocks of at most blockBytes (see projectSlice).
+            :param packMaskBytes: masks of at least this many bytes are bit-packed (0 = never).
+            :param progress: function that is called with the fraction that has been projected.
+            :return: ArrayWithMask
+        """
         # Make the array slicer. It needs to be a tuple, a list of only integers will be
         # interpreted as an index. With a tuple, array[(exp1, exp2, ..., expN)] is equivalent to
         # array[exp1, exp2, ..., expN].
         # See: http://docs.scipy.org/doc/numpy/reference/arrays.indexing.html
         logger.debug("Array slice list: {}".format(str(sliceList)))
-        slicedArray = self.rti[tuple(sliceList)]
-
-        # Make a copy to prevent inspectors from modifying the underlying array.
-        if copy:
-            slicedArray = ma.copy(slicedArray)
+        if projections:
+            slicedArray = projectSlice(rti, sliceList, projections, maxBlockBytes=blockBytes,
+                                       progress=progress)
+        else:
+            slicedArray = rti[tuple(sliceList)]
 
         # If there are no comboboxes the sliceList will contain no Slices objects, only ints. Then
         # the resulting slicedArray will be a usually a scalar (only structured fields may yield an
         # array). We convert this scalar to a zero-dimensional Numpy array so that inspectors
         # always get an array (having the same number of dimensions as the dimensionality of the
         # inspector, i.e. the number of comboboxes).
-        if self.maxCombos == 0:
+        if nCombos == 0:
             slicedArray = ma.MaskedArray(slicedArray)
 
         # Post-condition type check
@@ -532,22 +1459,26 @@ class Collector(QtWidgets.QWidget):
             slicedArray = ma.MaskedArray(slicedArray)
 
         # Add fake dimensions of length 1 so that result.ndim will equal the number of combo boxes
-        for dimNr in range(slicedArray.ndim, self.maxCombos):
+        for dimNr in range(slicedArray.ndim, nCombos):
             #logger.debug("Adding fake dimension: {}".format(dimNr))
             slicedArray = ma.expand_dims(slicedArray, dimNr)
 
         # Post-condition dimension check
-        assert slicedArray.ndim == self.maxCombos, \
+        assert slicedArray.ndim == nCombos, \
             "Bug: getSlicedArray should return a {:d}D array, got: {}D" \
-            .format(self.maxCombos, slicedArray.ndim)
+            .format(nCombos, slicedArray.ndim)
 
         # Convert to ArrayWithMask class for working around issues with the numpy maskedarray
         awm = ArrayWithMask.createFromMaskedArray(slicedArray)
         del slicedArray
 
+        # Slices are kept in the cache, so store large masks compactly. The packed mask is
+        # transposed below without unpacking it.
+        if packMaskBytes > 0 and is_an_array(awm.mask) and awm.mask.nbytes >= packMaskBytes:
+            logger.debug("Packing mask of {} bytes".format(awm.mask.nbytes))
+            awm.packMask()
+
         # Shuffle the dimensions to be in the order as specified by the combo boxes
-        comboDims = [self._comboBoxDimensionIndex(cb) for cb in self._comboBoxes]
-        permutations = np.argsort(comboDims)
         logger.debug("slicedArray.shape: {}".format(awm.data.shape))
         logger.debug("Transposing dimensions: {}".format(permutations))
         awm = awm.transpose(permutations)
@@ -560,6 +1491,7 @@ class Collector(QtWidgets.QWidget):
     def getSlicesString(self):
         """ Returns a string representation of the slices that are used to get the sliced array.
             For example returns '[:, 5]' if the combo box selects dimension 0 and the spin box 5.
+            A sub range of a combo box dimension is included, e.g. '[100:200, 5]'.
         """
         if not self.rtiIsSliceable:
             return ''
@@ -569,16 +1501,38 @@ class Collector(QtWidgets.QWidget):
         nDims = self.rti.nDims
         sliceList = [':'] * nDims
 
-        for spinBox in self._spinBoxes:
+        for spinBox, comboBox, rangeEditor in zip(self._spinBoxes, self._projectionComboBoxes,
+                                                  self._projectionRangeEditors):
             dimNr = spinBox.property("dim_nr")
-            sliceList[dimNr] = str(spinBox.value())
+            function = comboBox.currentText()
+            if function == NO_PROJECTION:
+                sliceList[dimNr] = str(spinBox.value())
+            else:
+                sliceList[dimNr] = "{}({})".format(function, self._rangeString(rangeEditor))
 
         # No need to shuffle combobox dimensions like in getSlicedArray; all combobox dimensions
-        # yield a colon.
+        # yield a colon or their sub range.
+        for comboBox, rangeEditor in zip(self._comboBoxes, self._rangeEditors):
+            dimNr = self._comboBoxDimensionIndex(comboBox)
+            if dimNr < FAKE_DIM_OFFSET:
+                sliceList[dimNr] = self._rangeString(rangeEditor)
 
         return "[" + ", ".join(sliceList) + "]"
 
 
+    @staticmethod
+    def _rangeString(rangeEditor):
+        """ Returns the range of a range editor in slice notation, e.g. '100:200' or ':'.
+        """
+        rangeSlice = rangeEditor.getSlice()
+        if rangeSlice == slice(None):
+            return ':'
+        rangeStr = "{}:{}".format(rangeSlice.start, rangeSlice.stop)
+        if rangeSlice.step != 1:
+            rangeStr += ":{}".format(rangeSlice.step)
+        return rangeStr
+
+
     # def independentDimensionNames(self):
     #     """ Returns list of the names of the independent dimensions, which have been selected in
     #         the combo boxes.
@@ -610,7 +1564,8 @@ class Collector(QtWidgets.QWidget):
             If no RTI is selected the applicable values will be empty strings.
 
             The dictionary has the following contents:
-                slices : a string representation of the selected slice indices.
+                slices : a string representation of the selected slice indices. Projected
+                              dimensions are shown as e.g. 'max(:)'.
                 name        : nodeName of the RTI
                 path        : nodePath of the RTI
                 unit        : unit of the RTI in parentheses
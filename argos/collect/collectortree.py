@@ -20,7 +20,7 @@ from __future__ import print_function
 
 import logging
 
-from argos.qt import Qt, QtCore, QtGui, QtWidgets, QtSlot
+from argos.qt import Qt, QtCore, QtGui, QtWidgets, QtSignal, QtSlot
 from argos.qt.togglecolumn import ToggleColumnTreeView
 from argos.widgets.constants import COLLECTOR_TREE_ICON_SIZE
 
@@ -176,3 +176,119 @@ class CollectorSpinBox(QtWidgets.QSpinBox):
         return result
 
 
+
+class CollectorRangeEditor(QtWidgets.QWidget):
+    """ Spin boxes for selecting a sub range (region of interest) of a combo box dimension.
+
+        The range is a Python slice: start is inclusive, stop is exclusive. Only the selected
+        range is read from the RTI.
+    """
+    sigRangeChanged = QtSignal()
+
+    def __init__(self, parent=None):
+        """ Constructor
+        """
+        super(CollectorRangeEditor, self).__init__(parent=parent)
+        self._length = 0
+
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.startSpinBox = self._createSpinBox("First index of the range (inclusive)")
+        self.stopSpinBox = self._createSpinBox("Last index of the range (exclusive)")
+        self.stepSpinBox = self._createSpinBox("Step")
+        self.stepSpinBox.setPrefix(":")
+
+        layout.addWidget(self.startSpinBox)
+        layout.addWidget(QtWidgets.QLabel(":"))
+        layout.addWidget(self.stopSpinBox)
+        layout.addWidget(self.stepSpinBox)
+
+        self.setDimensionLength(0)
+
+
+    def _createSpinBox(self, toolTip):
+        """ Creates a spin box that emits sigRangeChanged when its value changes.
+        """
+        spinBox = CollectorSpinBox()
+        spinBox.setKeyboardTracking(False)
+        spinBox.setCorrectionMode(QtWidgets.QAbstractSpinBox.CorrectToNearestValue)
+        spinBox.setToolTip(toolTip)
+        spinBox.valueChanged[int].connect(self._spinBoxValueChanged)
+        return spinBox
+
+
+    @property
+    def length(self):
+        """ The length of the dimension of which a range is selected.
+        """
+        return self._length
+
+
+    def setDimensionLength(self, length):
+        """ Sets the length of the dimension and resets the range to the complete dimension.
+            Does not emit sigRangeChanged.
+
+            Use a length of 0 for dimensions that can't be sliced (e.g. the fake dimension).
+        """
+        self._length = length
+        maxValue = max(1, length)
+        for spinBox in (self.startSpinBox, self.stopSpinBox, self.stepSpinBox):
+            spinBox.blockSignals(True)
+
+        self.startSpinBox.setRange(0, maxValue - 1)
+        self.stopSpinBox.setRange(1, maxValue)
+        self.stepSpinBox.setRange(1, maxValue)
+        self.startSpinBox.setValue(0)
+        self.stopSpinBox.setValue(maxValue)
+        self.stepSpinBox.setValue(1)
+
+        for spinBox in (self.startSpinBox, self.stopSpinBox, self.stepSpinBox):
+            spinBox.blockSignals(False)
+        self.setEnabled(length > 1)
+
+
+    def isFullRange(self):
+        """ Returns True if the complete dimension is selected.
+        """
+        return (self.startSpinBox.value() == 0 and self.stopSpinBox.value() >= self._length and
+                self.stepSpinBox.value() == 1)
+
+
+    def getSlice(self):
+        """ Returns the selected range as a slice object.
+            Returns slice(None) if the complete dimension is selected.
+        """
+        if self.isFullRange():
+            return slice(None)
+        start = self.startSpinBox.value()
+        stop = max(start + 1, self.stopSpinBox.value())
+        return slice(start, stop, self.stepSpinBox.value())
+
+
+    def setSlice(self, slc):
+        """ Sets the range from a slice object. Values are clipped to the dimension length.
+            Does not emit sigRangeChanged. Returns True if the range has changed.
+        """
+        oldSlice = self.getSlice()
+        start, stop, step = slc.indices(max(1, self._length))
+
+        for spinBox, value in ((self.startSpinBox, start), (self.stopSpinBox, max(start + 1, stop)),
+                               (self.stepSpinBox, step)):
+            spinBox.blockSignals(True)
+            spinBox.setValue(value)
+            spinBox.blockSignals(False)
+
+        return self.getSlice() != oldSlice
+
+
+    @QtSlot(int)
+    def _spinBoxValueChanged(self, _value):
+        """ Keeps the stop larger than the start and emits sigRangeChanged.
+        """
+        if self.stopSpinBox.value() <= self.startSpinBox.value():
+            self.stopSpinBox.blockSignals(True)
+            self.stopSpinBox.setValue(self.startSpinBox.value() + 1)
+            self.stopSpinBox.blockSignals(False)
+        self.sigRangeChanged.emit()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Functions for making slices that read a (sub-sampled) region of the sliced array.
+
+    The slices can be passed as the comboSlices parameter of Collector.getSlicedArray. The RTI is
+    then read with a stride so that libraries such as h5py and netCDF4 only fetch the elements
+    that can be displayed.
+"""
+from __future__ import division
+
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+def normalizeSlice(slc, length):
+    """ Returns a slice with explicit, non-negative, start, stop and step values.
+
+        :param slc: slice object or None (which selects all elements)
+        :param length: length of the dimension that is sliced
+    """
+    if slc is None:
+        slc = slice(None)
+    start, stop, step = slc.indices(length)
+    if step < 1:
+        raise ValueError("Only positive steps are supported, got: {}".format(step))
+    return slice(start, max(start, stop), step)
+
+
+def decimatedSlices(shape, targetShape, regionSlices=None):
+    """ Returns a list of slices that select a region of an array with shape, using steps that
+        are chosen so that the result is not (much) larger than targetShape.
+
+        :param shape: the shape of the complete array.
+        :param targetShape: the maximum number of elements per dimension, e.g. the size of the
+            view box in pixels. Use None (or a value < 1) for a dimension that must not be
+            decimated.
+        :param regionSlices: optional list of slices that select the region. If None the complete
+            array is selected. If a region slice has a step, the resulting step is a multiple of
+            it so that only elements of the region are selected.
+        :returns: list of slices with explicit start, stop and step.
+    """
+    if regionSlices is None:
+        regionSlices = [None] * len(shape)
+
+    assert len(shape) == len(targetShape) == len(regionSlices), \
+        "Length mismatch: {}, {}, {}".format(shape, targetShape, regionSlices)
+
+    result = []
+    for length, target, regionSlice in zip(shape, targetShape, regionSlices):
+        region = normalizeSlice(regionSlice, length)
+        numElements = len(range(region.start, region.stop, region.step))
+        if target is None or target < 1 or numElements <= target:
+            step = region.step
+        else:
+            step = region.step * int(math.ceil(numElements / target))
+        result.append(slice(region.start, region.stop, step))
+
+    return result
+
+
+def intersectSlices(slices, regionSlices):
+    """ Returns the intersection of slices with the region slices. The result starts at an element
+        of the region and has the step of the region. All slices must have explicit start, stop
+        and step (see normalizeSlice). Only the start and stop of the slices are used.
+
+        If a slice doesn't intersect its region slice, the complete region slice is returned.
+    """
+    result = []
+    for slc, region in zip(slices, regionSlices):
+        # Round the start down to an element of the region so that partly visible elements are kept
+        start = max(slc.start, region.start)
+        start = region.start + ((start - region.start) // region.step) * region.step
+        stop = min(slc.stop, region.stop)
+        if stop > start:
+            result.append(slice(start, stop, region.step))
+        else:
+            result.append(region)
+    return result
+
+
+def slicesCover(loadedSlices, requiredSlices):
+    """ Returns True if the loaded slices contain the required region at a resolution that is at
+        least as high. All slices must have explicit start, stop and step (see normalizeSlice).
+
+        Is used to decide if a region must be read again after the view has changed.
+    """
+    for loaded, required in zip(loadedSlices, requiredSlices):
+        if loaded.step > required.step:
+            return False
+        if loaded.start > required.start or loaded.stop < required.stop:
+            return False
+    return True
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Projections (reductions) of RTI dimensions that are not displayed.
+
+    Instead of selecting a single index, the maximum, mean, etc. over (a range of) a dimension can
+    be shown. The RTI is read in blocks along the projected dimension, which are reduced one by
+    one, so that the complete N-D array never has to be in memory.
+
+    Masked values and NaNs are ignored.
+"""
+from __future__ import division
+
+import logging
+import numpy as np
+import numpy.ma as ma
+
+from argos.collect.slicecache import MB
+
+logger = logging.getLogger(__name__)
+
+NO_PROJECTION = 'index'  # The dimension is indexed by the spin box value
+PROJECTION_FUNCTIONS = ('max', 'min', 'mean', 'std', 'sum', 'count')
+
+DEFAULT_BLOCK_SIZE_MB = 64 # Maximum size of the blocks that are read at once.
+
+
+class ProjectionAccumulator(object):
+    """ Reduces an array along an axis block by block.
+
+        The blocks are added with add() and the result is the same as if the function was applied
+        to the concatenation of all blocks. For the mean and standard deviation the (parallel)
+        algorithm of Chan et al. is used to combine the partial results.
+    """
+    def __init__(self, function):
+        """ Constructor
+
+            :param function: one of the PROJECTION_FUNCTIONS.
+        """
+        if function not in PROJECTION_FUNCTIONS:
+            raise ValueError("function must be one of {}, got: {!r}"
+                             .format(PROJECTION_FUNCTIONS, function))
+        self._function = function
+        self._count = None  # Number of valid elements
+        self._value = None  # Maximum, minimum, sum or mean (depending on the function)
+        self._m2 = None     # Sum of squared deviations from the mean (for the std)
+
+
+    @property
+    def function(self):
+        """ The name of the reduction function
+        """
+        return self._function
+
+
+    def add(self, block, axis):
+        """ Adds a block to the reduction.
+
+            :param block: numpy (masked) array.
+            :param axis: the axis along which is reduced.
+        """
+        data = ma.getdata(block)
+        if data.dtype.names or data.dtype.kind not in 'biufc':
+            raise TypeError("Projections are only possible for numerical data, got: {}"
+                            .format(data.dtype))
+
+        valid = ~ma.getmaskarray(block)
+        if data.dtype.kind in 'fc':
+            valid &= ~np.isnan(data)
+        count = np.sum(valid, axis=axis)
+
+        function = self._function
+        if function == 'count':
+            value = None
+        elif function in ('max', 'min'):
+            value = self._blockExtreme(data, valid, axis)
+        elif function == 'sum':
+            value = np.sum(np.where(valid, data, 0), axis=axis, dtype=self._sumDtype(data.dtype))
+        else:
+            value, m2 = self._blockMeanAndM2(data, valid, count, axis)
+
+        if self._count is None:
+            self._count = count
+            self._value = value
+            if function in ('mean', 'std'):
+                self._m2 = m2
+            return
+
+        if function in ('max', 'min'):
+            # Elements without valid values in one of the partial results are taken from the other.
+            ufunc = np.maximum if function == 'max' else np.minimum
+            combined = ufunc(self._value, value)
+            combined = np.where(self._count == 0, value, combined)
+            self._value = np.where(count == 0, self._value, combined)
+        elif function == 'sum':
+            self._value = self._value + value
+        elif function in ('mean', 'std'):
+            totalCount = self._count + count
+            divisor = np.maximum(totalCount, 1)
+            delta = value - self._value
+            if function == 'std':
+                self._m2 = self._m2 + m2 + np.abs(delta) ** 2 * (self._count * (count / divisor))
+            self._value = self._value + delta * (count / divisor)
+
+        self._count = self._count + count
+
+
+    def result(self):
+        """ Returns the result as masked array. Elements without valid values are masked (except
+            for the sum and count, which are then zero). Returns None if no blocks were added.
+        """
+        if self._count is None:
+            return None
+
+        function = self._function
+        noData = self._count == 0
+        if not np.any(noData):
+            noData = ma.nomask # Don't keep a mask array if all elements have valid values.
+        if function == 'count':
+            return ma.MaskedArray(self._count)
+        elif function == 'sum':
+            return ma.MaskedArray(self._value)
+        elif function == 'std':
+            variance = self._m2 / np.maximum(self._count, 1)
+            return ma.MaskedArray(np.sqrt(variance), mask=noData)
+        else:
+            return ma.MaskedArray(self._value, mask=noData)
+
+
+    def _blockExtreme(self, data, valid, axis):
+        """ Returns the maximum or minimum of the valid elements of the block.
+            The value is undefined for elements that have no valid values.
+        """
+        if data.dtype.kind == 'c':
+            raise TypeError("The {} of complex numbers is undefined".format(self._function))
+
+        # Replace the invalid values by a value that can't be the maximum (or minimum).
+        if self._function == 'max':
+            fillValue = -np.inf if data.dtype.kind == 'f' else _dtypeLimits(data.dtype)[0]
+            return np.max(np.where(valid, data, fillValue), axis=axis).astype(data.dtype)
+        else:
+            fillValue = np.inf if data.dtype.kind == 'f' else _dtypeLimits(data.dtype)[1]
+            return np.min(np.where(valid, data, fillValue), axis=axis).astype(data.dtype)
+
+
+    def _blockMeanAndM2(self, data, valid, count, axis):
+        """ Returns the mean and sum of squared deviations of the valid elements of the block.
+        """
+        dtype = np.result_type(data.dtype, np.float64)
+        total = np.sum(np.where(valid, data, 0), axis=axis, dtype=dtype)
+        mean = total / np.maximum(count, 1)
+        if self._function != 'std':
+            return mean, None
+
+        deviations = np.where(valid, data - np.expand_dims(mean, axis), 0)
+        m2 = np.sum(np.abs(deviations) ** 2, axis=axis)
+        return mean, m2
+
+
+    @staticmethod
+    def _sumDtype(dtype):
+        """ Returns the type that is used for summing elements so that they don't overflow.
+        """
+        if dtype.kind in 'bi':
+            return np.int64
+        elif dtype.kind == 'u':
+            return np.uint64
+        else:
+            return np.result_type(dtype, np.float64)
+
+
+
+def _dtypeLimits(dtype):
+    """ Returns the (minimum, maximum) value of an integer or boolean type.
+    """
+    if dtype.kind == 'b':
+        return False, True
+    info = np.iinfo(dtype)
+    return info.min, info.max
+
+
+def _blockStop(pos, stop, step, blockLength, storageChunkLength=None):
+    """ Returns the (exclusive) stop index of the block that starts at pos.
+
+        The block has at most blockLength selected elements (but at least one). If the storage
+        chunk length along the dimension is known, the block ends at a chunk boundary if possible,
+        so that each chunk of the file is read (and decompressed) only once.
+    """
+    end = pos + max(1, blockLength) * step
+    if storageChunkLength and storageChunkLength > 1:
+        alignedEnd = (end // storageChunkLength) * storageChunkLength
+        if alignedEnd > pos:
+            end = alignedEnd
+    return min(end, stop)
+
+
+def projectSlice(rti, sliceList, projections, maxBlockBytes=DEFAULT_BLOCK_SIZE_MB * MB,
+                 progress=None):
+    """ Reads a slice of the RTI while reducing the projected dimensions.
+
+        The RTI is read in blocks along the first projected dimension. The result has the same
+        dimensions as when the projected dimensions would have been indexed with an integer.
+
+        The projections are applied from the last projected dimension to the first. All
+        dimensions except the first projected dimension are thus reduced within each block.
+
+        :param rti: the RTI that is read.
+        :param sliceList: list with a slice object or integer for each dimension of the RTI. The
+            projected dimensions must be slices, they determine the range that is reduced.
+        :param projections: list of (dimNr, function) tuples, where function is one of the
+            PROJECTION_FUNCTIONS.
+        :param maxBlockBytes: the maximum size of a block that is read at once. A block always
+            contains at least one index of the first projected dimension, so more may be read.
+        :param progress: optional function that is called with the fraction (between 0 and 1)
+            that has been read after every block. It may raise an exception to stop the reading.
+        :return: masked array
+    """
+    assert projections, "No projections given"
+    projections = sorted(projections)
+    shape = rti.arrayShape
+
+    # Axes of the block array (the integer indices remove dimensions)
+    axisOfDim = {}
+    for dimNr, slc in enumerate(sliceList):
+        if isinstance(slc, slice):
+            axisOfDim[dimNr] = len(axisOfDim)
+
+    for dimNr, _function in projections:
+        if not isinstance(sliceList[dimNr], slice):
+            raise ValueError("Projected dimension {} must be sliced, got: {!r}"
+                             .format(dimNr, sliceList[dimNr]))
+
+    streamDimNr, streamFunction = projections[0]
+    start, stop, step = sliceList[streamDimNr].indices(shape[streamDimNr])
+    if step < 1:
+        raise ValueError("Only positive steps are supported, got: {}".format(step))
+    numElements = len(range(start, stop, step))
+    if numElements == 0:
+        raise ValueError("The range of projected dimension {} is empty".format(streamDimNr))
+
+    chunkShape = getattr(rti, 'chunkShape', None)
+    storageChunkLength = chunkShape[streamDimNr] if chunkShape else None
+
+    accumulator = ProjectionAccumulator(streamFunction)
+    blockLength = 1 # The first block is a single index, it is used to determine the block length.
+    pos = start
+    numDone = 0
+    while pos < stop:
+        blockStop = _blockStop(pos, stop, step, blockLength, storageChunkLength)
+        blockSliceList = list(sliceList)
+        blockSliceList[streamDimNr] = slice(pos, blockStop, step)
+        block = rti[tuple(blockSliceList)]
+        numBlockBytes = ma.getdata(block).nbytes
+
+        # Reduce the other projected dimensions within the block, the last dimension first so
+        # that the axis numbers of the remaining dimensions don't change.
+        for dimNr, function in reversed(projections[1:]):
+            innerAccumulator = ProjectionAccumulator(function)
+            innerAccumulator.add(block, axisOfDim[dimNr])
+            block = innerAccumulator.result()
+
+        accumulator.add(block, axisOfDim[streamDimNr])
+
+        numBlockElements = len(range(pos, blockStop, step))
+        if numDone == 0:
+            numBytes = max(1, numBlockBytes // numBlockElements)
+            blockLength = max(1, maxBlockBytes // numBytes)
+            logger.debug("Projecting dimension {} in blocks of {} elements"
+                         .format(streamDimNr, blockLength))
+
+        numDone += numBlockElements
+        pos = pos + numBlockElements * step
+        if progress is not None:
+            progress(numDone / max(1, numElements))
+
+    return accumulator.result()
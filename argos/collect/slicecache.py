@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Memory-bounded cache for the sliced arrays of the collector.
+
+    The cache is keyed by (fileName, nodePath, slice tuple, combo box permutation) so that going
+    back to a slice that was recently inspected requires no I/O. The least recently used slices are
+    evicted when the total size of the cached arrays exceeds the byte budget.
+
+    The FrameRingBuffer holds a fixed number of slices that are read ahead when a dimension is
+    played as an animation.
+"""
+import logging
+import threading
+import weakref
+
+from collections import OrderedDict
+
+from argos.utils.cls import check_class
+from argos.utils.masks import ArrayWithMask
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+DEFAULT_CACHE_SIZE_MB = 256
+
+# All slice caches are registered here (using weak references) so that they can all be invalidated
+# when an RTI is closed. A WeakSet is used so that caches are not kept alive by this registry.
+_ALL_SLICE_CACHES = weakref.WeakSet()
+
+# The number of recent invalidations that a cache remembers to detect stale background reads.
+# Reads that started before older invalidations are never stored (see _InvalidationLog).
+MAX_INVALIDATIONS = 100
+
+
+def _nodePathMatches(keyNodePath, nodePath):
+    """ Returns True if keyNodePath is the nodePath or one of its descendants.
+        Always returns True if nodePath is None (i.e. the complete file).
+    """
+    return (nodePath is None or keyNodePath == nodePath or
+            keyNodePath.startswith(nodePath.rstrip('/') + '/'))
+
+
+def invalidateSliceCaches(fileName, nodePath=None):
+    """ Removes the slices of an RTI, and of all its descendants, from all slice caches.
+
+        Slices of the RTI that are being read while it is invalidated will not be cached (see
+        SliceCache.generation). The slices of other files and nodes are not affected.
+
+        Is called by the collector when an RTI is closed, so that a closed or reloaded file
+        never serves stale data.
+
+        :param fileName: the file name of the RTI
+        :param nodePath: the node path of the RTI. If None, all slices of the file are removed.
+    """
+    for sliceCache in list(_ALL_SLICE_CACHES):
+        sliceCache.invalidate(fileName, nodePath)
+
+
+def arrayWithMaskNumBytes(awm):
+    """ Returns the number of bytes that the data and the mask of an ArrayWithMask occupy.
+    """
+    numBytes = awm.data.nbytes
+    if not isinstance(awm.mask, bool):
+        numBytes += awm.mask.nbytes # Mask array or PackedMask
+    return numBytes
+
+
+
+class _InvalidationLog(object):
+    """ Remembers the most recent invalidations of a slice cache, so that slices that were being
+        read while their RTI was invalidated are not stored.
+
+        The generation is the number of invalidations so far. A slice is stale if its RTI, one
+        of its ancestors, or its complete file has been invalidated after the generation was
+        obtained. Only the last MAX_INVALIDATIONS invalidations are remembered, reads that
+        started before the forgotten ones are considered stale.
+
+        Is not thread-safe, the cache must hold its lock.
+    """
+    def __init__(self):
+        """ Constructor
+        """
+        self._generation = 0
+        self._oldestGeneration = 0 # Reads that started before this are stale.
+        self._invalidations = OrderedDict() # (fileName, nodePath) -> generation, oldest first
+
+
+    @property
+    def generation(self):
+        """ The current generation, i.e. the number of invalidations so far.
+        """
+        return self._generation
+
+
+    def isStale(self, key, generation):
+        """ Returns True if the RTI of the key was invalidated since the generation was obtained.
+        """
+        if generation < self._oldestGeneration:
+            return True
+        fileName, nodePath = key[0], key[1]
+        for (invFileName, invNodePath), invGeneration in self._invalidations.items():
+            if (invGeneration > generation and invFileName == fileName and
+                    _nodePathMatches(nodePath, invNodePath)):
+                return True
+        return False
+
+
+    def invalidate(self, fileName, nodePath=None):
+        """ Records that the slices of the RTI and its descendants have been invalidated.
+        """
+        self._generation += 1
+        self._invalidations.pop((fileName, nodePath), None)
+        self._invalidations[(fileName, nodePath)] = self._generation
+        while len(self._invalidations) > MAX_INVALIDATIONS:
+            _key, generation = self._invalidations.popitem(last=False)
+            self._oldestGeneration = generation
+
+
+    def clear(self):
+        """ Records that all slices have been invalidated.
+        """
+        self._generation += 1
+        self._oldestGeneration = self._generation
+        self._invalidations.clear()
+
+
+
+class SliceCache(object):
+    """ Least recently used (LRU) cache of ArrayWithMask objects with a byte budget.
+
+        The cache is thread-safe so that slices may be added from worker threads.
+    """
+    def __init__(self, maxBytes=DEFAULT_CACHE_SIZE_MB * MB):
+        """ Constructor
+
+            :param maxBytes: the maximum total size of the cached arrays. Use 0 to disable caching.
+        """
+        self._lock = threading.RLock()
+        self._entries = OrderedDict() # from least to most recently used
+        self._numBytes = 0
+        self._maxBytes = 0
+        self._invalidationLog = _InvalidationLog()
+        self.maxBytes = maxBytes
+
+        _ALL_SLICE_CACHES.add(self)
+
+
+    @staticmethod
+    def createKey(fileName, nodePath, sliceTuple, permutations, projections=None):
+        """ Returns a hashable key for a slice.
+
+            :param fileName: file name of the RTI that is sliced
+            :param nodePath: node path of the RTI that is sliced
+            :param sliceTuple: tuple with slice objects and integers
+            :param permutations: the transposition of the combo box dimensions
+            :param projections: optional list of (dimNr, function) tuples of the dimensions that
+                are projected (see the projection module).
+        """
+        # Slice objects are not hashable so they are converted to (start, stop, step) tuples.
+        hashableSlices = tuple([(s.start, s.stop, s.step) if isinstance(s, slice) else s
+                                for s in sliceTuple])
+        key = (fileName, nodePath, hashableSlices, tuple([int(p) for p in permutations]))
+        if projections:
+            key += (tuple([(int(dimNr), function) for dimNr, function in projections]), )
+        return key
+
+
+    @property
+    def maxBytes(self):
+        """ The maximum total size of the cached arrays in bytes. Zero means that caching is off.
+        """
+        return self._maxBytes
+
+
+    @maxBytes.setter
+    def maxBytes(self, maxBytes):
+        """ Sets the maximum total size of the cached arrays. Evicts entries if needed.
+        """
+        with self._lock:
+            self._maxBytes = max(0, int(maxBytes))
+            self._evict(self._maxBytes)
+
+
+    def generation(self):
+        """ Returns the current generation of the cache, which changes when slices are
+            invalidated (see invalidateSliceCaches) or when the cache is cleared.
+
+            Background readers should get the generation before they start reading and pass it to
+            put(), so that a slice of a file that was closed during the read is not cached.
+        """
+        with self._lock:
+            return self._invalidationLog.generation
+
+
+    def isStale(self, key, generation):
+        """ Returns True if the RTI of the key has been invalidated, or the cache cleared, since
+            the generation was obtained.
+        """
+        with self._lock:
+            return self._invalidationLog.isStale(key, generation)
+
+
+    @property
+    def numBytes(self):
+        """ The current total size of the cached arrays in bytes.
+        """
+        return self._numBytes
+
+
+    def __len__(self):
+        """ Returns the number of cached slices.
+        """
+        return len(self._entries)
+
+
+    def __contains__(self, key):
+        """ Returns True if the key is in the cache. Does not change the order of the entries.
+        """
+        return key in self._entries
+
+
+    def get(self, key):
+        """ Returns the cached ArrayWithMask and marks it as most recently used.
+            Returns None if the key is not in the cache.
+        """
+        with self._lock:
+            try:
+                awm, numBytes = self._entries.pop(key)
+            except KeyError:
+                return None
+            self._entries[key] = (awm, numBytes) # re-insert at the most recently used end
+            return awm
+
+
+    def put(self, key, awm, generation=None):
+        """ Adds an ArrayWithMask to the cache, evicting least recently used slices if needed.
+
+            Slices that are larger than the complete budget are not cached.
+            The array is stored as is; callers must copy it if they intend to modify it.
+
+            :param generation: if not None, the slice is only stored if its RTI has not been
+                invalidated, and the cache not cleared, since the generation was obtained.
+        """
+        check_class(awm, ArrayWithMask)
+        numBytes = arrayWithMaskNumBytes(awm)
+
+        with self._lock:
+            if generation is not None and self._invalidationLog.isStale(key, generation):
+                logger.debug("Slice not cached, the cache was invalidated during the read.")
+                return
+
+            self._remove(key)
+            if numBytes > self._maxBytes:
+                return
+
+            self._evict(self._maxBytes - numBytes)
+            self._entries[key] = (awm, numBytes)
+            self._numBytes += numBytes
+
+
+    def invalidate(self, fileName, nodePath=None):
+        """ Removes the slices of an RTI and its descendants from the cache.
+
+            Slices that are being read are not affected, use invalidateSliceCaches to prevent
+            them from being stored as well.
+
+            :param fileName: the file name of the RTI
+            :param nodePath: the node path of the RTI. If None, all slices of the file are removed.
+        """
+        with self._lock:
+            self._invalidationLog.invalidate(fileName, nodePath)
+            for key in list(self._entries.keys()):
+                if key[0] == fileName and _nodePathMatches(key[1], nodePath):
+                    self._remove(key)
+
+
+    def clear(self):
+        """ Removes all slices from the cache.
+        """
+        with self._lock:
+            self._invalidationLog.clear()
+            self._entries.clear()
+            self._numBytes = 0
+
+
+    def _remove(self, key):
+        """ Removes a single entry if present. Must be called with the lock held.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._numBytes -= entry[1]
+
+
+    def _evict(self, maxBytes):
+        """ Evicts least recently used entries until the total size is at most maxBytes.
+            Must be called with the lock held.
+        """
+        while self._entries and self._numBytes > maxBytes:
+            _key, (_awm, numBytes) = self._entries.popitem(last=False)
+            self._numBytes -= numBytes
+
+
+
+class FrameRingBuffer(object):
+    """ Fixed-size buffer with the slices that are read ahead while a dimension is played.
+
+        Has the same interface as the SliceCache for adding slices, so that a ReadAheadWorker
+        can fill it. It holds at most capacity slices however, regardless of their size. When it
+        is full, the oldest slice is dropped. Slices are removed when they are taken (i.e. shown),
+        so the fill level is the number of frames that are ready to be shown.
+    """
+    def __init__(self, capacity):
+        """ Constructor
+
+            :param capacity: the maximum number of slices in the buffer.
+        """
+        self._lock = threading.RLock()
+        self._entries = OrderedDict() # from oldest to newest
+        self._capacity = 1
+        self._invalidationLog = _InvalidationLog()
+        self.capacity = capacity
+
+        _ALL_SLICE_CACHES.add(self)
+
+
+    @property
+    def capacity(self):
+        """ The maximum number of slices in the buffer.
+        """
+        return self._capacity
+
+
+    @capacity.setter
+    def capacity(self, capacity):
+        """ Sets the maximum number of slices. Drops the oldest slices if needed.
+        """
+        with self._lock:
+            self._capacity = max(1, int(capacity))
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+
+
+    def generation(self):
+        """ Returns the current generation of the buffer. See SliceCache.generation.
+        """
+        with self._lock:
+            return self._invalidationLog.generation
+
+
+    def __len__(self):
+        """ Returns the number of slices in the buffer.
+        """
+        return len(self._entries)
+
+
+    def __contains__(self, key):
+        """ Returns True if the key is in the buffer.
+        """
+        return key in self._entries
+
+
+    def put(self, key, awm, generation=None):
+        """ Adds an ArrayWithMask to the buffer, dropping the oldest slice if the buffer is full.
+
+            :param generation: if not None, the slice is only stored if its RTI has not been
+                invalidated, and the buffer not cleared, since the generation was obtained.
+        """
+        check_class(awm, ArrayWithMask)
+        with self._lock:
+            if generation is not None and self._invalidationLog.isStale(key, generation):
+                return
+
+            self._entries.pop(key, None)
+            while len(self._entries) >= self._capacity:
+                self._entries.popitem(last=False)
+            self._entries[key] = awm
+
+
+    def take(self, key):
+        """ Removes the slice from the buffer and returns it.
+            Returns None if the slice is not (yet) in the buffer.
+        """
+        with self._lock:
+            return self._entries.pop(key, None)
+
+
+    def invalidate(self, fileName, nodePath=None):
+        """ Removes the slices of an RTI and its descendants from the buffer.
+            See SliceCache.invalidate.
+        """
+        with self._lock:
+            self._invalidationLog.invalidate(fileName, nodePath)
+            for key in list(self._entries.keys()):
+                if key[0] == fileName and _nodePathMatches(key[1], nodePath):
+                    del self._entries[key]
+
+
+    def clear(self):
+        """ Removes all slices from the buffer.
+        """
+        with self._lock:
+            self._invalidationLog.clear()
+            self._entries.clear()
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Asynchronous loading of the collector slices.
+
+    The slices are read in a thread pool so that a slow read doesn't freeze the GUI. The result is
+    delivered in the GUI thread by means of a (queued) signal.
+"""
+import logging
+import threading
+
+from functools import partial
+
+from argos.collect.slicecache import SliceCache
+from argos.info import DEBUGGING
+from argos.qt import QtCore, QtSignal, QtSlot
+from argos.repo.baserti import RTI_READ_LOCK
+
+logger = logging.getLogger(__name__)
+
+# The reads are serialized by the RTI_READ_LOCK, so more threads only help to start a new request
+# while a stale read is still running.
+MAX_LOADER_THREADS = 2
+
+
+class LoadCancelled(Exception):
+    """ Raised by the progress function of a read when its request has been cancelled.
+    """
+    pass
+
+
+class _ReadRunnable(QtCore.QRunnable):
+    """ Runnable that calls a function in a thread of a QThreadPool.
+    """
+    def __init__(self, function):
+        super(_ReadRunnable, self).__init__()
+        self._function = function
+
+
+    def run(self):
+        """ Calls the function.
+        """
+        self._function()
+
+
+
+class SliceLoader(QtCore.QObject):
+    """ Reads slices in a worker thread pool and emits sigSliceLoaded when the read is finished.
+
+        Only the result of the most recent request is delivered. Making a new request cancels the
+        previous one: if its read has not yet started, it is skipped, otherwise its result is
+        discarded (but still stored in the slice cache).
+    """
+    # Emitted in the GUI thread with the cache key and the ArrayWithMask that was read.
+    # The ArrayWithMask is None if the read failed.
+    sigSliceLoaded = QtSignal(object, object)
+
+    # Emitted with True when a request is started and with False when it is finished or cancelled.
+    sigBusyChanged = QtSignal(bool)
+
+    # Emitted with the fraction (between 0 and 1) that has been read, for reads that report
+    # their progress.
+    sigProgress = QtSignal(float)
+
+    # Emitted from the worker threads, connected to _finished, _progress and _cancelled in the
+    # GUI thread.
+    _sigReadFinished = QtSignal(int, object, object)
+    _sigReadProgress = QtSignal(int, float)
+    _sigReadCancelled = QtSignal(int)
+
+    def __init__(self, sliceCache, parent=None):
+        """ Constructor
+
+            :param sliceCache: SliceCache where the read slices are stored.
+        """
+        super(SliceLoader, self).__init__(parent=parent)
+        assert isinstance(sliceCache, SliceCache), "sliceCache must be a SliceCache"
+        self._sliceCache = sliceCache
+
+        self._threadPool = QtCore.QThreadPool(self)
+        self._threadPool.setMaxThreadCount(MAX_LOADER_THREADS)
+
+        self._lock = threading.Lock()
+        self._requestId = 0       # Id of the most recent request. Older requests are stale.
+        self._pendingKey = None   # Cache key of the request that is in progress (if any)
+
+        self._sigReadFinished.connect(self._finished, type=QtCore.Qt.QueuedConnection)
+        self._sigReadProgress.connect(self._progress, type=QtCore.Qt.QueuedConnection)
+        self._sigReadCancelled.connect(self._cancelled, type=QtCore.Qt.QueuedConnection)
+
+
+    @property
+    def isBusy(self):
+        """ True if a slice is being read.
+        """
+        return self._pendingKey is not None
+
+
+    def load(self, cacheKey, readFunction, reportsProgress=False):
+        """ Requests a slice. Cancels the previous request unless it was for the same slice.
+
+            If the slice is in the slice cache, sigSliceLoaded is emitted before this method
+            returns. Otherwise the slice is read in a worker thread.
+
+            :param cacheKey: slice cache key of the slice.
+            :param readFunction: function without arguments that returns the ArrayWithMask. It is
+                called in a worker thread while holding the RTI_READ_LOCK.
+            :param reportsProgress: if True, readFunction is called with a progress keyword
+                argument. This is a function that the read function should call with the fraction
+                that has been read. It raises LoadCancelled if the request has been cancelled, so
+                that long reads stop early.
+
+            If the RTI of the slice is closed before the read starts, or the read fails because
+            it has been closed, the request is cancelled instead of failing. The RTI can't be
+            closed during the read since closing holds the RTI_READ_LOCK as well.
+        """
+        if cacheKey == self._pendingKey:
+            logger.debug("Slice is already being loaded: {}".format(cacheKey))
+            return
+
+        awm = self._sliceCache.get(cacheKey)
+        if awm is not None:
+            self.cancel()
+            self.sigSliceLoaded.emit(cacheKey, awm)
+            return
+
+        with self._lock:
+            self._requestId += 1
+            requestId = self._requestId
+        generation = self._sliceCache.generation()
+
+        wasBusy = self.isBusy
+        self._pendingKey = cacheKey
+        if reportsProgress:
+            readFunction = partial(readFunction, progress=partial(self._reportProgress, requestId))
+        self._threadPool.start(_ReadRunnable(lambda: self._read(
+            requestId, cacheKey, readFunction, generation)))
+        if not wasBusy:
+            self.sigBusyChanged.emit(True)
+
+
+    def cancel(self):
+        """ Cancels the current request (if any). Its result will not be delivered.
+        """
+        with self._lock:
+            self._requestId += 1
+
+        if self.isBusy:
+            self._pendingKey = None
+            self.sigBusyChanged.emit(False)
+
+
+    def stop(self):
+        """ Cancels the current request and waits until the running reads are finished.
+        """
+        self.cancel()
+        self._threadPool.waitForDone()
+
+
+    def _isStale(self, requestId):
+        """ Returns True if a newer request has been made, or the request was cancelled.
+        """
+        with self._lock:
+            return requestId != self._requestId
+
+
+    def _read(self, requestId, cacheKey, readFunction, generation):
+        """ Reads the slice. Is executed in a worker thread.
+        """
+        if self._isStale(requestId):
+            logger.debug("Skipping stale slice request: {}".format(cacheKey))
+            return
+        try:
+            with RTI_READ_LOCK:
+                # Closing an RTI invalidates its slices (see invalidateSliceCaches).
+                if self._sliceCache.isStale(cacheKey, generation):
+                    raise LoadCancelled()
+                awm = readFunction()
+        except LoadCancelled:
+            logger.debug("Slice request cancelled during the read: {}".format(cacheKey))
+            self._sigReadCancelled.emit(requestId)
+            return
+        except Exception as ex:
+            if self._sliceCache.isStale(cacheKey, generation):
+                logger.debug("RTI closed during the read: {}".format(cacheKey))
+                self._sigReadCancelled.emit(requestId)
+                return
+            # The error is reported when the inspector reads the slice in the GUI thread.
+            logger.warning("Loading of slice failed: {}".format(ex))
+            if DEBUGGING:
+                logger.exception(ex)
+            awm = None
+        else:
+            self._sliceCache.put(cacheKey, awm, generation=generation)
+
+        self._sigReadFinished.emit(requestId, cacheKey, awm)
+
+
+    def _reportProgress(self, requestId, fraction):
+        """ Is called by the read function in the worker thread to report its progress.
+            Raises LoadCancelled if the request has become stale.
+        """
+        if self._isStale(requestId):
+            raise LoadCancelled()
+        self._sigReadProgress.emit(requestId, fraction)
+
+
+    @QtSlot(int, float)
+    def _progress(self, requestId, fraction):
+        """ Is called in the GUI thread when a read reports progress.
+        """
+        if not self._isStale(requestId):
+            self.sigProgress.emit(fraction)
+
+
+    @QtSlot(int)
+    def _cancelled(self, requestId):
+        """ Is called in the GUI thread when a read has been cancelled. If this was the current
+            request (e.g. because its RTI has been closed), the loader is no longer busy.
+        """
+        if not self._isStale(requestId):
+            self.cancel()
+
+
+    @QtSlot(int, object, object)
+    def _finished(self, requestId, cacheKey, awm):
+        """ Is called in the GUI thread when a read is finished. Emits sigSliceLoaded unless the
+            request has become stale in the mean time.
+        """
+        if self._isStale(requestId):
+            logger.debug("Discarding stale slice: {}".format(cacheKey))
+            return
+
+        self._pendingKey = None
+        self.sigBusyChanged.emit(False)
+        self.sigSliceLoaded.emit(cacheKey, awm)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Reading slices in background threads.
+
+    Not all libraries that are used by the RTIs are thread-safe (e.g. netCDF4), so all reads of
+    RTI data that may happen outside the GUI thread must hold the RTI_READ_LOCK.
+"""
+import logging
+import threading
+
+from argos.info import DEBUGGING
+from argos.collect.slicecache import SliceCache, FrameRingBuffer
+from argos.repo.baserti import RTI_READ_LOCK
+
+logger = logging.getLogger(__name__)
+
+
+class ReadAheadWorker(object):
+    """ Reads slices in a background thread and stores them in a slice cache.
+
+        Only the most recently scheduled jobs are executed; scheduling new jobs discards the jobs
+        that have not yet started. This way the worker always reads the slices around the index
+        that the user is currently looking at.
+    """
+    def __init__(self, sliceCache):
+        """ Constructor
+
+            :param sliceCache: SliceCache (or FrameRingBuffer) where the read slices are stored.
+        """
+        assert isinstance(sliceCache, (SliceCache, FrameRingBuffer)), \
+            "sliceCache must be a SliceCache or FrameRingBuffer"
+        self._sliceCache = sliceCache
+        self._condition = threading.Condition()
+        self._jobs = []
+        self._stopped = False
+        self._thread = None
+
+
+    def schedule(self, jobs):
+        """ Replaces the pending jobs with a new list of jobs.
+
+            :param jobs: list of (cacheKey, readFunction) tuples. The read function must return
+                an ArrayWithMask, it will be called in the worker thread while holding the
+                RTI_READ_LOCK. Jobs are executed in list order.
+        """
+        with self._condition:
+            if self._stopped:
+                return
+            self._jobs = [(key, fn, self._sliceCache.generation())
+                          for key, fn in jobs if key not in self._sliceCache]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ReadAheadWorker")
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+
+    def cancel(self):
+        """ Discards all jobs that have not yet started.
+        """
+        with self._condition:
+            self._jobs = []
+
+
+    def stop(self):
+        """ Discards all pending jobs and stops the worker thread.
+        """
+        with self._condition:
+            self._stopped = True
+            self._jobs = []
+            self._condition.notify()
+
+
+    def _run(self):
+        """ Executes the jobs. Is run in the worker thread.
+        """
+        while True:
+            with self._condition:
+                while not self._jobs and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                key, readFunction, generation = self._jobs.pop(0)
+
+            if key in self._sliceCache:
+                continue
+            try:
+                with RTI_READ_LOCK:
+                    awm = readFunction()
+                # Ignored by the cache if it was invalidated during the read.
+                self._sliceCache.put(key, awm, generation=generation)
+            except Exception as ex:
+                # The RTI may have been closed in the mean time. Since this is a background
+                # optimization the error is logged and the GUI thread will read the slice itself.
+                logger.warning("Read-ahead of slice failed: {}".format(ex))
+                if DEBUGGING:
+                    logger.exception(ex)
@@ -20,13 +20,15 @@
 import logging
 from argos.config.groupcti import MainGroupCti
 from argos.info import DEBUGGING
-from argos.qt import QtWidgets, QtSlot
+from argos.qt import Qt, QtWidgets, QtSlot
 from argos.utils.cls import type_name, check_class
 from argos.widgets.constants import DOCK_SPACING, DOCK_MARGIN
 from argos.widgets.display import MessageDisplay
 
 logger = logging.getLogger(__name__)
 
+BUSY_INDICATOR_HEIGHT = 6 # Height of the progress bar that is shown while a slice is loading.
+
 class InvalidDataError(Exception):
     """ Exception that should be raised if the inspector cannot handle this type of data.
         Can be used to distuingish the situation from other exceptions an then, for example,
@@ -43,10 +45,17 @@ class UpdateReason(object):
     RTI_CHANGED         = "repo tree item changed"
     COLLECTOR_COMBO_BOX = "collector combobox changed"
     COLLECTOR_SPIN_BOX  = "collector spinbox changed"
+    COLLECTOR_RANGE     = "collector range changed"
     CONFIG_CHANGED      = "config changed"
+    DATA_APPENDED       = "data appended"
 
     __VALID_REASONS = (NEW_MAIN_WINDOW, INSPECTOR_CHANGED, RTI_CHANGED,
-                       COLLECTOR_COMBO_BOX, COLLECTOR_SPIN_BOX, CONFIG_CHANGED)
+                       COLLECTOR_COMBO_BOX, COLLECTOR_SPIN_BOX, COLLECTOR_RANGE, CONFIG_CHANGED,
+                       DATA_APPENDED)
+
+    # Ordered from the reason that requires the least work to redraw to the one requiring the most.
+    __REASONS_BY_STRENGTH = (CONFIG_CHANGED, DATA_APPENDED, COLLECTOR_SPIN_BOX, COLLECTOR_RANGE,
+                             COLLECTOR_COMBO_BOX, RTI_CHANGED, INSPECTOR_CHANGED, NEW_MAIN_WINDOW)
 
 
     @classmethod
@@ -56,6 +65,25 @@ class UpdateReason(object):
         return cls.__VALID_REASONS
 
 
+    @classmethod
+    def strength(cls, reason):
+        """ Returns a number that is higher for reasons that require a more complete redraw.
+            Unknown reasons (e.g. None) are the strongest since they may require anything.
+        """
+        try:
+            return cls.__REASONS_BY_STRENGTH.index(reason)
+        except ValueError:
+            return len(cls.__REASONS_BY_STRENGTH)
+
+
+    @classmethod
+    def strongest(cls, reason1, reason2):
+        """ Returns the reason that requires the most complete redraw.
+            Returns reason2 if they are equally strong.
+        """
+        return reason1 if cls.strength(reason1) > cls.strength(reason2) else reason2
+
+
     @classmethod
     def checkValid(cls, reason):
         """ Raises ValueError if the reason is not one of the valid enumerations
@@ -105,6 +133,14 @@ class AbstractInspector(QtWidgets.QStackedWidget):
 
         self.setCurrentIndex(self.CONTENTS_PAGE_IDX)
 
+        # Progress bar on top of the inspector that is shown while the collector loads the slice
+        # in the background. It is not a page of the stacked widget. It is indeterminate unless
+        # the read reports its progress.
+        self.busyIndicator = QtWidgets.QProgressBar(self)
+        self.busyIndicator.setRange(0, 0)
+        self.busyIndicator.setTextVisible(False)
+        self.busyIndicator.hide()
+
 
     def finalize(self):
         """ Is called before destruction. Can be used to clean-up resources
@@ -151,6 +187,17 @@ class AbstractInspector(QtWidgets.QStackedWidget):
         return tuple()
 
 
+    def appendsData(self):
+        """ Returns True if the inspector only reads the appended elements when it is updated
+            because data has been appended to the RTI (see Collector.getAppendedArray). The
+            slice is then not loaded in advance.
+
+            The base implementation returns False. Descendants can override this, the result may
+            depend on the current state of the inspector.
+        """
+        return False
+
+
     @property
     def collector(self):
         """ The data collector from where this inspector gets its data
@@ -158,6 +205,55 @@ class AbstractInspector(QtWidgets.QStackedWidget):
         return self._collector
 
 
+    @QtSlot(bool)
+    def setBusy(self, busy):
+        """ Shows or hides the busy indicator and busy cursor. The old contents remain visible.
+
+            Is called while the collector is loading the slice in a worker thread.
+        """
+        if busy:
+            self.setCursor(Qt.BusyCursor)
+            self.busyIndicator.setRange(0, 0) # indeterminate until progress is reported
+            self._positionBusyIndicator()
+            self.busyIndicator.show()
+            self.busyIndicator.raise_()
+        else:
+            self.unsetCursor()
+            self.busyIndicator.hide()
+
+
+    @QtSlot(float)
+    def setProgress(self, fraction):
+        """ Shows the fraction (between 0 and 1) of the slice that has been loaded.
+        """
+        self.busyIndicator.setRange(0, 100)
+        self.busyIndicator.setValue(int(round(100 * fraction)))
+
+
+    def _positionBusyIndicator(self):
+        """ Places the busy indicator along the top of the inspector.
+        """
+        self.busyIndicator.setGeometry(0, 0, self.width(), BUSY_INDICATOR_HEIGHT)
+
+
+    def resizeEvent(self, event):
+        """ Keeps the busy indicator at the top of the inspector.
+        """
+        super(AbstractInspector, self).resizeEvent(event)
+        self._positionBusyIndicator()
+
+
+    def comboSlices(self, reason=None):
+        """ Returns the comboSlices (see Collector.getSlicedArray) with which the inspector will
+            get the sliced array when it is drawn for the reason. Is used by the main window
+            to load that slice in advance.
+
+            The base implementation returns None, which means that the complete array is read.
+            Descendants that override this must call getSlicedArray with the same comboSlices.
+        """
+        return None
+
+
     def configValue(self, nodePath):
         """ Returns the config value data at the node path
         """
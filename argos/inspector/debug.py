@@ -103,7 +103,7 @@ class DebugInspector(AbstractInspector):
         """
         logger.debug("DebugInspector._drawContents: {}".format(self))
 
-        slicedArray = self.collector.getSlicedArray()
+        slicedArray = self.collector.getSlicedArray(copy=False)
         if slicedArray is None:
             text = "<None>"
         else:
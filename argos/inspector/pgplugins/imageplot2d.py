@@ -19,16 +19,20 @@
 """
 from __future__ import division, print_function
 
-import logging, math
+import logging, math, threading
 import numpy as np
+import numpy.ma as ma
 import pyqtgraph as pg
 
 from functools import partial
 from collections import OrderedDict
+from argos.collect.decimation import (decimatedSlices, intersectSlices, normalizeSlice,
+                                      slicesCover)
 from argos.info import DEBUGGING
 from argos.config.boolcti import BoolCti, BoolGroupCti
 from argos.config.choicecti import ChoiceCti
 from argos.config.groupcti import MainGroupCti
+from argos.config.intcti import IntCti
 from argos.inspector.abstract import AbstractInspector, InvalidDataError, UpdateReason
 from argos.inspector.pgplugins.pgctis import (X_AXIS, Y_AXIS, BOTH_AXES, viewBoxAxisRange,
                                                  defaultAutoRangeMethods, PgAxisLabelCti,
@@ -37,10 +41,16 @@ from argos.inspector.pgplugins.pgctis import (X_AXIS, Y_AXIS, BOTH_AXES, viewBox
                                                  PgGradientEditorItemCti, setXYAxesAutoRangeOn,
                                                  PgPlotDataItemCti)
 from argos.inspector.pgplugins.pgplotitem import ArgosPgPlotItem
-from argos.inspector.pgplugins.pghistlutitem import HistogramLUTItem
-from argos.qt import Qt, QtCore, QtGui, QtSlot
-from argos.utils.cls import array_has_real_numbers, check_class, is_an_array, to_string
-from argos.utils.masks import replaceMaskedValueWithFloat, maskedNanPercentile, ArrayWithMask
+from argos.inspector.pgplugins.pgimageitem import ArgosImageItem
+from argos.inspector.pgplugins.pghistlutitem import HistogramLUTItem, imageHistogram
+from argos.qt import Qt, QtCore, QtGui, QtWidgets, QtSignal, QtSlot
+from argos.utils.cls import array_has_real_numbers, check_class, to_string
+from argos.utils.masks import (replaceMaskedValueWithFloat, replaceMaskedAndInfWithNan,
+                               maskedNanPercentile, ArrayWithMask)
+from argos.utils.percentiles import (DISCARD_PERCENTAGES, SAMPLE_SIZE, discardedRange,
+                                     PercentileStatistics, setPercentileStatistics,
+                                     hasApproximatePercentiles)
+from argos.utils.pyramid import ImagePyramid, PYRAMID_AGGREGATIONS
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +61,40 @@ ROW_IMAGE,    COL_IMAGE    = 2, 1
 ROW_VER_LINE, COL_VER_LINE = 2, 2
 ROW_PROBE,    COL_PROBE    = 3, 0  # colspan = 2
 
+# With level of detail on, images are read with a step so that they are not much larger than
+# the view box. The view box is assumed to be at least this many pixels (it can be small or not
+# yet laid out before the first draw).
+MIN_LOD_PIXELS = 256
+
+# Time in ms after the last zoom, pan or resize before the visible region is read again.
+LOD_REFINE_DELAY = 200
+
+# The auto-ranges of images with more elements (in millions) are estimated from a sample.
+DEFAULT_APPROXIMATE_RANGES_FROM = 16
+MEGA = 1024 * 1024
+
+# Images of these types are passed to PyQtGraph as they are if nothing is masked. PyQtGraph then
+# combines the color levels and the color map into a single lookup table.
+NATIVE_IMAGE_TYPES = (np.uint8, np.uint16)
+
+# The cross-hairs are updated at most once per this many ms (about the display refresh rate).
+CROSS_HAIR_UPDATE_INTERVAL = 16
+
+# Number of cross sections (rows or columns) of which the plot data is remembered.
+CROSS_SECTION_CACHE_SIZE = 64
+
+# Images with more elements than this many times the number of pixels of the view box are
+# rendered from an image pyramid (if the image pyramid is on).
+PYRAMID_VIEW_FACTOR = 4
+
+
+
+def _crossSection(slicedArray, index):
+    """ Returns the row or column of the sliced array (an ArrayWithMask) as a masked array.
+        Only the mask of the cross section is unpacked if the mask is packed.
+    """
+    return ma.masked_array(data=slicedArray.data[index], mask=slicedArray.maskAt(index),
+                           fill_value=slicedArray.fill_value)
 
 
 def calcPgImagePlot2dDataRange(pgImagePlot2d, percentage, crossPlot):
@@ -72,20 +116,27 @@ def calcPgImagePlot2dDataRange(pgImagePlot2d, percentage, crossPlot):
 
     elif crossPlot == 'horizontal':
         if pgImagePlot2d.crossPlotRow is not None:
-            array = pgImagePlot2d.slicedArray.asMaskedArray()[pgImagePlot2d.crossPlotRow, :]
+            array = _crossSection(pgImagePlot2d.slicedArray, (pgImagePlot2d.crossPlotRow,
+                                                              slice(None)))
         else:
             array = pgImagePlot2d.slicedArray # fall back on complete sliced array
 
     elif crossPlot == 'vertical':
         if pgImagePlot2d.crossPlotCol is not None:
-            array = pgImagePlot2d.slicedArray.asMaskedArray()[:, pgImagePlot2d.crossPlotCol]
+            array = _crossSection(pgImagePlot2d.slicedArray, (slice(None),
+                                                              pgImagePlot2d.crossPlotCol))
         else:
             array = pgImagePlot2d.slicedArray # fall back on complete sliced array
     else:
         raise ValueError("crossPlot must be: None, 'horizontal' or 'vertical', got: {}"
                          .format(crossPlot))
 
-    return maskedNanPercentile(array, (percentage, 100-percentage) )
+    if array is pgImagePlot2d.slicedArray:
+        # The percentiles of the whole image are shared with the other range methods.
+        return discardedRange(array, percentage,
+                              maxExactElements=pgImagePlot2d.maxExactRangeElements)
+    else:
+        return maskedNanPercentile(array, (percentage, 100-percentage) )
 
 
 def crossPlotAutoRangeMethods(pgImagePlot2d, crossPlot, intialItems=None):
@@ -104,13 +155,13 @@ def crossPlotAutoRangeMethods(pgImagePlot2d, crossPlot, intialItems=None):
     if crossPlot:
         rangeFunctions['cross all data'] = partial(calcPgImagePlot2dDataRange, pgImagePlot2d,
                                                    0.0, crossPlot)
-        for percentage in [0.1, 0.2, 0.5, 1, 2, 5, 10, 20]:
+        for percentage in DISCARD_PERCENTAGES[1:]:
             label = "cross discard {}%".format(percentage)
             rangeFunctions[label] = partial(calcPgImagePlot2dDataRange, pgImagePlot2d,
                                             percentage, crossPlot)
 
     # Always add functions that determine the data from the complete sliced array.
-    for percentage in [0.1, 0.2, 0.5, 1, 2, 5, 10, 20]:
+    for percentage in DISCARD_PERCENTAGES[1:]:
         rangeFunctions['image all data'] = partial(calcPgImagePlot2dDataRange, pgImagePlot2d,
                                                    0.0, None)
 
@@ -176,6 +227,34 @@ class PgImagePlot2dCti(MainGroupCti):
 
         self.insertChild(PgGradientEditorItemCti(self.pgImagePlot2d.histLutItem.gradient))
 
+        # Read large images with a step so that only the displayed pixels are read. The visible
+        # region is read again at a higher resolution when zooming in.
+        self.lodCti = self.insertChild(BoolCti('level of detail', True))
+
+        # If on, the visible region becomes the sub range of the collector after zooming or
+        # panning, so that only that region is read for the next slices. Resetting the axes resets
+        # the range. Off by default since the ranges and histogram then only cover that region.
+        self.zoomSetsRangeCti = self.insertChild(BoolCti('zoom sets collector range', False))
+
+        # The type of the image that is passed to PyQtGraph. Integer data is converted to it.
+        self.renderTypeCti = self.insertChild(
+            ChoiceCti('render type', 0, configValues=['float32', 'float64']))
+
+        # Unmasked 8 and 16 bit images are colored with a lookup table, without conversion.
+        self.nativeIntegersCti = self.insertChild(BoolCti('native integer images', True))
+
+        # Images that are much larger than the view box are rendered from a pyramid of levels with
+        # a reduced resolution. Only the tiles of the level that are visible are rendered.
+        self.pyramidCti = self.insertChild(
+            ChoiceCti('image pyramid', 1, configValues=['off'] + list(PYRAMID_AGGREGATIONS)))
+
+        # The auto-ranges of larger images are estimated from a random sample. The 'Refine
+        # Ranges Exactly' action of the context menu calculates them exactly.
+        self.approximateRangesCti = self.insertChild(
+            IntCti('approximate ranges from', DEFAULT_APPROXIMATE_RANGES_FROM, minValue=0,
+                   maxValue=64 * 1024, stepSize=16, suffix=" M elements",
+                   specialValueText="never"))
+
         # Probe and cross-hair plots
         self.probeCti = self.insertChild(BoolCti('show probe', True))
 
@@ -253,6 +332,11 @@ class PgImagePlot2dCti(MainGroupCti):
 class PgImagePlot2d(AbstractInspector):
     """ Inspector that contains a PyQtGraph 2-dimensional image plot.
     """
+    # Emitted from the pyramid worker thread when a level of the pyramid has been built.
+    _sigPyramidLevelBuilt = QtSignal(object, int)
+
+    # Emitted from a worker thread with the sliced array and its exact PercentileStatistics.
+    _sigExactRangesCalculated = QtSignal(object, object)
 
     def __init__(self, collector, parent=None):
         """ Constructor. See AbstractInspector constructor for parameters.
@@ -264,6 +348,36 @@ class PgImagePlot2d(AbstractInspector):
         # in the collector.
         self.slicedArray = None
 
+        # The image as it is passed to PyQtGraph (i.e. masked values replaced by NaNs).
+        # It is reused when only the configuration has changed.
+        self.imageArray = None
+
+        # Buffer in which the image is converted. It is reused if the next image has the same
+        # shape and render type, so that no memory has to be allocated for every new slice.
+        self._renderBuffer = None
+
+        # The slices (one per axis) that were used to read the sliced array when the level of
+        # detail is on, or a sub range is selected in the collector. The sliced array is then a
+        # (decimated) region of the complete array. None if the complete array was read.
+        self.lodSlices = None
+        self._viewChangedManually = False # True if the user zoomed or panned since the last read
+        self._lodRefineSlices = None # The slices of the region that is loaded to refine the LOD.
+        self._lodRefineTimer = QtCore.QTimer()
+        self._lodRefineTimer.setSingleShot(True)
+        self._lodRefineTimer.setInterval(LOD_REFINE_DELAY)
+        self._lodRefineTimer.timeout.connect(self.refineLevelOfDetail)
+
+        # The percentiles of the auto-range methods are estimated for sliced arrays with more
+        # elements. See the approximateRangesCti. None means always exact.
+        self.maxExactRangeElements = None
+        self._exactRangesArray = None # The sliced array of which exact percentiles are calculated.
+
+        # The pyramid from which the image array is rendered. None if it is rendered directly.
+        self._pyramid = None
+        self._pyramidRegion = None         # (level, tileSlices, isBuilt) of the region shown.
+        self._pyramidRequestedLevel = 0    # The highest level that the worker is asked to build.
+        self._imageHistogram = None        # The histogram of the complete image array.
+
         self.titleLabel = pg.LabelItem('title goes here...')
 
         # The image item
@@ -271,7 +385,9 @@ class PgImagePlot2d(AbstractInspector):
         self.viewBox = self.imagePlotItem.getViewBox()
         self.viewBox.disableAutoRange(BOTH_AXES)
 
-        self.imageItem = pg.ImageItem()
+        # The image is given in row-major order (i.e. with the dimensions in the order of the
+        # sliced array) so that a C-contiguous slice is rendered without being transposed.
+        self.imageItem = ArgosImageItem(axisOrder='row-major')
         self.imagePlotItem.addItem(self.imageItem)
 
         self.histLutItem = HistogramLUTItem() # what about GradientLegend?
@@ -305,8 +421,51 @@ class PgImagePlot2d(AbstractInspector):
         self.imagePlotItem.addItem(self.crossLineVertical, ignoreBounds=True)
         self.imagePlotItem.addItem(self.crossLineHorizontal, ignoreBounds=True)
 
+        # The lines at the cursor in the cross-hair plots. They are created once and moved.
+        self.horCrossLineShadow90 = pg.InfiniteLine(angle=90, movable=False,
+                                                    pen=self.crossShadowPen)
+        self.horCrossLine90 = pg.InfiniteLine(angle=90, movable=False, pen=self.crossPen)
+        self.verCrossLineShadow0 = pg.InfiniteLine(angle=0, movable=False,
+                                                   pen=self.crossShadowPen)
+        self.verCrossLine0 = pg.InfiniteLine(angle=0, movable=False, pen=self.crossPen)
+
+        self.horCrossPlotItem.addItem(self.horCrossLineShadow90, ignoreBounds=True)
+        self.horCrossPlotItem.addItem(self.horCrossLine90, ignoreBounds=True)
+        self.verCrossPlotItem.addItem(self.verCrossLineShadow0, ignoreBounds=True)
+        self.verCrossPlotItem.addItem(self.verCrossLine0, ignoreBounds=True)
+
+        # The items that plot the cross sections. They are created in _drawContents (with the
+        # cross pen config) and their data is set when the mouse moves to another row or column.
+        self.horPlotDataItem = None
+        self.verPlotDataItem = None
+        self._horPlotDataRow = None # The row of the sliced array in the horPlotDataItem
+        self._verPlotDataCol = None # The column of the sliced array in the verPlotDataItem
+
+        # The (dataRow, dataCol) of the cross-hair. (None, None) if there is no data at the cursor
+        # and None if the cross-hair must be updated (e.g. after a redraw).
+        self._crossHairIndex = None
+
+        # The plot data of the cross sections of the sliced array, so that moving back and forth
+        # over the same rows and columns doesn't repeat the calculations.
+        self._crossSections = OrderedDict()
+        self._crossSectionCoordinates = {}
+        self._crossSectionsArray = None # The sliced array of the cached cross sections
+
+        # The mouse position is processed at most once per CROSS_HAIR_UPDATE_INTERVAL.
+        self._mouseScenePos = None
+        self._crossHairTimer = QtCore.QTimer()
+        self._crossHairTimer.setSingleShot(True)
+        self._crossHairTimer.setInterval(CROSS_HAIR_UPDATE_INTERVAL)
+        self._crossHairTimer.timeout.connect(self._updateCrossHairs)
+
         self.probeLabel = pg.LabelItem('', justify='left')
 
+        self.refineRangesAction = QtWidgets.QAction(
+            "Refine Ranges Exactly", self, triggered=self.refineRangesExactly,
+            statusTip="Calculates the approximate auto-ranges from all data")
+        self.refineRangesAction.setEnabled(False)
+        self.imagePlotItem.addAction(self.refineRangesAction)
+
         # Layout
 
         # Hiding the horCrossPlotItem and horCrossPlotItem will still leave some space in the
@@ -340,12 +499,36 @@ class PgImagePlot2d(AbstractInspector):
         # Based mouseMoved on crosshair.py from the PyQtGraph examples directory.
         # I did not use the SignalProxy because I did not see any difference.
         self.imagePlotItem.scene().sigMouseMoved.connect(self.mouseMoved)
+        self.viewBox.sigRangeChanged.connect(self._scheduleLodRefine)
+        self.viewBox.sigRangeChanged.connect(self._updatePyramidRegion)
+        self.viewBox.sigRangeChangedManually.connect(self._viewRangeChangedManually)
+        self.viewBox.sigResized.connect(self._scheduleLodRefine)
+        self.viewBox.sigResized.connect(self._updatePyramidRegion)
+        self.imagePlotItem.sigAxisReset.connect(self._resetCollectorRanges)
+        self.collector.sigSliceLoaded.connect(self._lodRegionLoaded)
+        self._sigPyramidLevelBuilt.connect(self._pyramidLevelBuilt,
+                                           type=QtCore.Qt.QueuedConnection)
+        self._sigExactRangesCalculated.connect(self._exactRangesCalculated,
+                                               type=QtCore.Qt.QueuedConnection)
 
 
     def finalize(self):
         """ Is called before destruction. Can be used to clean-up resources.
         """
         logger.debug("Finalizing: {}".format(self))
+        self._lodRefineTimer.stop()
+        self._crossHairTimer.stop()
+        if self._pyramid is not None:
+            self._pyramid.cancel()
+        self._sigPyramidLevelBuilt.disconnect(self._pyramidLevelBuilt)
+        self._sigExactRangesCalculated.disconnect(self._exactRangesCalculated)
+        self.collector.sigSliceLoaded.disconnect(self._lodRegionLoaded)
+        self.imagePlotItem.sigAxisReset.disconnect(self._resetCollectorRanges)
+        self.viewBox.sigResized.disconnect(self._updatePyramidRegion)
+        self.viewBox.sigResized.disconnect(self._scheduleLodRefine)
+        self.viewBox.sigRangeChangedManually.disconnect(self._viewRangeChangedManually)
+        self.viewBox.sigRangeChanged.disconnect(self._updatePyramidRegion)
+        self.viewBox.sigRangeChanged.disconnect(self._scheduleLodRefine)
         self.imagePlotItem.scene().sigMouseMoved.disconnect(self.mouseMoved)
         self.imagePlotItem.close()
         self.graphicsLayoutWidget.close()
@@ -359,6 +542,15 @@ class PgImagePlot2d(AbstractInspector):
         return tuple(['Y', 'X'])
 
 
+    def appendsData(self):
+        """ The image plot only reads the rows or columns that have been appended to the RTI,
+            unless the level of detail is on or a sub range is selected. In that case the image
+            is read again and must be loaded in advance (see _drawContents).
+        """
+        return (self.imageArray is not None and self.lodSlices is None and
+                self.comboSlices(UpdateReason.DATA_APPENDED) is None)
+
+
     def _hasValidData(self):
         """ Returns True if the inspector has data that can be plotted.
         """
@@ -370,9 +562,20 @@ class PgImagePlot2d(AbstractInspector):
         """
         logger.debug("Clearing inspector contents")
         self.titleLabel.setText('')
+        self.refineRangesAction.setEnabled(False)
 
         # Don't clear the imagePlotItem, the imageItem is only added in the constructor.
         self.imageItem.clear()
+        self.imageItem.setExtent(None)
+        self.imageArray = None
+        self._renderBuffer = None
+        self.lodSlices = None
+        self._lodRefineSlices = None
+        self._exactRangesArray = None
+        if self._pyramid is not None:
+            self._pyramid.cancel()
+            self._pyramid = None
+        self._imageHistogram = None
         self.imagePlotItem.setLabel('left', '')
         self.imagePlotItem.setLabel('bottom', '')
 
@@ -382,15 +585,13 @@ class PgImagePlot2d(AbstractInspector):
         self.histLutItem.setLevels(0, 100)
 
         self.crossPlotRow, self.crossPlotCol = None, None
+        self._crossHairIndex = None
+        self._crossSections.clear()
+        self._crossSectionCoordinates.clear()
+        self._crossSectionsArray = None
 
         self.probeLabel.setText('')
-        self.crossLineHorizontal.setVisible(False)
-        self.crossLineVertical.setVisible(False)
-        self.crossLineHorShadow.setVisible(False)
-        self.crossLineVerShadow.setVisible(False)
-
-        self.horCrossPlotItem.clear()
-        self.verCrossPlotItem.clear()
+        self._hideCrossHairs()
 
 
     def _drawContents(self, reason=None, initiator=None):
@@ -401,6 +602,7 @@ class PgImagePlot2d(AbstractInspector):
         """
         self.crossPlotRow = None # reset because the sliced array shape may change
         self.crossPlotCol = None # idem dito
+        self._resetCrossPlotDataItems()
 
         gridLayout = self.graphicsLayoutWidget.ci.layout # A QGraphicsGridLayout
 
@@ -430,7 +632,23 @@ class PgImagePlot2d(AbstractInspector):
                 self.verPlotAdded = False
                 gridLayout.activate()
 
-        self.slicedArray = self.collector.getSlicedArray()
+        # If only the configuration has changed (e.g. the color map or the grid), the data is the
+        # same as during the previous draw and the image that was set in PyQtGraph is reused.
+        comboSlices = self.comboSlices(reason)
+        reuseImage = (reason == UpdateReason.CONFIG_CHANGED and self.imageArray is not None
+                      and comboSlices == self.lodSlices
+                      and self.imageArray.dtype == self._imageType())
+
+        # If rows or columns have been appended to the RTI, only they are read and converted.
+        # Images that are read with a level of detail are read again (at the screen resolution).
+        if (reason == UpdateReason.DATA_APPENDED and self.imageArray is not None
+                and comboSlices is None and self.lodSlices is None):
+            reuseImage = self._appendData()
+
+        if not reuseImage:
+            self.slicedArray = self.collector.getSlicedArray(copy=False, comboSlices=comboSlices)
+            self.lodSlices = comboSlices
+            self._lodRefineSlices = None # A region that is still loading is superseded.
 
         if not self._hasValidData():
             self._clearContents()
@@ -438,23 +656,12 @@ class PgImagePlot2d(AbstractInspector):
 
         # -- Valid plot data from here on --
 
-        # PyQtGraph doesn't handle masked array so we convert the masked values to Nans. Missing
-        # data values are replaced by NaNs. The PyQtGraph image plot shows this as the color at the
-        # lowest end of the color scale. Unfortunately we cannot choose a missing-value color, but
-        # at least the Nans do not influence for the histogram and color range.
-        # We don't update self.slicedArray here because the data probe should still be able to
-        # print the actual value.
-        imageArray = replaceMaskedValueWithFloat(self.slicedArray.data, self.slicedArray.mask,
-                                                 np.nan, copyOnReplace=True)
-
-        # Replace infinite value with Nans because PyQtGraph fails on them. WNote that the CTIs of
-        # the cross plots (e.g. horCrossPlotRangeCti) are still connected to self.slicedArray, so
-        # if the cross section consists of only infs, they may not able to update the autorange.
-        # A warning is issued in that case.
-        # We don't update self.slicedArray here because the data probe should still be able to
-        # print the actual value.
-        imageArray = replaceMaskedValueWithFloat(imageArray, np.isinf(self.slicedArray.data),
-                                                 np.nan, copyOnReplace=True)
+        if not reuseImage:
+            self._setImageFromSlicedArray()
+        elif self._pyramidAggregation(self.imageArray) != self._currentPyramidAggregation():
+            self._setPyramid(self._pyramidAggregation(self.imageArray))
+
+        self.maxExactRangeElements = self.config.approximateRangesCti.configValue * MEGA
 
         # Reset the axes ranges (via the config)
         if (reason == UpdateReason.RTI_CHANGED or
@@ -466,42 +673,646 @@ class PgImagePlot2d(AbstractInspector):
             self.config.horCrossPlotRangeCti.autoRangeCti.data = True
             self.config.verCrossPlotRangeCti.autoRangeCti.data = True
 
-        # PyQtGraph uses the following dimension order: T, X, Y, Color.
-        # We need to transpose the slicedArray ourselves because axes = {'x':1, 'y':0}
-        # doesn't seem to do anything.
-        imageArray = imageArray.transpose()
-        self.imageItem.setImage(imageArray, autoLevels=False)
-
         self.horCrossPlotItem.invertX(self.config.xFlippedCti.configValue)
         self.verCrossPlotItem.invertY(self.config.yFlippedCti.configValue)
 
         self.probeLabel.setVisible(self.config.probeCti.configValue)
 
-        self.titleLabel.setText(self.configValue('title').format(**self.collector.rtiInfo))
-
         # Update the config tree from the (possibly) new state of the PgImagePlot2d inspector,
         # e.g. the axis range or color range may have changed while drawing.
         self.config.updateTarget()
 
+        self._updateTitle()
+
+        # Show the cross-hair of the new image at the last known mouse position.
+        if self._mouseScenePos is not None:
+            self._crossHairTimer.start()
+
+
+    def _updateTitle(self):
+        """ Sets the title. It mentions if the auto-ranges are estimated from a sample.
+        """
+        title = self.configValue('title').format(**self.collector.rtiInfo)
+        approximate = hasApproximatePercentiles(self.slicedArray)
+        if approximate:
+            title += " <span style='color: #808080'>(approximate ranges)</span>"
+        self.titleLabel.setText(title)
+        self.refineRangesAction.setEnabled(approximate and
+                                           self._exactRangesArray is not self.slicedArray)
+
+
+    @QtSlot()
+    def refineRangesExactly(self):
+        """ Calculates the percentiles of the auto-range methods from all data of the sliced array
+            instead of from a sample, and applies the ranges again.
+
+            The percentiles are calculated in a worker thread, since this takes seconds for the
+            huge images of which they are estimated. See _exactRangesCalculated.
+        """
+        if not self._hasValidData() or self._exactRangesArray is self.slicedArray:
+            return
+
+        self._exactRangesArray = self.slicedArray
+        self.refineRangesAction.setEnabled(False)
+
+        thread = threading.Thread(target=self._calculateExactRanges, args=(self.slicedArray, ),
+                                  name="ExactRangesCalculator")
+        thread.daemon = True
+        thread.start()
+
+
+    def _calculateExactRanges(self, slicedArray):
+        """ Calculates the exact percentiles of the sliced array. Is executed in a worker thread.
+        """
+        try:
+            statistics = PercentileStatistics(slicedArray)
+        except Exception as ex:
+            logger.warning("Calculating the exact ranges failed: {}".format(ex))
+            if DEBUGGING:
+                logger.exception(ex)
+            statistics = None
+        self._sigExactRangesCalculated.emit(slicedArray, statistics)
+
+
+    @QtSlot(object, object)
+    def _exactRangesCalculated(self, slicedArray, statistics):
+        """ Is called in the GUI thread when the exact percentiles have been calculated. Applies
+            the ranges again if the sliced array is still shown.
+        """
+        if slicedArray is self._exactRangesArray:
+            self._exactRangesArray = None
+
+        if statistics is None or slicedArray is not self.slicedArray:
+            self._updateTitle()
+            return
+
+        try:
+            setPercentileStatistics(slicedArray, statistics) # Replaces the approximate ones.
+            self.config.updateTarget()
+            self._updateTitle()
+        except Exception as ex:
+            # This is a slot and thus must not throw exceptions.
+            if DEBUGGING:
+                raise
+            else:
+                logger.exception(ex)
+
+
+    def _renderType(self):
+        """ Returns the (floating point) numpy dtype of the image that is passed to PyQtGraph.
+        """
+        return np.dtype(self.config.renderTypeCti.configValue)
+
+
+    def _imageType(self):
+        """ Returns the numpy dtype of the image that is passed to PyQtGraph for the sliced array.
+
+            This is the type of the sliced array itself if it is an 8 or 16 bit unsigned integer
+            array without masked values (and native integer images are on), else the render type.
+        """
+        if (self.config.nativeIntegersCti.configValue and not self.slicedArray.hasMask and
+                self.slicedArray.dtype in NATIVE_IMAGE_TYPES):
+            return self.slicedArray.dtype
+        else:
+            return self._renderType()
+
+
+    def _setImageFromSlicedArray(self):
+        """ Converts the sliced array to the image array and sets it in the image item.
+        """
+        if self._imageType() == self.slicedArray.dtype:
+            # Integer images are passed without conversion. They can't contain NaNs or infinities.
+            self._setImage(self.slicedArray.data)
+            return
+
+        # PyQtGraph doesn't handle masked array so we convert the masked values to Nans. Missing
+        # data values are replaced by NaNs. The PyQtGraph image plot shows this as the color at the
+        # lowest end of the color scale. Unfortunately we cannot choose a missing-value color, but
+        # at least the Nans do not influence for the histogram and color range.
+        # Infinite values are also replaced with Nans because PyQtGraph fails on them. Note that
+        # the CTIs of the cross plots (e.g. horCrossPlotRangeCti) are still connected to
+        # self.slicedArray, so if the cross section consists of only infs, they may not able to
+        # update the autorange. A warning is issued in that case.
+        # We don't update self.slicedArray here because the data probe should still be able to
+        # print the actual value. The conversion is done in a single pass into the render buffer.
+        imageArray = replaceMaskedAndInfWithNan(self.slicedArray.data, self.slicedArray.mask,
+                                                dtype=self._renderType(), out=self._renderBuffer)
+        if imageArray is not self.slicedArray.data:
+            self._renderBuffer = imageArray
+
+        self._setImage(imageArray)
+
+
+    def _appendData(self):
+        """ Reads the rows or columns that have been appended to the sliced array and appends
+            them to the image.
+
+            Returns False if they can't be appended (e.g. if a sub range is selected), the
+            complete slice must then be read.
+        """
+        appended = self.collector.getAppendedArray(self.slicedArray.shape, copy=False)
+        if appended is None:
+            return False
+
+        axis, appendedArray = appended
+        if appendedArray is None:
+            return True # Nothing has been appended
+
+        self.slicedArray = self.slicedArray.concatenate(appendedArray, axis=axis)
+        imageType = self._imageType()
+        if imageType != self.imageArray.dtype:
+            # E.g. the appended elements contain the first masked values of an integer image.
+            self._setImageFromSlicedArray()
+        elif imageType == self.slicedArray.dtype:
+            self._setImage(self.slicedArray.data)
+        else:
+            appendedImage = replaceMaskedAndInfWithNan(appendedArray.data, appendedArray.mask,
+                                                       dtype=imageType)
+            imageArray = np.concatenate((self.imageArray, appendedImage), axis=axis)
+            self._renderBuffer = imageArray
+            self._setImage(imageArray)
+        return True
+
+
+    def _setImage(self, imageArray):
+        """ Sets the image array (with the dimensions in the order of the sliced array) in the
+            image item. Large images are rendered from a pyramid (see _pyramidAggregation).
+        """
+        self.imageArray = imageArray
+
+        # The histogram is calculated once per slice, right after the conversion, and reused by
+        # the histogram item when only the color levels, lookup table or region change. Like the
+        # auto-ranges, the histogram of larger images is estimated from a subsample.
+        maxExactElements = self.config.approximateRangesCti.configValue * MEGA
+        if maxExactElements and imageArray.size > max(maxExactElements, SAMPLE_SIZE):
+            histogram = imageHistogram(imageArray, maxElements=SAMPLE_SIZE)
+        else:
+            histogram = imageHistogram(imageArray)
+        self._imageHistogram = histogram
+
+        self._setPyramid(self._pyramidAggregation(imageArray))
+
+
+    def _showImage(self, image, level=0, offsets=(0, 0)):
+        """ Sets an image in the image item and places it at its position in the complete array.
+
+            :param image: the image array, or a region of a level of its pyramid.
+            :param level: the pyramid level of the image. Level n has 2**n times fewer elements
+                per dimension than the image array.
+            :param offsets: the (row, column) of the first image element in elements of the level.
+        """
+        # The image item uses row-major order, like the sliced array, so no transposed view is
+        # made. If the image is C-contiguous, PyQtGraph can use it without copying.
+        # The histogram is always that of the complete image array.
+        self.histLutItem.setImageHistogram(self._imageHistogram)
+        self.imageItem.setImage(image, autoLevels=False)
+
+        # Place the (decimated) region at its position in the complete array.
+        factor = 2 ** level
+        (rowStart, rowStep), (colStart, colStep) = self._lodStartsAndSteps()
+        rowScale, colScale = rowStep * factor, colStep * factor
+        rowOffset, colOffset = offsets
+        self.imageItem.setTransform(QtGui.QTransform(colScale, 0, 0, rowScale,
+                                                     colStart + colOffset * colScale,
+                                                     rowStart + rowOffset * rowScale))
+
+        # Auto-ranging the view box shows the complete image array, not only the region.
+        if image is self.imageArray:
+            self.imageItem.setExtent(None)
+        else:
+            numRows, numCols = self.imageArray.shape
+            self.imageItem.setExtent(QtCore.QRectF(-colOffset, -rowOffset,
+                                                   numCols / factor, numRows / factor))
+
+
+    def _pyramidAggregation(self, imageArray):
+        """ Returns the aggregation of the pyramid from which the image array is rendered, or
+            None if it is rendered directly because it is not much larger than the view box.
+        """
+        aggregation = self.config.pyramidCti.configValue
+        if aggregation == 'off':
+            return None
+        numRows, numCols = self._viewBoxPixelShape()
+        if imageArray.size <= PYRAMID_VIEW_FACTOR * numRows * numCols:
+            return None
+        return aggregation
+
+
+    def _currentPyramidAggregation(self):
+        """ Returns the aggregation of the current pyramid, or None if there is no pyramid.
+        """
+        return None if self._pyramid is None else self._pyramid.aggregation
+
+
+    def _setPyramid(self, aggregation):
+        """ Renders the image array from a new pyramid with the aggregation. If aggregation is
+            None, the image array is rendered directly (if it exists).
+        """
+        if self._pyramid is not None:
+            self._pyramid.cancel() # Stops the worker after the level that it is building.
+            self._pyramid = None
+
+        if self.imageArray is None:
+            return
+
+        if aggregation is None:
+            self._showImage(self.imageArray)
+        else:
+            logger.debug("Rendering image from a pyramid with aggregation: {}"
+                         .format(aggregation))
+            self._pyramid = ImagePyramid(self.imageArray, aggregation=aggregation)
+            self._pyramidRegion = None
+            self._pyramidRequestedLevel = 0
+
+            # The worker thread may still read the image array after the next slice has been
+            # converted, so the next slice must not be converted in the same buffer.
+            self._renderBuffer = None
+            self._updatePyramidRegion()
+
+
+    def _updatePyramidRegion(self, *_args):
+        """ Shows the region of the pyramid that is visible in the view box, at the level with
+            (about) one element per pixel. Is called when the view box range or size changes.
+
+            The region is extended to tile boundaries so that it only changes when the view has
+            moved by more than a tile. If the level has not yet been built, a strided preview is
+            shown and the level is built in a worker thread.
+        """
+        pyramid = self._pyramid
+        if pyramid is None:
+            return
+
+        try:
+            # The visible region in elements of the image array (i.e. level 0).
+            lodStartsAndSteps = self._lodStartsAndSteps()
+            regionSlices = []
+            elementsPerPixel = 1.0
+            for (viewMin, viewMax), (start, step), length, numPixels in zip(
+                    reversed(self.viewBox.viewRange()), lodStartsAndSteps, pyramid.shape,
+                    self._viewBoxPixelShape()):
+                first = min(max(0, int(math.floor((viewMin - start) / step))), length)
+                last = min(max(0, int(math.ceil((viewMax - start) / step))), length)
+                if last <= first:
+                    first, last = 0, length # Not visible, show the complete dimension.
+                regionSlices.append(slice(first, last))
+                elementsPerPixel = max(elementsPerPixel, (last - first) / numPixels)
+
+            level = pyramid.levelForScale(elementsPerPixel)
+            tileSlices = pyramid.tileRegion(level, regionSlices)
+            isBuilt = pyramid.hasLevel(level)
+            if self._pyramidRegion == (level, tileSlices, isBuilt):
+                return
+
+            if isBuilt:
+                image = pyramid.level(level)[tileSlices]
+            else:
+                image = pyramid.preview(level, tileSlices)
+                self._requestPyramidLevel(pyramid, level)
+
+            logger.debug("Showing pyramid level {} (built: {}): {}"
+                         .format(level, isBuilt, tileSlices))
+            self._pyramidRegion = (level, tileSlices, isBuilt)
+            self._showImage(image, level, tuple(slc.start for slc in tileSlices))
+        except Exception as ex:
+            # This is a slot and thus must not throw exceptions.
+            if DEBUGGING:
+                raise
+            else:
+                logger.exception(ex)
+
+
+    def _requestPyramidLevel(self, pyramid, level):
+        """ Builds the levels of the pyramid up to level in a worker thread.
+        """
+        if level <= self._pyramidRequestedLevel:
+            return # The level is already being built.
+        self._pyramidRequestedLevel = level
+
+        thread = threading.Thread(target=self._buildPyramidLevel, args=(pyramid, level),
+                                  name="PyramidBuilder")
+        thread.daemon = True
+        thread.start()
+
+
+    def _buildPyramidLevel(self, pyramid, level):
+        """ Builds the levels of the pyramid up to level. Is executed in a worker thread.
+        """
+        try:
+            if pyramid.level(level) is not None:
+                self._sigPyramidLevelBuilt.emit(pyramid, level)
+        except Exception as ex:
+            logger.warning("Building of pyramid level {} failed: {}".format(level, ex))
+            if DEBUGGING:
+                logger.exception(ex)
+
+
+    @QtSlot(object, int)
+    def _pyramidLevelBuilt(self, pyramid, _level):
+        """ Is called in the GUI thread when a pyramid level has been built. Replaces the preview
+            if the pyramid is still in use.
+        """
+        if pyramid is self._pyramid:
+            self._updatePyramidRegion()
+
+
+    def _lodStartsAndSteps(self):
+        """ Returns ((rowStart, rowStep), (colStart, colStep)) of the region that was read.
+            A sliced array element [i, j] is located at row rowStart + i * rowStep and column
+            colStart + j * colStep of the complete array.
+        """
+        if self.lodSlices is None:
+            return (0, 1), (0, 1)
+        else:
+            return tuple((slc.start, slc.step) for slc in self.lodSlices)
+
+
+    def _viewBoxPixelShape(self):
+        """ Returns the (height, width) of the view box in pixels.
+        """
+        rect = self.viewBox.sceneBoundingRect()
+        return (max(MIN_LOD_PIXELS, int(math.ceil(rect.height()))),
+                max(MIN_LOD_PIXELS, int(math.ceil(rect.width()))))
+
+
+    def _visibleRegionSlices(self, shape):
+        """ Returns the row and column slices of the part of an image of shape that is visible
+            in the view box. A dimension is selected completely if no part of it is visible.
+        """
+        regionSlices = []
+        for (viewMin, viewMax), length in zip(reversed(self.viewBox.viewRange()), shape):
+            start = min(max(0, int(math.floor(viewMin))), length)
+            stop = min(max(0, int(math.ceil(viewMax))), length)
+            regionSlices.append(slice(start, stop) if stop > start else None)
+        return regionSlices
+
+
+    def comboSlices(self, reason=None):
+        """ Returns the slices of the sliced array that are read to draw the image.
+
+            The slices are kept within the sub ranges that are selected in the collector.
+            If the level of detail is on, the array is read with a step so that it is not much
+            larger than the view box. After the slice or config has changed the currently visible
+            region is read, otherwise the complete sub range is read (as an overview).
+            Returns None if the level of detail is off and no sub range is selected.
+        """
+        shape = self.collector.getSlicedArrayShape()
+        if shape is None or len(shape) != 2:
+            return None
+
+        comboRanges = self.collector.getComboRanges()
+        if not self.config.lodCti.configValue:
+            if comboRanges == [normalizeSlice(None, length) for length in shape]:
+                return None
+            return comboRanges
+
+        if (self.lodSlices is not None and
+                reason in (UpdateReason.COLLECTOR_SPIN_BOX, UpdateReason.CONFIG_CHANGED)):
+            visibleSlices = [normalizeSlice(slc, length) for slc, length
+                             in zip(self._visibleRegionSlices(shape), shape)]
+            requiredSlices = decimatedSlices(shape, self._viewBoxPixelShape(),
+                                             intersectSlices(visibleSlices, comboRanges))
+            # Keep reading the same region if it suffices, this way the slices can be cached.
+            if slicesCover(self.lodSlices, requiredSlices):
+                return self.lodSlices
+            else:
+                return requiredSlices
+        else:
+            return decimatedSlices(shape, self._viewBoxPixelShape(), comboRanges)
+
+
+    def _scheduleLodRefine(self, *_args):
+        """ (Re)starts the timer that calls refineLevelOfDetail, so that the region is read once
+            the user has stopped zooming or panning.
+        """
+        self._lodRefineTimer.start()
+
+
+    def _viewRangeChangedManually(self, *_args):
+        """ Is called when the user has zoomed or panned with the mouse.
+        """
+        self._viewChangedManually = True
+        self._lodRefineTimer.start()
+
+
+    def _setCollectorRangesFromView(self):
+        """ Sets the sub ranges of the collector to the region that is visible in the view box.
+            The steps of the ranges are kept. Returns True if the ranges have changed.
+        """
+        shape = self.collector.getSlicedArrayShape()
+        if shape is None or len(shape) != 2:
+            return False
+
+        comboRanges = []
+        for visibleSlice, comboRange in zip(self._visibleRegionSlices(shape),
+                                            self.collector.getComboRanges()):
+            if visibleSlice is None:
+                comboRanges.append(comboRange)
+            else:
+                comboRanges.append(slice(visibleSlice.start, visibleSlice.stop, comboRange.step))
+
+        logger.debug("Setting collector ranges from view: {}".format(comboRanges))
+        return self.collector.setComboRanges(comboRanges)
+
+
+    @QtSlot(int)
+    def _resetCollectorRanges(self, axisNumber):
+        """ Selects the complete dimension(s) in the collector when an axis is reset.
+
+            :param axisNumber: 0 (X-axis), 1 (Y-axis), 2, (Both X and Y axes).
+        """
+        if not self.config.zoomSetsRangeCti.configValue:
+            return
+
+        comboRanges = self.collector.getComboRanges()
+        if comboRanges is None or len(comboRanges) != 2:
+            return
+
+        if axisNumber in (Y_AXIS, BOTH_AXES):
+            comboRanges[0] = slice(None)
+        if axisNumber in (X_AXIS, BOTH_AXES):
+            comboRanges[1] = slice(None)
+        self.collector.setComboRanges(comboRanges)
+
+
+    @QtSlot()
+    def refineLevelOfDetail(self):
+        """ Loads the visible region again if the image that is shown has a too low resolution
+            for it, e.g. after zooming in. Is called when the view box range or size has changed.
+
+            The region is loaded in the background by the collector and shown when it is loaded
+            (see _lodRegionLoaded), so the GUI doesn't freeze while zooming in on large images.
+
+            If the user has zoomed or panned and 'zoom sets collector range' is on, the visible
+            region is set as the sub range of the collector instead, which causes a redraw.
+        """
+        if not self._hasValidData():
+            return
+
+        viewChangedManually = self._viewChangedManually
+        self._viewChangedManually = False
+
+        try:
+            if viewChangedManually and self.config.zoomSetsRangeCti.configValue:
+                if self._setCollectorRangesFromView():
+                    return # The collector will cause a redraw of the new range.
+
+            if self.lodSlices is None or not self.config.lodCti.configValue:
+                return # Level of detail was not used for the image that is shown.
+
+            if self.collector.hasProjections:
+                return # Projecting reads all elements of a dimension, too slow for every zoom.
+
+            comboSlices = self.comboSlices(UpdateReason.COLLECTOR_SPIN_BOX)
+            if comboSlices == self.lodSlices or comboSlices == self._lodRefineSlices:
+                return
+
+            if self.collector.isLoading and self._lodRefineSlices is None:
+                # A slice is loaded for a redraw, a new request would cancel it. Try again later.
+                self._lodRefineTimer.start()
+                return
+
+            logger.debug("Refining level of detail: {}".format(comboSlices))
+            self._lodRefineSlices = comboSlices # Set first, the slice may be emitted at once.
+            self.collector.requestSlicedArray(comboSlices=comboSlices)
+        except Exception as ex:
+            # This is a slot and thus must not throw exceptions.
+            if DEBUGGING:
+                raise
+            else:
+                logger.exception(ex)
+
+
+    @QtSlot(object)
+    def _lodRegionLoaded(self, _slicedArray):
+        """ Is called when the collector has loaded a slice. Shows it if it is the region that
+            was requested by refineLevelOfDetail.
+
+            Other loads (e.g. for a redraw) cancel the request, the region is then not shown.
+        """
+        comboSlices = self._lodRefineSlices
+        if comboSlices is None:
+            return
+        self._lodRefineSlices = None
+
+        try:
+            if self.lodSlices is None or not self.config.lodCti.configValue:
+                return # The image has been redrawn without level of detail in the mean time.
+
+            slicedArray = self.collector.getLoadedSlicedArray(copy=False, comboSlices=comboSlices)
+            if slicedArray is None or not array_has_real_numbers(slicedArray.data):
+                return
+            self.slicedArray = slicedArray
+            self.lodSlices = comboSlices
+            self._setImageFromSlicedArray()
+        except Exception as ex:
+            # This is a slot and thus must not throw exceptions.
+            if DEBUGGING:
+                raise
+            else:
+                logger.exception(ex)
+
+
+    def _resetCrossPlotDataItems(self):
+        """ Replaces the items that plot the cross sections with new (empty) items, so that they
+            use the current cross pen config.
+        """
+        if self.horPlotDataItem is not None:
+            self.horCrossPlotItem.removeItem(self.horPlotDataItem)
+        if self.verPlotDataItem is not None:
+            self.verCrossPlotItem.removeItem(self.verPlotDataItem)
+
+        self.horPlotDataItem = self.config.crossPenCti.createPlotDataItem()
+        self.horCrossPlotItem.addItem(self.horPlotDataItem)
+        self.verPlotDataItem = self.config.crossPenCti.createPlotDataItem()
+        self.verCrossPlotItem.addItem(self.verPlotDataItem)
+
+        self._horPlotDataRow, self._verPlotDataCol = None, None
+        self._crossHairIndex = None
+
+
+    def _hideCrossHairs(self):
+        """ Hides the cross-hair lines and clears the cross sections plots.
+        """
+        for line in (self.crossLineHorizontal, self.crossLineVertical,
+                     self.crossLineHorShadow, self.crossLineVerShadow,
+                     self.horCrossLine90, self.horCrossLineShadow90,
+                     self.verCrossLine0, self.verCrossLineShadow0):
+            line.setVisible(False)
+
+        if self.horPlotDataItem is not None:
+            self.horPlotDataItem.clear()
+        if self.verPlotDataItem is not None:
+            self.verPlotDataItem.clear()
+        self._horPlotDataRow, self._verPlotDataCol = None, None
+
+
+    def _crossSectionPlotData(self, axis, index):
+        """ Returns a (coordinates, values, connected) tuple with the plot data of a row (axis=0)
+            or column (axis=1) of the sliced array.
+
+            The coordinates are the positions in the complete array. Infinite values are replaced
+            by NaNs because PyQtGraph can't handle them. Points are connected if they are finite
+            and not masked. The plot data is cached per row and column of the sliced array.
+        """
+        if self._crossSectionsArray is not self.slicedArray:
+            self._crossSections.clear()
+            self._crossSectionCoordinates.clear()
+            self._crossSectionsArray = self.slicedArray
+
+        key = (axis, index)
+        plotData = self._crossSections.get(key)
+        if plotData is not None:
+            return plotData
+
+        coordinates = self._crossSectionCoordinates.get(axis)
+        if coordinates is None:
+            start, step = self._lodStartsAndSteps()[1 - axis]
+            coordinates = start + step * np.arange(self.slicedArray.shape[1 - axis])
+            self._crossSectionCoordinates[axis] = coordinates
+
+        arrayIndex = (index, slice(None)) if axis == 0 else (slice(None), index)
+        values = self.slicedArray.data[arrayIndex]
+
+        # First determine which points are connected or separated by masks/nans.
+        connected = np.isfinite(values)
+        if self.slicedArray.hasMask:
+            np.logical_and(connected, np.logical_not(self.slicedArray.maskAt(arrayIndex)),
+                           out=connected)
+
+        # Replace infinite value with nans because PyQtGraph can't handle them
+        if values.dtype.kind == 'f':
+            values = replaceMaskedValueWithFloat(values, np.isinf(values), np.nan,
+                                                 copyOnReplace=True)
+
+        plotData = (coordinates, values, connected)
+        self._crossSections[key] = plotData
+        while len(self._crossSections) > CROSS_SECTION_CACHE_SIZE:
+            self._crossSections.popitem(last=False)
+        return plotData
+
 
     @QtSlot(object)
     def mouseMoved(self, viewPos):
+        """ Is called when the mouse moves over the scene. Remembers the position and updates
+            the cross-hairs at most once per CROSS_HAIR_UPDATE_INTERVAL.
+        """
+        self._mouseScenePos = viewPos
+        if not self._crossHairTimer.isActive():
+            self._crossHairTimer.start()
+
+
+    @QtSlot()
+    def _updateCrossHairs(self):
         """ Updates the probe text with the values under the cursor.
-            Draws a vertical line and a symbol at the position of the probe.
+            Draws the cross-hair lines at the position of the probe.
+
+            Nothing is done if the cursor is still above the same element of the sliced array.
+            The cross section plots are only updated if the row or column has changed.
         """
         try:
+            viewPos = self._mouseScenePos
             check_class(viewPos, QtCore.QPointF)
-            show_data_point = False # shows the data point as a circle in the cross hair plots
-            self.crossPlotRow, self.crossPlotCol = None, None
-
-            self.probeLabel.setText("<span style='color: #808080'>no data at cursor</span>")
-            self.crossLineHorizontal.setVisible(False)
-            self.crossLineVertical.setVisible(False)
-            self.crossLineHorShadow.setVisible(False)
-            self.crossLineVerShadow.setVisible(False)
-
-            self.horCrossPlotItem.clear()
-            self.verCrossPlotItem.clear()
+            dataRow, dataCol = None, None
 
             if (self._hasValidData() and self.slicedArray is not None
                 and self.viewBox.sceneBoundingRect().contains(viewPos)):
@@ -513,103 +1324,76 @@ class PgImagePlot2d(AbstractInspector):
                 row, col = int(row), int(col) # Needed in Python 2
                 nRows, nCols = self.slicedArray.shape
 
-                if (0 <= row < nRows) and (0 <= col < nCols):
-                    self.viewBox.setCursor(Qt.CrossCursor)
-
-                    self.crossPlotRow, self.crossPlotCol = row, col
-                    index = tuple([row, col])
-                    valueStr = to_string(self.slicedArray[index],
-                                         masked=self.slicedArray.maskAt(index),
-                                         maskFormat='&lt;masked&gt;')
-                    txt = "pos = ({:d}, {:d}), value = {}".format(row, col, valueStr)
-                    self.probeLabel.setText(txt)
-
-                    # Show cross section at the cursor pos in the line plots
-                    if self.config.horCrossPlotCti.configValue:
-                        self.crossLineHorShadow.setVisible(True)
-                        self.crossLineHorizontal.setVisible(True)
-                        self.crossLineHorShadow.setPos(row)
-                        self.crossLineHorizontal.setPos(row)
-
-                        # Line plot of cross section row.
-                        # First determine which points are connected or separated by masks/nans.
-                        rowData = self.slicedArray.data[row, :]
-                        connected = np.isfinite(rowData)
-                        if is_an_array(self.slicedArray.mask):
-                            connected = np.logical_and(connected, ~self.slicedArray.mask[row, :])
-                        else:
-                            connected = (np.zeros_like(rowData)
-                                         if self.slicedArray.mask else connected)
-
-                        # Replace infinite value with nans because PyQtGraph can't handle them
-                        rowData = replaceMaskedValueWithFloat(rowData, np.isinf(rowData),
-                                                              np.nan, copyOnReplace=True)
-
-                        horPlotDataItem = self.config.crossPenCti.createPlotDataItem()
-                        horPlotDataItem.setData(rowData, connect=connected)
-                        self.horCrossPlotItem.addItem(horPlotDataItem)
-
-                        # Vertical line in hor-cross plot
-                        crossLineShadow90 = pg.InfiniteLine(angle=90, movable=False,
-                                                            pen=self.crossShadowPen)
-                        crossLineShadow90.setPos(col)
-                        self.horCrossPlotItem.addItem(crossLineShadow90, ignoreBounds=True)
-                        crossLine90 = pg.InfiniteLine(angle=90, movable=False, pen=self.crossPen)
-                        crossLine90.setPos(col)
-                        self.horCrossPlotItem.addItem(crossLine90, ignoreBounds=True)
-
-                        if show_data_point:
-                            crossPoint90 = pg.PlotDataItem(symbolPen=self.crossPen)
-                            crossPoint90.setSymbolBrush(QtGui.QBrush(self.config.crossPenCti.penColor))
-                            crossPoint90.setSymbolSize(10)
-                            crossPoint90.setData((col,), (rowData[col],))
-                            self.horCrossPlotItem.addItem(crossPoint90, ignoreBounds=True)
-
-                        self.config.horCrossPlotRangeCti.updateTarget() # update auto range
-                        del rowData # defensive programming
-
-                    if self.config.verCrossPlotCti.configValue:
-                        self.crossLineVerShadow.setVisible(True)
-                        self.crossLineVertical.setVisible(True)
-                        self.crossLineVerShadow.setPos(col)
-                        self.crossLineVertical.setPos(col)
-
-                        # Line plot of cross section row.
-                        # First determine which points are connected or separated by masks/nans.
-                        colData = self.slicedArray.data[:, col]
-                        connected = np.isfinite(colData)
-                        if is_an_array(self.slicedArray.mask):
-                            connected = np.logical_and(connected, ~self.slicedArray.mask[:, col])
-                        else:
-                            connected = (np.zeros_like(colData)
-                                         if self.slicedArray.mask else connected)
-
-                        # Replace infinite value with nans because PyQtGraph can't handle them
-                        colData = replaceMaskedValueWithFloat(colData, np.isinf(colData),
-                                                              np.nan, copyOnReplace=True)
-
-                        verPlotDataItem = self.config.crossPenCti.createPlotDataItem()
-                        verPlotDataItem.setData(colData, np.arange(nRows), connect=connected)
-                        self.verCrossPlotItem.addItem(verPlotDataItem)
-
-                        # Horizontal line in ver-cross plot
-                        crossLineShadow0 = pg.InfiniteLine(angle=0, movable=False,
-                                                           pen=self.crossShadowPen)
-                        crossLineShadow0.setPos(row)
-                        self.verCrossPlotItem.addItem(crossLineShadow0, ignoreBounds=True)
-                        crossLine0 = pg.InfiniteLine(angle=0, movable=False, pen=self.crossPen)
-                        crossLine0.setPos(row)
-                        self.verCrossPlotItem.addItem(crossLine0, ignoreBounds=True)
-
-                        if show_data_point:
-                            crossPoint0 = pg.PlotDataItem(symbolPen=self.crossPen)
-                            crossPoint0.setSymbolBrush(QtGui.QBrush(self.config.crossPenCti.penColor))
-                            crossPoint0.setSymbolSize(10)
-                            crossPoint0.setData((colData[row],), (row,))
-                            self.verCrossPlotItem.addItem(crossPoint0, ignoreBounds=True)
-
-                        self.config.verCrossPlotRangeCti.updateTarget() # update auto range
-                        del colData # defensive programming
+                # The index in the sliced array, which may be a decimated region.
+                (rowStart, rowStep), (colStart, colStep) = self._lodStartsAndSteps()
+                if (0 <= (row - rowStart) // rowStep < nRows and
+                        0 <= (col - colStart) // colStep < nCols):
+                    dataRow = (row - rowStart) // rowStep
+                    dataCol = (col - colStart) // colStep
+
+            if (dataRow, dataCol) == self._crossHairIndex:
+                return # Still above the same element (or still outside the image).
+
+            self._crossHairIndex = (dataRow, dataCol)
+            self.crossPlotRow, self.crossPlotCol = dataRow, dataCol
+
+            if dataRow is None:
+                self.probeLabel.setText("<span style='color: #808080'>no data at cursor</span>")
+                self._hideCrossHairs()
+                return
+
+            self.viewBox.setCursor(Qt.CrossCursor)
+
+            # The position of the data point in the complete array
+            row, col = rowStart + dataRow * rowStep, colStart + dataCol * colStep
+
+            index = tuple([dataRow, dataCol])
+            valueStr = to_string(self.slicedArray[index],
+                                 masked=self.slicedArray.maskAt(index),
+                                 maskFormat='&lt;masked&gt;')
+            txt = "pos = ({:d}, {:d}), value = {}".format(row, col, valueStr)
+            self.probeLabel.setText(txt)
+
+            # Show cross section at the cursor pos in the line plots
+            showHorCrossPlot = self.config.horCrossPlotCti.configValue
+            for line in (self.crossLineHorShadow, self.crossLineHorizontal,
+                         self.horCrossLineShadow90, self.horCrossLine90):
+                line.setVisible(showHorCrossPlot)
+
+            if showHorCrossPlot:
+                self.crossLineHorShadow.setPos(row)
+                self.crossLineHorizontal.setPos(row)
+
+                # Vertical line in hor-cross plot
+                self.horCrossLineShadow90.setPos(col)
+                self.horCrossLine90.setPos(col)
+
+                # Line plot of cross section row.
+                if dataRow != self._horPlotDataRow:
+                    colCoordinates, rowData, connected = self._crossSectionPlotData(0, dataRow)
+                    self.horPlotDataItem.setData(colCoordinates, rowData, connect=connected)
+                    self._horPlotDataRow = dataRow
+                    self.config.horCrossPlotRangeCti.updateTarget() # update auto range
+
+            showVerCrossPlot = self.config.verCrossPlotCti.configValue
+            for line in (self.crossLineVerShadow, self.crossLineVertical,
+                         self.verCrossLineShadow0, self.verCrossLine0):
+                line.setVisible(showVerCrossPlot)
+
+            if showVerCrossPlot:
+                self.crossLineVerShadow.setPos(col)
+                self.crossLineVertical.setPos(col)
+
+                # Horizontal line in ver-cross plot
+                self.verCrossLineShadow0.setPos(row)
+                self.verCrossLine0.setPos(row)
+
+                # Line plot of cross section column.
+                if dataCol != self._verPlotDataCol:
+                    rowCoordinates, colData, connected = self._crossSectionPlotData(1, dataCol)
+                    self.verPlotDataItem.setData(colData, rowCoordinates, connect=connected)
+                    self._verPlotDataCol = dataCol
+                    self.config.verCrossPlotRangeCti.updateTarget() # update auto range
 
         except Exception as ex:
             # In contrast to _drawContents, this function is a slot and thus must not throw
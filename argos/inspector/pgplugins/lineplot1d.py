@@ -31,6 +31,7 @@ from argos.config.groupcti import MainGroupCti
 from argos.config.boolcti import BoolCti
 from argos.config.choicecti import ChoiceCti
 
+from argos.collect.decimation import normalizeSlice
 from argos.inspector.abstract import AbstractInspector, InvalidDataError, UpdateReason
 from argos.inspector.pgplugins.pgctis import (X_AXIS, Y_AXIS, viewBoxAxisRange,
                                               defaultAutoRangeMethods, PgGridCti, PgAxisCti,
@@ -38,12 +39,20 @@ from argos.inspector.pgplugins.pgctis import (X_AXIS, Y_AXIS, viewBoxAxisRange,
                                               PgAxisLogModeCti, PgAxisRangeCti, PgPlotDataItemCti)
 from argos.inspector.pgplugins.pgplotitem import ArgosPgPlotItem
 from argos.utils.cls import (array_has_real_numbers, check_class, fill_values_to_nan,
-                                is_an_array, check_is_an_array, to_string)
-from argos.utils.masks import replaceMaskedValue
+                                check_is_an_array, to_string)
+from argos.utils.envelope import MinMaxEnvelope
+from argos.utils.masks import replaceMaskedValueWithFloat
 
 
 logger = logging.getLogger(__name__)
 
+# Slices with more samples are plotted as a min/max envelope (if the envelope is on).
+MIN_ENVELOPE_SAMPLES = 64 * 1024
+
+# The view box is assumed to be at least this many pixels wide (it can be small or not yet laid
+# out before the first draw).
+MIN_ENVELOPE_PIXELS = 256
+
 class PgLinePlot1dCti(MainGroupCti):
     """ Configuration tree item for a PgLinePlot1d inspector
     """
@@ -90,6 +99,10 @@ class PgLinePlot1dCti(MainGroupCti):
         #### Pen ####
 
         self.plotDataItemCti = self.insertChild(PgPlotDataItemCti())
+
+        # Long slices are plotted as the minimum and maximum per bucket of samples, with buckets
+        # of the size of (about) a pixel. The probe still shows the values of the samples.
+        self.envelopeCti = self.insertChild(BoolCti('min/max envelope', True))
         self.probeCti = self.insertChild(BoolCti('show probe', True))
 
         # Connect signals
@@ -125,6 +138,22 @@ class PgLinePlot1d(AbstractInspector):
         # in the collector.
         self.slicedArray = None
 
+        # The data as it is passed to PyQtGraph (masked values replaced by NaNs) and a boolean
+        # array that is True for the points that can be connected by the plot line. They are
+        # reused when only the configuration has changed.
+        self.plotData = None
+        self.connected = None
+
+        # The min/max envelope of the plot data, None if the data is plotted directly. The region
+        # is the (level, start, stop) of the envelope that is plotted.
+        self.envelope = None
+        self._envelopeRegion = None
+        self.plotDataItem = None
+
+        # Start and step of the sub range that is selected in the collector. The sliced array
+        # element i is located at position start + i * step.
+        self.rangeStart, self.rangeStep = 0, 1
+
         self.graphicsLayoutWidget = pg.GraphicsLayoutWidget()
         self.contentsLayout.addWidget(self.graphicsLayoutWidget)
         self.titleLabel = self.graphicsLayoutWidget.addLabel('<plot title goes here>', 0, 0)
@@ -148,12 +177,16 @@ class PgLinePlot1d(AbstractInspector):
         # Based mouseMoved on crosshair.py from the PyQtGraph examples directory.
         # I did not use the SignalProxy because I did not see any difference.
         self.plotItem.scene().sigMouseMoved.connect(self.mouseMoved)
+        self.viewBox.sigXRangeChanged.connect(self._updateEnvelope)
+        self.viewBox.sigResized.connect(self._updateEnvelope)
 
 
     def finalize(self):
         """ Is called before destruction. Can be used to clean-up resources
         """
         logger.debug("Finalizing: {}".format(self))
+        self.viewBox.sigResized.disconnect(self._updateEnvelope)
+        self.viewBox.sigXRangeChanged.disconnect(self._updateEnvelope)
         self.plotItem.scene().sigMouseMoved.disconnect(self.mouseMoved)
         self.plotItem.close()
         self.graphicsLayoutWidget.close()
@@ -167,6 +200,21 @@ class PgLinePlot1d(AbstractInspector):
         return tuple(['X'])
 
 
+    def appendsData(self):
+        """ The line plot only reads the samples that have been appended to the RTI, unless a sub
+            range is selected. In that case the plot is read again and must be loaded in advance
+            (see _appendData).
+        """
+        if self.connected is None:
+            return False
+
+        shape = self.collector.getSlicedArrayShape()
+        comboRanges = self.collector.getComboRanges()
+        if shape is None or comboRanges is None:
+            return False
+        return comboRanges == [normalizeSlice(None, length) for length in shape]
+
+
     def _hasValidData(self):
         """ Returns True if the inspector has data that can be plotted.
         """
@@ -177,6 +225,11 @@ class PgLinePlot1d(AbstractInspector):
         """ Clears the  the inspector widget when no valid input is available.
         """
         self.titleLabel.setText('')
+        self.plotData = None
+        self.connected = None
+        self.envelope = None
+        self._envelopeRegion = None
+        self.plotDataItem = None
         self.plotItem.clear()
         self.plotItem.setLabel('left', '')
         self.plotItem.setLabel('bottom', '')
@@ -188,7 +241,21 @@ class PgLinePlot1d(AbstractInspector):
             The reason parameter is used to determine if the axes will be reset (the initiator
             parameter is ignored). See AbstractInspector.updateContents for their description.
         """
-        self.slicedArray = self.collector.getSlicedArray()
+        # If only the configuration has changed (e.g. the pen color), the data is the same as
+        # during the previous draw and the already prepared arrays are reused.
+        reuseData = (reason == UpdateReason.CONFIG_CHANGED and self.connected is not None)
+
+        # If samples have been appended to the RTI, only they are read and converted.
+        if reason == UpdateReason.DATA_APPENDED and self.connected is not None:
+            reuseData = self._appendData()
+
+        if not reuseData:
+            self.slicedArray = self.collector.getSlicedArray(copy=False)
+            comboRanges = self.collector.getComboRanges()
+            if comboRanges is None:
+                self.rangeStart, self.rangeStep = 0, 1
+            else:
+                self.rangeStart, self.rangeStep = comboRanges[0].start, comboRanges[0].step
 
         if not self._hasValidData():
             self._clearContents()
@@ -196,9 +263,25 @@ class PgLinePlot1d(AbstractInspector):
 
         # -- Valid plot data from here on --
 
-        # PyQtGraph doesn't handle masked arrays so we convert the masked values to Nans (missing
-        # data values are replaced by NaNs). The PyQtGraph line plot omits the Nans, which is great.
-        self.slicedArray.replaceMaskedValueWithNan()  # will convert data to float if int
+        if not reuseData:
+            # PyQtGraph doesn't handle masked arrays so we convert the masked values to Nans
+            # (missing data values are replaced by NaNs). The PyQtGraph line plot omits the Nans,
+            # which is great. The sliced array is read-only so a copy is made if needed.
+            self.plotData = replaceMaskedValueWithFloat(self.slicedArray.data,
+                                                        self.slicedArray.mask, np.nan,
+                                                        copyOnReplace=True)
+
+            connected = np.isfinite(self.plotData)
+            if self.slicedArray.hasMask:
+                connected = np.logical_and(connected, ~self.slicedArray.maskIndex())
+            self.connected = connected
+            self.envelope = None
+
+        if self.config.envelopeCti.configValue and len(self.plotData) > MIN_ENVELOPE_SAMPLES:
+            if self.envelope is None:
+                self.envelope = MinMaxEnvelope(self.plotData, valid=self.connected)
+        else:
+            self.envelope = None
 
         self.plotItem.clear()
 
@@ -213,16 +296,17 @@ class PgLinePlot1d(AbstractInspector):
 
         self.titleLabel.setText(self.configValue('title').format(**self.collector.rtiInfo))
 
-        connected = np.isfinite(self.slicedArray.data)
-        if is_an_array(self.slicedArray.mask):
-            connected = np.logical_and(connected, ~self.slicedArray.mask)
+        self.plotDataItem = self.config.plotDataItemCti.createPlotDataItem()
+        if self.envelope is None:
+            self.plotDataItem.setData(
+                self.rangeStart + self.rangeStep * np.arange(len(self.plotData)),
+                self.plotData, connect=self.connected)
         else:
-            connected = np.zeros_like(self.slicedArray.data) if self.slicedArray.mask else connected
+            # The envelope of the complete slice, until the axis range is known.
+            self._envelopeRegion = None
+            self._setEnvelopeData(self.envelope.numLevels - 1, 0, len(self.plotData))
 
-        plotDataItem = self.config.plotDataItemCti.createPlotDataItem()
-        plotDataItem.setData(self.slicedArray.data, connect=connected)
-
-        self.plotItem.addItem(plotDataItem)
+        self.plotItem.addItem(self.plotDataItem)
 
         if self.config.probeCti.configValue:
             self.probeLabel.setVisible(True)
@@ -237,6 +321,83 @@ class PgLinePlot1d(AbstractInspector):
         # Update the config tree from the (possibly) new state of the PgLinePlot1d inspector,
         # e.g. the axis range may have changed while drawing.
         self.config.updateTarget()
+        self._updateEnvelope()
+
+
+    def _appendData(self):
+        """ Reads the samples that have been appended to the sliced array and appends them to the
+            plot data. The envelope is extended.
+
+            Returns False if the samples can't be appended (e.g. if a sub range is selected), the
+            complete slice must then be read.
+        """
+        appended = self.collector.getAppendedArray(self.slicedArray.shape, copy=False)
+        if appended is None:
+            return False
+
+        _axis, appendedArray = appended
+        if appendedArray is None:
+            return True # Nothing has been appended
+
+        plotData = replaceMaskedValueWithFloat(appendedArray.data, appendedArray.mask, np.nan,
+                                               copyOnReplace=True)
+        connected = np.isfinite(plotData)
+        if appendedArray.hasMask:
+            connected = np.logical_and(connected, ~appendedArray.maskIndex())
+
+        self.slicedArray = self.slicedArray.concatenate(appendedArray)
+        self.plotData = np.concatenate((self.plotData, plotData))
+        self.connected = np.concatenate((self.connected, connected))
+        if self.envelope is not None:
+            self.envelope.extend(self.plotData, valid=self.connected)
+        return True
+
+
+    def _setEnvelopeData(self, level, start, stop):
+        """ Plots the envelope with the samples from start to stop at the level of detail.
+        """
+        logger.debug("Plotting envelope level {}: {} to {}".format(level, start, stop))
+        indices, values, connected = self.envelope.plotData(level, start, stop)
+        self.plotDataItem.setData(self.rangeStart + self.rangeStep * indices, values,
+                                  connect=connected)
+        self._envelopeRegion = (level, start, stop)
+
+
+    def _updateEnvelope(self, *_args):
+        """ Plots the visible samples at the envelope level that has (about) one bucket per pixel.
+            Is called when the range of the X-axis or the size of the view box changes.
+
+            The samples of half a view width at both sides of the visible samples are plotted at
+            the same level, so that panning doesn't require new plot data every time.
+        """
+        if self.envelope is None or self.plotDataItem is None:
+            return
+
+        try:
+            numSamples = len(self.plotData)
+            viewMin, viewMax = self.viewBox.viewRange()[0]
+            start = int(np.floor((viewMin - self.rangeStart) / self.rangeStep))
+            stop = int(np.ceil((viewMax - self.rangeStart) / self.rangeStep)) + 1
+            start, stop = min(max(0, start), numSamples), min(max(0, stop), numSamples)
+            if stop <= start:
+                start, stop = 0, numSamples # Nothing visible, plot the complete slice.
+
+            numPixels = max(MIN_ENVELOPE_PIXELS, self.viewBox.sceneBoundingRect().width())
+            level = self.envelope.levelForScale((stop - start) / numPixels)
+
+            if self._envelopeRegion is not None:
+                oldLevel, oldStart, oldStop = self._envelopeRegion
+                if level == oldLevel and oldStart <= start and stop <= oldStop:
+                    return # The visible samples are already plotted at this level.
+
+            margin = (stop - start) // 2
+            self._setEnvelopeData(level, max(0, start - margin), min(numSamples, stop + margin))
+        except Exception as ex:
+            # This is a slot and thus must not throw exceptions.
+            if DEBUGGING:
+                raise
+            else:
+                logger.exception(ex)
 
 
     @QtSlot(object)
@@ -251,12 +412,16 @@ class PgLinePlot1d(AbstractInspector):
             self.probeLabel.setText("")
             self.probeDataItem.clear()
 
-            if (self._hasValidData() and self.config.probeCti.configValue and
+            if (self._hasValidData() and self.plotData is not None and
+                self.config.probeCti.configValue and
                 self.viewBox.sceneBoundingRect().contains(viewPos)):
 
                 scenePos = self.viewBox.mapSceneToView(viewPos)
-                index = int(scenePos.x())
+                pos = int(scenePos.x())
+                index = (pos - self.rangeStart) // self.rangeStep # index in the sliced array
+                pos = self.rangeStart + index * self.rangeStep
                 data = self.slicedArray.data
+                plotData = self.plotData # masked values are NaNs
 
                 if not 0 <= index < len(data):
                     txt = "<span style='color: grey'>no data at cursor</span>"
@@ -264,14 +429,14 @@ class PgLinePlot1d(AbstractInspector):
                 else:
                     valueStr = to_string(data[index], masked=self.slicedArray.maskAt(index),
                                          maskFormat='&lt;masked&gt;')
-                    self.probeLabel.setText("pos = {!r}, value = {}".format(index, valueStr))
-                    if np.isfinite(data[index]):
+                    self.probeLabel.setText("pos = {!r}, value = {}".format(pos, valueStr))
+                    if np.isfinite(plotData[index]):
                         self.crossLineVerShadow.setVisible(True)
-                        self.crossLineVerShadow.setPos(index)
+                        self.crossLineVerShadow.setPos(pos)
                         self.crossLineVertical.setVisible(True)
-                        self.crossLineVertical.setPos(index)
-                        if data[index] > 0 or self.config.yLogCti.configValue == False:
-                            self.probeDataItem.setData((index,), (data[index],))
+                        self.crossLineVertical.setPos(pos)
+                        if plotData[index] > 0 or self.config.yLogCti.configValue == False:
+                            self.probeDataItem.setData((pos,), (plotData[index],))
 
         except Exception as ex:
             # In contrast to _drawContents, this function is a slot and thus must not throw
@@ -37,7 +37,7 @@ from argos.config.untypedcti import UntypedCti
 from argos.inspector.pgplugins.pghistlutitem import HistogramLUTItem
 from argos.qt import QtGui, QtWidgets
 from argos.utils.cls import check_class
-from argos.utils.masks import maskedNanPercentile
+from argos.utils.percentiles import DISCARD_PERCENTAGES, discardedRange
 
 from pyqtgraph.graphicsItems.GradientEditorItem import Gradients as GRADIENTS
 
@@ -133,9 +133,14 @@ def inspectorDataRange(inspector, percentage):
         Meant to be used with functools.partial for filling the autorange methods combobox.
         The first parameter is an inspector, it's not an array, because we would then have to
         regenerate the range function every time sliced array of an inspector changes.
+
+        The percentiles are shared by all range methods that use the same sliced array. If the
+        inspector has a maxExactRangeElements attribute, the percentiles of sliced arrays with
+        more elements are estimated from a sample.
     """
     logger.debug("Discarding {}% from id: {}".format(percentage, id(inspector.slicedArray)))
-    return maskedNanPercentile(inspector.slicedArray, (percentage, 100-percentage) )
+    maxExactElements = getattr(inspector, 'maxExactRangeElements', None)
+    return discardedRange(inspector.slicedArray, percentage, maxExactElements=maxExactElements)
 
 
 def defaultAutoRangeMethods(inspector, intialItems=None):
@@ -146,7 +151,7 @@ def defaultAutoRangeMethods(inspector, intialItems=None):
     """
     rangeFunctions = OrderedDict({} if intialItems is None else intialItems)
     rangeFunctions['use all data'] = partial(inspectorDataRange, inspector, 0.0)
-    for percentage in [0.1, 0.2, 0.5, 1, 2, 5, 10, 20]:
+    for percentage in DISCARD_PERCENTAGES[1:]:
         label = "discard {}%".format(percentage)
         rangeFunctions[label] = partial(inspectorDataRange, inspector, percentage)
     return rangeFunctions
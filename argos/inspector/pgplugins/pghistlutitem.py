@@ -2,7 +2,13 @@
 
     Currently only a histogram range in the imageChanged method is added. This prevents errors when
     the image contains NaNs. Later the mouse and scrolling behaviour may be altered.
+
+    The histogram of 8 and 16 bit unsigned integer images is calculated with np.bincount.
+
+    The histogram is cached, so that it is not calculated again when only the levels or the
+    lookup table change (which also emit the sigImageChanged signal of the image item).
 """
+from __future__ import division
 
 
 #from pyqtgraph.Qt import QtWidgets, QtCore
@@ -18,9 +24,67 @@ from pyqtgraph import functions as fn
 from pyqtgraph import debug as debug
 
 import weakref
+import numpy as np
 
 __all__ = ['HistogramLUTItem']
 
+# Image types for which the histogram is calculated with np.bincount
+BINCOUNT_TYPES = (np.uint8, np.uint16)
+
+
+def integerHistogram(image, targetHistogramSize=500):
+    """ Returns the histogram of an uint8 or uint16 image as an (x, y) tuple, where x contains
+        the lower value of each bin. Consecutive values are combined in a bin so that there are
+        at most (about) targetHistogramSize bins.
+
+        Uses np.bincount, which counts all pixels in a single pass without sorting or converting
+        them. Returns (None, None) if the image is empty.
+    """
+    assert image.dtype in BINCOUNT_TYPES, "Unexpected image type: {}".format(image.dtype)
+    if image.size == 0:
+        return None, None
+
+    counts = np.bincount(np.ravel(image, order='K')) # No copy for contiguous images.
+    nonZero = np.flatnonzero(counts)
+    valueMin, valueMax = nonZero[0], nonZero[-1]
+
+    numValues = valueMax - valueMin + 1
+    step = max(1, int(np.ceil(numValues / targetHistogramSize)))
+    binStarts = np.arange(0, numValues, step)
+    return valueMin + binStarts, np.add.reduceat(counts[valueMin:valueMax + 1], binStarts)
+
+
+def imageHistogram(image, maxElements=None, targetHistogramSize=500):
+    """ Returns the histogram of an image as an (x, y) tuple, where x contains the lower value
+        of each bin. NaNs are ignored. Returns (None, None) if the image has no finite values.
+
+        :param image: 2D array. Integer images of BINCOUNT_TYPES are counted with np.bincount.
+        :param maxElements: if not None (or 0), the histogram of larger images is calculated from
+            a strided subsample with at most (about) maxElements elements.
+        :param targetHistogramSize: the maximum number of bins.
+    """
+    if maxElements and image.size > maxElements:
+        step = int(np.ceil(np.sqrt(image.size / maxElements)))
+        image = image[::step, ::step]
+
+    if image.dtype in BINCOUNT_TYPES:
+        return integerHistogram(image, targetHistogramSize=targetHistogramSize)
+
+    if image.size == 0:
+        return None, None
+
+    valueMin, valueMax = np.nanmin(image), np.nanmax(image)
+    if not (np.isfinite(valueMin) and np.isfinite(valueMax)):
+        return None, None
+
+    if image.dtype.kind in 'iu':
+        # Use bins of an integer width so that each bin contains the same number of values.
+        step = max(1, int(np.ceil((int(valueMax) - int(valueMin) + 1) / targetHistogramSize)))
+        counts, edges = np.histogram(image, bins=np.arange(valueMin, valueMax + step + 1, step))
+    else:
+        counts, edges = np.histogram(image, bins=targetHistogramSize, range=(valueMin, valueMax))
+    return edges[:-1], counts
+
 
 class HistogramLUTItem(GraphicsWidget):
     """
@@ -43,6 +107,9 @@ class HistogramLUTItem(GraphicsWidget):
         """
         GraphicsWidget.__init__(self)
         self.lut = None
+        self._histogram = None        # The cached (x, y) histogram.
+        self._histogramImage = None   # The image of the cached histogram.
+        self._pendingHistogram = None # The precomputed histogram of the next image.
         self.imageItem = lambda: None  # fake a dead weakref
 
         self.layout = QtWidgets.QGraphicsGridLayout()
@@ -190,15 +257,37 @@ class HistogramLUTItem(GraphicsWidget):
         self.sigLevelsChanged.emit(self)
         self.update()
 
+    def setImageHistogram(self, histogram):
+        """ Sets the precomputed (x, y) histogram of the next image that is set in the image item.
+
+            The histogram is plotted when the image item emits sigImageChanged for that image,
+            without calculating it again, and is used until the image item gets another image.
+            Must be called right before the image is set in the image item.
+        """
+        self._pendingHistogram = histogram
+
     def imageChanged(self, autoLevel=False, autoRange=False):
         profiler = debug.Profiler()
         img = self.imageItem().image
-        if img is None:
-            histRange = None
+        if self._pendingHistogram is not None:
+            h = self._pendingHistogram # Precomputed for the new image.
+            self._pendingHistogram = None
+        elif self._histogram is not None and img is self._histogramImage:
+            h = self._histogram # Only the levels or lookup table have changed.
+        elif img is not None and img.dtype in BINCOUNT_TYPES:
+            h = integerHistogram(img)
         else:
-            histRange = (np.nanmin(img), np.nanmax(img))
+            if img is None:
+                histRange = None
+            else:
+                histRange = (np.nanmin(img), np.nanmax(img))
+
+            h = self.imageItem().getHistogram(range=histRange)
 
-        h = self.imageItem().getHistogram(range=histRange)
+        # The image item stores a view of the image, which is the same object until the next
+        # setImage call, so the histogram is cached for that view.
+        self._histogramImage = img
+        self._histogram = h
         profiler('get histogram')
         if h[0] is None:
             return
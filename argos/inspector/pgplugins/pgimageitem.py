@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module that contains ArgosImageItem.
+"""
+from __future__ import division, print_function
+
+import logging
+import pyqtgraph as pg
+
+from argos.qt import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+
+class ArgosImageItem(pg.ImageItem):
+    """ Wrapper around pyqtgraph.ImageItem that can show a region of a larger image.
+
+        The bounding rectangle can be set to the extent of the complete image, so that the
+        auto-range of the view box shows the complete image and not only the region.
+    """
+    def __init__(self, *args, **kwargs):
+        """ Constructor. The parameters are passed to the pg.ImageItem constructor.
+        """
+        self._extent = None
+        super(ArgosImageItem, self).__init__(*args, **kwargs)
+
+
+    def setExtent(self, extent):
+        """ Sets the extent of the complete image in the coordinates of the item (i.e. in
+            elements of the image that is set in the item).
+
+            :param extent: QRectF or None. If None the bounding rectangle is that of the image.
+        """
+        if extent == self._extent:
+            return
+        self.prepareGeometryChange()
+        self._extent = extent
+        self.informViewBoundsChanged()
+
+
+    def boundingRect(self):
+        """ Returns the extent if it has been set, otherwise the bounding rectangle of the image.
+        """
+        if self._extent is None:
+            return super(ArgosImageItem, self).boundingRect()
+        else:
+            return QtCore.QRectF(self._extent)
@@ -22,37 +22,50 @@ import numbers
 
 import numpy as np
 
+from collections import OrderedDict
+from functools import partial
+
 from argos.external import six
+from argos.collect.blocks import BlockedArray, blockShapeForChunks
 from argos.collect.collector import FAKE_DIM_NAME
+from argos.collect.slicereader import ReadAheadWorker
 from argos.config.boolcti import BoolCti
 from argos.config.choicecti import ChoiceCti
 from argos.config.groupcti import GroupCti, MainGroupCti
 from argos.config.intcti import IntCti
 from argos.config.qtctis import FontCti, ColorCti
 from argos.info import DEBUGGING
-from argos.inspector.abstract import AbstractInspector
+from argos.inspector.abstract import AbstractInspector, UpdateReason
 from argos.qt import Qt, QtCore, QtGui, QtWidgets
 from argos.widgets.constants import MONO_FONT, FONT_SIZE
 from argos.utils.cls import check_class, check_is_a_string
-from argos.utils.cls import to_string, is_an_array
+from argos.utils.cls import to_string, format_numbers, is_an_array
 from argos.utils.misc import is_quoted
 
 logger = logging.getLogger(__name__)
 
-RESET_HEADERS_AT_SIZE = 10000   # If header has more elements, the headers size CTIs are disabled.
-OPTIMIZE_RESIZE_AT_SIZE = 1000  # If the table has more elements, only the current column/row are
-                                # resized and the others take the same size
+UNIFORM_SIZES_AT_SIZE = 1000  # If the table has more cells, the auto sized rows (columns) all get
+                              # the same height (width), estimated from a sample of the cells.
+SIZE_SAMPLE_SECTIONS = 20     # The sizes are estimated from at most this many rows and columns.
 
 ALIGN_SMART = -1  # Use right alignment for numbers and left alignment for everything else.
 
-def resizeAllSections(header, sectionSize):
+PREFETCH_MARGIN = 1  # Number of blocks around the visible cells that are read in advance.
+
+FORMAT_CACHE_BLOCKS = 64  # Number of blocks of which the model keeps the formatted cells.
+
+def setUniformSectionSize(header, sectionSize):
     """ Sets all sections (columns or rows) of a header to the same section size.
 
+        The header is reset to the default section size, so that the sections are not resized
+        one by one. This is fast, also for headers with millions of sections.
+
         :param header: a QHeaderView
         :param sectionSize: the new size of the header section in pixels
     """
-    for idx in range(header.length()):
-        header.resizeSection(idx, sectionSize)
+    header.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
+    header.setDefaultSectionSize(max(sectionSize, header.minimumSectionSize()))
+    header.reset()
 
 
 def makeReplacementField(formatSpec, altFormatSpec='', testValue=None):
@@ -184,30 +197,6 @@ class TableInspectorCti(MainGroupCti):
                                                  QtWidgets.QAbstractItemView.ScrollPerPixel]))
 
 
-    def _refreshNodeFromTarget(self):
-        """ Refreshes the TableInspectorCti from the TableInspector target it monitors.
-
-            Disables auto-sizing of the header sizes for very large headers (> 10000 elements).
-            Otherwise the resizing may take to long and the program will hang.
-        """
-        tableModel = self.tableInspector.model
-
-        # Disable row height and column with settings for large headers (too slow otherwise)
-        if tableModel.rowCount() >= RESET_HEADERS_AT_SIZE:
-            self.autoRowHeightCti.data = False
-            self.model.emitDataChanged(self.autoRowHeightCti)
-            self.autoRowHeightCti.enable = False
-        else:
-            self.autoRowHeightCti.enable = True
-
-        if tableModel.columnCount() >= RESET_HEADERS_AT_SIZE:
-            self.autoColWidthCti.data  = False
-            self.model.emitDataChanged(self.autoColWidthCti)
-            self.autoColWidthCti.enable = False
-        else:
-            self.autoColWidthCti.enable = True
-
-
 
 class TableInspector(AbstractInspector):
     """ Shows the sliced array in a table.
@@ -216,6 +205,15 @@ class TableInspector(AbstractInspector):
 
         super(TableInspector, self).__init__(collector, parent=parent)
 
+        # The sliced array is read in blocks, only the blocks around the visible cells are read.
+        # It is reused when only the configuration has changed.
+        self.blockedArray = None
+        self._comboRanges = None # The sub ranges of the blocked array
+
+        # Reads the blocks around the visible cells in advance while the user is scrolling.
+        # The blocks are stored in the slice cache of the collector.
+        self._prefetchWorker = ReadAheadWorker(collector.sliceCache)
+
         self.model = TableInspectorModel(parent=self)
         self.tableView = QtWidgets.QTableView()
         self.contentsLayout.addWidget(self.tableView)
@@ -237,6 +235,18 @@ class TableInspector(AbstractInspector):
             self.config.defaultColWidthCti.data = horHeader.defaultSectionSize()
             self.config.defaultColWidthCti.defaultData = horHeader.defaultSectionSize()
 
+        self.tableView.verticalScrollBar().valueChanged.connect(self._prefetchBlocks)
+        self.tableView.horizontalScrollBar().valueChanged.connect(self._prefetchBlocks)
+
+
+    def finalize(self):
+        """ Is called before destruction. Stops reading blocks in advance.
+        """
+        logger.debug("Finalizing: {}".format(self))
+        self.tableView.horizontalScrollBar().valueChanged.disconnect(self._prefetchBlocks)
+        self.tableView.verticalScrollBar().valueChanged.disconnect(self._prefetchBlocks)
+        self._prefetchWorker.stop()
+
 
     @classmethod
     def axesNames(cls):
@@ -261,7 +271,176 @@ class TableInspector(AbstractInspector):
     def _clearContents(self):
         """ Clears the  the inspector widget when no valid input is available.
         """
-        pass
+        self._prefetchWorker.cancel()
+        self.blockedArray = None
+        self._comboRanges = None
+
+
+    def _blockShape(self, comboRanges):
+        """ Returns the shape of the blocks in which the sliced array is read. The blocks are a
+            multiple of the chunks of the RTI, if the ranges are read without a step.
+        """
+        chunkShape = self.collector.getSlicedArrayChunkShape()
+        if chunkShape is not None:
+            chunkShape = [chunk if comboRange.step == 1 else None
+                          for chunk, comboRange in zip(chunkShape, comboRanges)]
+        return blockShapeForChunks(chunkShape)
+
+
+    @staticmethod
+    def _blockComboSlices(comboRanges, blockSlices):
+        """ Converts the slices of a block of the sliced array to slices in the coordinates of
+            the complete dimensions (see Collector.getSlicedArray).
+        """
+        return [slice(comboRange.start + slc.start * comboRange.step,
+                      comboRange.start + slc.stop * comboRange.step, comboRange.step)
+                for slc, comboRange in zip(blockSlices, comboRanges)]
+
+
+    def _readBlock(self, comboRanges, blockSlices):
+        """ Reads a block of the sliced array. Blocks that were read in advance are in the slice
+            cache of the collector.
+        """
+        return self.collector.readSlice(
+            comboSlices=self._blockComboSlices(comboRanges, blockSlices), copy=False)
+
+
+    def _visibleArrayRanges(self, shape):
+        """ Returns the (start, stop) ranges of the rows and columns of the sliced array that are
+            visible in the table view. They are clipped to the shape.
+        """
+        viewport = self.tableView.viewport()
+        firstRow = max(0, self.tableView.rowAt(0))
+        lastRow = self.tableView.rowAt(viewport.height() - 1)
+        if lastRow < 0:
+            lastRow = self.model.rowCount() - 1
+        firstCol = max(0, self.tableView.columnAt(0))
+        lastCol = self.tableView.columnAt(viewport.width() - 1)
+        if lastCol < 0:
+            lastCol = self.model.columnCount() - 1
+
+        first = self.model.arrayIndex(firstRow, firstCol)
+        last = self.model.arrayIndex(max(firstRow, lastRow), max(firstCol, lastCol))
+        return tuple((min(start, length - 1), min(stop + 1, length))
+                     for start, stop, length in zip(first, last, shape))
+
+
+    def _firstVisibleBlock(self, shape, blockShape):
+        """ Returns the index of the block that contains the top left visible cell.
+        """
+        (firstRow, _), (firstCol, _) = self._visibleArrayRanges(shape)
+        return firstRow // blockShape[0], firstCol // blockShape[1]
+
+
+    def comboSlices(self, reason=None):
+        """ Returns the slices of the block that contains the top left visible cell, so that the
+            main window loads this block in advance (instead of the complete slice). The other
+            blocks are read when they are shown.
+        """
+        comboRanges = self.collector.getComboRanges()
+        if comboRanges is None:
+            return None
+
+        shape = [len(range(rng.start, rng.stop, rng.step)) for rng in comboRanges]
+        if min(shape) <= 0:
+            return None
+
+        blockShape = self._blockShape(comboRanges)
+        blockIndex = self._firstVisibleBlock(shape, blockShape)
+        blockSlices = [slice(idx * blockLength, min((idx + 1) * blockLength, length))
+                       for idx, blockLength, length in zip(blockIndex, blockShape, shape)]
+        return self._blockComboSlices(comboRanges, blockSlices)
+
+
+    def _sampleSections(self, header, numSections):
+        """ Returns the indices of (at most) SIZE_SAMPLE_SECTIONS sections that are evenly
+            spread over the visible sections of the header.
+        """
+        if header.orientation() == Qt.Horizontal:
+            headerLength = header.width()
+        else:
+            headerLength = header.height()
+
+        first = max(0, header.logicalIndexAt(0))
+        last = header.logicalIndexAt(headerLength - 1)
+        if last < first:
+            # The header is not laid out yet, or the sections don't fill it.
+            last = min(numSections, first + SIZE_SAMPLE_SECTIONS) - 1
+
+        numSamples = min(last - first + 1, SIZE_SAMPLE_SECTIONS)
+        return sorted(set(int(round(idx)) for idx in np.linspace(first, last, numSamples)))
+
+
+    def _estimateSectionSizes(self):
+        """ Returns the (rowHeight, columnWidth) that fits the contents of a sample of the
+            visible cells, and of their header sections.
+
+            Only the cells of the sample are formatted, so the sizes are estimated quickly, no
+            matter how large the table is. The visible cells are in blocks that are already read.
+        """
+        verHeader = self.tableView.verticalHeader()
+        horHeader = self.tableView.horizontalHeader()
+        numRows = self.model.rowCount()
+        numCols = self.model.columnCount()
+        if numRows <= 0 or numCols <= 0:
+            return (self.config.defaultRowHeightCti.configValue,
+                    self.config.defaultColWidthCti.configValue)
+
+        rows = self._sampleSections(verHeader, numRows)
+        cols = self._sampleSections(horHeader, numCols)
+
+        # As QTableView.resizeColumnToContents, add one pixel for the grid.
+        gridSize = 1 if self.tableView.showGrid() else 0
+        rowHeight = max(verHeader.sectionSizeHint(row) for row in rows)
+        colWidth = max(horHeader.sectionSizeHint(col) for col in cols)
+        for row in rows:
+            for col in cols:
+                sizeHint = self.tableView.sizeHintForIndex(self.model.index(row, col))
+                rowHeight = max(rowHeight, sizeHint.height() + gridSize)
+                colWidth = max(colWidth, sizeHint.width() + gridSize)
+
+        logger.debug("Estimated row height {} and column width {} from {} cells"
+                     .format(rowHeight, colWidth, len(rows) * len(cols)))
+        return rowHeight, colWidth
+
+
+    def _createBlockedArray(self):
+        """ Returns a BlockedArray of the current slice, or None if the RTI is not sliceable.
+            Only the block with the top left visible cell is read.
+        """
+        comboRanges = self.collector.getComboRanges()
+        self._comboRanges = comboRanges
+        if comboRanges is None:
+            return None
+
+        shape = [len(range(rng.start, rng.stop, rng.step)) for rng in comboRanges]
+        blockShape = self._blockShape(comboRanges)
+        blockedArray = BlockedArray(shape, partial(self._readBlock, comboRanges),
+                                    blockShape=blockShape)
+        if min(shape) > 0:
+            blockedArray.block(self._firstVisibleBlock(shape, blockShape))
+        return blockedArray
+
+
+    def _prefetchBlocks(self, *_args):
+        """ Reads the blocks around the visible cells in advance, in a worker thread.
+            Is called when the table is scrolled.
+        """
+        blockedArray = self.blockedArray
+        if (blockedArray is None or min(blockedArray.shape) <= 0 or
+                self.collector.sliceCache.maxBytes <= 0 or self.collector.hasProjections):
+            # Projections read large parts of the RTI, so they are not read in advance.
+            self._prefetchWorker.cancel()
+            return
+
+        rowRange, colRange = self._visibleArrayRanges(blockedArray.shape)
+        jobs = []
+        for blockIndex in blockedArray.blocksAround(rowRange, colRange, margin=PREFETCH_MARGIN):
+            if not blockedArray.hasBlock(blockIndex):
+                comboSlices = self._blockComboSlices(self._comboRanges,
+                                                     blockedArray.blockSlices(blockIndex))
+                jobs.append(self.collector.createReadJob(comboSlices))
+        self._prefetchWorker.schedule(jobs)
 
 
     def _drawContents(self, reason=None, initiator=None):
@@ -281,26 +460,33 @@ class TableInspector(AbstractInspector):
             oldRow = 0
             oldCol = 0
 
-        self.model.updateState(self.collector.getSlicedArray(),
+        # If only the configuration has changed the data is the same as during the previous draw.
+        if reason != UpdateReason.CONFIG_CHANGED or self.blockedArray is None:
+            self._prefetchWorker.cancel()
+            self.blockedArray = self._createBlockedArray()
+
+        self.model.updateState(self.blockedArray,
                                self.collector.rtiInfo,
-                               self.configValue('separate fields'))
+                               self.configValue('separate fields'),
+                               comboRanges=self._comboRanges)
 
-        self.model.encoding = self.config.encodingCti.configValue
         self.model.horAlignment = self.config.horAlignCti.configValue
         self.model.verAlignment = self.config.verAlignCti.configValue
         self.model.dataColor = self.config.dataColorCti.configValue
         self.model.missingColor = self.config.missingColorCti.configValue
 
-        self.model.strFormat   = makeReplacementField(self.config.strFormatCti.configValue,
-                                                      testValue='my_string')
-        self.model.intFormat   = makeReplacementField(self.config.intFormatCti.configValue,
-                                                      testValue=0)
-        self.model.numFormat   = makeReplacementField(self.config.numFormatCti.configValue,
-                                                      testValue=0.0)
-        self.model.otherFormat = makeReplacementField(self.config.otherFormatCti.configValue,
-                                                      testValue=None)
-        self.model.maskFormat  = makeReplacementField(self.config.maskFormatCti.configValue,
-                                                      testValue=None)
+        self.model.setFormats(
+            encoding = self.config.encodingCti.configValue,
+            strFormat = makeReplacementField(self.config.strFormatCti.configValue,
+                                             testValue='my_string'),
+            intFormat = makeReplacementField(self.config.intFormatCti.configValue,
+                                             testValue=0),
+            numFormat = makeReplacementField(self.config.numFormatCti.configValue,
+                                             testValue=0.0),
+            otherFormat = makeReplacementField(self.config.otherFormatCti.configValue,
+                                               testValue=None),
+            maskFormat = makeReplacementField(self.config.maskFormatCti.configValue,
+                                              testValue=None))
 
         scrollMode = self.configValue("scroll")
         self.tableView.setHorizontalScrollMode(scrollMode)
@@ -310,51 +496,41 @@ class TableInspector(AbstractInspector):
         # Update the model font from the font config item (will call self.setFont)
         self.config.updateTarget()
 
-        verHeader = self.tableView.verticalHeader()
-        if (self.config.autoRowHeightCti.configValue
-            and self.model.rowCount() < RESET_HEADERS_AT_SIZE):
+        # ResizeToContents sizes each row and column separately, which is too slow for large
+        # tables. Their rows and columns get a uniform size that fits a sample of the cells.
+        autoRowHeight = self.config.autoRowHeightCti.configValue
+        autoColWidth = self.config.autoColWidthCti.configValue
+        numCells = self.model.rowCount() * self.model.columnCount()
+        uniformSizes = numCells > UNIFORM_SIZES_AT_SIZE
 
-            numCells = self.model.rowCount() * self.model.columnCount()
-            if numCells <= OPTIMIZE_RESIZE_AT_SIZE:
-                logger.debug("Setting vertical resize mode to ResizeToContents")
-                verHeader.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
-            else:
-                # ResizeToContents can be very slow because it gets all rows.
-                # Work around: resize only first row and columns and apply this to all rows/cols
-                # TODO: perhaps use SizeHintRole?
-                logger.warning("Performance work around: for tables with more than 1000 cells " +
-                               "only the current row is resized and the others use that size.")
-                verHeader.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
-                self.tableView.resizeRowToContents(oldRow)
-                resizeAllSections(verHeader, self.tableView.rowHeight(oldRow))
+        verHeader = self.tableView.verticalHeader()
+        horHeader = self.tableView.horizontalHeader()
+        if uniformSizes and (autoRowHeight or autoColWidth):
+            # Switch off ResizeToContents before the sizes are estimated, so that Qt doesn't
+            # resize all sections later on.
+            verHeader.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
+            horHeader.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
+            rowHeight, colWidth = self._estimateSectionSizes()
+
+        if autoRowHeight and not uniformSizes:
+            logger.debug("Setting vertical resize mode to ResizeToContents")
+            verHeader.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
+        elif autoRowHeight:
+            logger.debug("Setting uniform row height: {}".format(rowHeight))
+            setUniformSectionSize(verHeader, rowHeight)
         else:
             logger.debug("Setting vertical resize mode to Interactive and reset header")
-            verHeader.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
-            verHeader.setDefaultSectionSize(self.config.defaultRowHeightCti.configValue)
-            verHeader.reset()
-
-        horHeader = self.tableView.horizontalHeader()
-        if (self.config.autoColWidthCti.configValue
-            and self.model.columnCount() < RESET_HEADERS_AT_SIZE):
-
-            numCells = self.model.rowCount() * self.model.columnCount()
-            if numCells <= OPTIMIZE_RESIZE_AT_SIZE:
-                logger.debug("setting horizontal resize mode to ResizeToContents")
-                horHeader.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
-            else:
-                # ResizeToContents can be very slow because it gets all rows.
-                # Work around: resize only first row and columns and apply this to all rows/cols
-                # TODO: perhaps use SizeHintRole?
-                logger.warning("Performance work around: for tables with more than 1000 cells " +
-                               "only the current column is resized and the others use that size.")
-                horHeader.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
-                self.tableView.resizeColumnToContents(oldCol)
-                resizeAllSections(horHeader, self.tableView.columnWidth(oldCol))
+            setUniformSectionSize(verHeader, self.config.defaultRowHeightCti.configValue)
+
+        if autoColWidth and not uniformSizes:
+            logger.debug("Setting horizontal resize mode to ResizeToContents")
+            horHeader.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
+        elif autoColWidth:
+            logger.debug("Setting uniform column width: {}".format(colWidth))
+            setUniformSectionSize(horHeader, colWidth)
         else:
             logger.debug("Setting horizontal resize mode to Interactive and reset header")
-            horHeader.setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
-            resizeAllSections(horHeader, self.config.defaultColWidthCti.configValue)
-            horHeader.reset()
+            setUniformSectionSize(horHeader, self.config.defaultColWidthCti.configValue)
 
         # Restore selection after select
         if selectionWasValid:
@@ -365,6 +541,8 @@ class TableInspector(AbstractInspector):
             else:
                 logger.debug("Can't restore selection")
 
+        self._prefetchBlocks()
+
 
 
 class TableInspectorModel(QtCore.QAbstractTableModel):
@@ -382,49 +560,72 @@ class TableInspectorModel(QtCore.QAbstractTableModel):
         self._nRows = 0
         self._nCols = 0
         self._fieldNames = []
-        self._slicedArray = None # can be a masked array or a regular numpy array
+        self._blockedArray = None # The sliced array, which is read in blocks.
         self._rtiInfo = {}
 
         self._separateFields = True  # User config option
         self._separateFieldOrientation = None # To store which axis is currently separated
         self._numbersInHeader = True
+        self._headerStartsAndSteps = ((0, 1), (0, 1)) # Of the rows and columns of the sub range
         self._font = None # Default font
 
-        # The following members are simple attributes, they can be changed independently
+        # The cells are formatted per block of the sliced array. Maps (blockIndex, fieldName)
+        # tuples to (strings, masked, isNumber) tuples, from the oldest to the newest block.
+        self._formattedBlocks = OrderedDict()
+
+        # Use setFormats to change these so that the formatted cells are discarded.
         self.encoding = 'utf-8'
         self.strFormat = None
         self.numFormat = None
         self.intFormat = None
         self.otherFormat = None
         self.maskFormat = None
+
+        # The following members are simple attributes, they can be changed independently
         self.textAlignment = None
         self.verAlignment = None
 
 
-    def updateState(self, slicedArray, rtiInfo, separateFields):
+    def updateState(self, slicedArray, rtiInfo, separateFields, comboRanges=None):
         """ Sets the slicedArray and rtiInfo and other members. This will reset the model.
 
             Will be called from the tableInspector._drawContents.
+
+            :param slicedArray: a BlockedArray, of which only the blocks with the cells that are
+                shown are read, or an ArrayWithMask. Can be None.
+
+            :param comboRanges: the sub ranges of the rows and columns that are selected in the
+                collector (see Collector.getComboRanges). Used to number the headers with the
+                indices of the complete array. If None, the headers start at 0.
         """
         self.beginResetModel()
         try:
-            # The sliced array can be a masked array or a (regular) numpy array.
             # The table works fine with masked arrays, no need to replace the masked values.
-            self._slicedArray = slicedArray
+            if slicedArray is not None and not isinstance(slicedArray, BlockedArray):
+                slicedArray = BlockedArray.fromArray(slicedArray)
+            if slicedArray is not self._blockedArray:
+                self._formattedBlocks.clear()
+            self._blockedArray = slicedArray
+
             if slicedArray is None:
                 self._nRows = 0
                 self._nCols = 0
                 self._fieldNames = []
             else:
-                self._nRows, self._nCols = self._slicedArray.shape
-                if self._slicedArray.data.dtype.names:
-                    self._fieldNames = self._slicedArray.data.dtype.names
+                self._nRows, self._nCols = slicedArray.shape
+                if self._nRows > 0 and self._nCols > 0 and slicedArray.dtype.names:
+                    self._fieldNames = slicedArray.dtype.names
                 else:
                     self._fieldNames = []
 
             self._rtiInfo = rtiInfo
             self._separateFields = separateFields
 
+            if comboRanges is None:
+                self._headerStartsAndSteps = ((0, 1), (0, 1))
+            else:
+                self._headerStartsAndSteps = tuple((slc.start, slc.step) for slc in comboRanges)
+
             # Don't put numbers in the header if the record is of structured type, fields are
             # placed in separate cells and the fake dimension is selected (combo index 0)
             if self._separateFields and self._fieldNames:
@@ -446,32 +647,125 @@ class TableInspectorModel(QtCore.QAbstractTableModel):
             self.endResetModel()
 
 
-    def _cellValue(self, index):
-        """ Returns the data value of the cell at the index (without any string conversion)
+    def arrayIndex(self, row, col):
+        """ Returns the (row, col) index of the element of the sliced array that is shown in a
+            cell. They differ if the fields of a structured array are shown in separate cells.
         """
-        row = index.row()
-        col = index.column()
-        if (row < 0 or row >= self.rowCount() or col < 0 or col >= self.columnCount()):
-            return None
+        nFields = len(self._fieldNames)
+        if self._separateFieldOrientation == Qt.Horizontal:
+            return row, col // nFields
+        elif self._separateFieldOrientation == Qt.Vertical:
+            return row // nFields, col
+        else:
+            return row, col
 
-        # The check above should have returned None if the sliced array is None
-        assert self._slicedArray is not None, "Sanity check failed."
 
+    def _cellFieldName(self, row, col):
+        """ Returns the name of the field that is shown in a cell, or None if the fields are not
+            shown in separate cells.
+        """
         nFields = len(self._fieldNames)
-
-        data = self._slicedArray.data
         if self._separateFieldOrientation == Qt.Horizontal:
-            dataValue = data[row, col // nFields][self._fieldNames[col % nFields]]
+            return self._fieldNames[col % nFields]
         elif self._separateFieldOrientation == Qt.Vertical:
-            dataValue = data[row // nFields, col][self._fieldNames[row % nFields]]
+            return self._fieldNames[row % nFields]
+        else:
+            return None
+
+
+    def setFormats(self, encoding, strFormat, intFormat, numFormat, otherFormat, maskFormat):
+        """ Sets the encoding and the format strings (replacement fields) of the cells.
+            The formatted cells are discarded if one of them has changed.
+        """
+        formats = (encoding, strFormat, intFormat, numFormat, otherFormat, maskFormat)
+        if formats != (self.encoding, self.strFormat, self.intFormat, self.numFormat,
+                       self.otherFormat, self.maskFormat):
+            logger.debug("Formats changed, discarding {} formatted blocks"
+                         .format(len(self._formattedBlocks)))
+            self._formattedBlocks.clear()
+            (self.encoding, self.strFormat, self.intFormat, self.numFormat,
+             self.otherFormat, self.maskFormat) = formats
+
+
+    @staticmethod
+    def _isCompletelyMasked(maskValue):
+        """ Returns True if all elements of a mask value are masked.
+        """
+        # Here maskValue can still be a list in case of structured arrays. It can even still be
+        # a numpy array in case of a structured array with sub arrays as fields
+        if is_an_array(maskValue):
+            return bool(np.all(maskValue))
+        elif isinstance(maskValue, np.void) and maskValue.dtype.names:
+            return all(np.all(maskValue[name]) for name in maskValue.dtype.names)
         else:
-            dataValue = data[row, col]
+            try:
+                return all(maskValue)
+            except TypeError as ex:
+                return bool(maskValue)
 
-        return dataValue
 
+    def _formatBlock(self, blockIndex, fieldName):
+        """ Formats all cells of a block of the sliced array (of one field if fieldName is not
+            None) and returns them as a (strings, masked, isNumber) tuple.
 
-    def _cellMask(self, index):
-        """ Returns the data mask of the cell at the index (without any string conversion)
+            The strings is a list with the formatted cells of the block in C order. The masked
+            and isNumber are boolean arrays with the shape of the block, that are True if the
+            cell is completely masked, and if it contains a number, respectively.
+        """
+        awm = self._blockedArray.block(blockIndex)
+        data = awm.data if fieldName is None else awm.data[fieldName]
+        numRows, numCols = awm.data.shape[:2]
+
+        mask = awm.maskIndex() # Also for PackedMasks
+        if fieldName is not None and mask.dtype.names:
+            mask = mask[fieldName]
+
+        if mask.ndim == 2 and not mask.dtype.names:
+            masked = mask
+        else:
+            masked = np.empty((numRows, numCols), dtype=np.bool_)
+            for cellIndex in np.ndindex(numRows, numCols):
+                masked[cellIndex] = self._isCompletelyMasked(mask[cellIndex])
+
+        formats = dict(decode_bytes=self.encoding, maskFormat=self.maskFormat,
+                       strFormat=self.strFormat, intFormat=self.intFormat,
+                       numFormat=self.numFormat, otherFormat=self.otherFormat)
+
+        # Integers and doubles are formatted all at once. The masked cells are then formatted
+        # again if they have their own format.
+        strings = None
+        if data.ndim == 2 and (data.dtype.kind in 'iu' or data.dtype == np.float64):
+            fmt = self.intFormat if data.dtype.kind in 'iu' else self.numFormat
+            try:
+                strings = format_numbers(data, fmt)
+            except Exception as ex:
+                logger.debug("Formatting the cells one by one: {}".format(ex))
+            else:
+                if self.maskFormat != '{}':
+                    for row, col in zip(*np.nonzero(masked)):
+                        strings[row * numCols + col] = to_string(data[row, col], masked=True,
+                                                                 **formats)
+        if strings is None:
+            strings = [to_string(data[cellIndex], masked=masked[cellIndex], **formats)
+                       for cellIndex in np.ndindex(numRows, numCols)]
+
+        if data.ndim == 2 and data.dtype.kind == 'O':
+            isNumber = np.array([isinstance(value, numbers.Number) for value in data.flat],
+                                dtype=np.bool_).reshape(numRows, numCols)
+        else:
+            # Structured arrays and sub arrays are no numbers, neither are numpy booleans.
+            isNumber = np.full((numRows, numCols), data.ndim == 2 and data.dtype.kind in 'iufcm',
+                               dtype=np.bool_)
+
+        return strings, masked, isNumber
+
+
+    def _formattedCell(self, index):
+        """ Returns a (string, masked, isNumber) tuple with the formatted cell at the index, and
+            whether the cell is masked and contains a number. Returns None for invalid indices.
+
+            The cells of the block that contains the cell are all formatted at once, and are
+            kept until the sliced array or the formats change.
         """
         row = index.row()
         col = index.column()
@@ -479,31 +773,25 @@ class TableInspectorModel(QtCore.QAbstractTableModel):
             return None
 
         # The check above should have returned None if the sliced array is None
-        assert self._slicedArray is not None, "Sanity check failed."
+        assert self._blockedArray is not None, "Sanity check failed."
 
-        nFields = len(self._fieldNames)
-        mask = self._slicedArray.mask
-        if is_an_array(mask):
-            if self._separateFieldOrientation == Qt.Horizontal:
-                maskValue = mask[row, col // nFields][self._fieldNames[col % nFields]]
-            elif self._separateFieldOrientation == Qt.Vertical:
-                maskValue = mask[row // nFields, col][self._fieldNames[row % nFields]]
-            else:
-                maskValue = mask[row, col]
-        else:
-            maskValue = mask
+        arrayRow, arrayCol = self.arrayIndex(row, col)
+        blockIndex = self._blockedArray.blockIndex(arrayRow, arrayCol)
+        key = (blockIndex, self._cellFieldName(row, col))
 
-        # Here maskValue can still be a list in case of structured arrays. It can even still be
-        # a numpy array in case of a structured array with sub arrays as fields
-        if is_an_array(maskValue):
-            allMasked = np.all(maskValue)
-        else:
-            try:
-                allMasked = all(maskValue)
-            except TypeError as ex:
-                allMasked = bool(maskValue)
+        formattedBlock = self._formattedBlocks.get(key)
+        if formattedBlock is None:
+            formattedBlock = self._formatBlock(*key)
+            while len(self._formattedBlocks) >= FORMAT_CACHE_BLOCKS:
+                self._formattedBlocks.popitem(last=False)
+            self._formattedBlocks[key] = formattedBlock
 
-        return allMasked
+        strings, masked, isNumber = formattedBlock
+        blockRows, blockCols = self._blockedArray.blockShape
+        blockRow = arrayRow - blockIndex[0] * blockRows
+        blockCol = arrayCol - blockIndex[1] * blockCols
+        return (strings[blockRow * masked.shape[1] + blockCol],
+                masked[blockRow, blockCol], isNumber[blockRow, blockCol])
 
 
     def data(self, index, role = Qt.DisplayRole):
@@ -511,25 +799,24 @@ class TableInspectorModel(QtCore.QAbstractTableModel):
         """
         try:
             if role == Qt.DisplayRole:
-                return to_string(self._cellValue(index), masked=self._cellMask(index),
-                                 decode_bytes=self.encoding, maskFormat=self.maskFormat,
-                                 strFormat=self.strFormat, intFormat=self.intFormat,
-                                 numFormat=self.numFormat, otherFormat=self.otherFormat)
+                formattedCell = self._formattedCell(index)
+                return None if formattedCell is None else formattedCell[0]
 
             elif role == Qt.FontRole:
                 #assert self._font, "Font undefined"
                 return self._font
 
             elif role == Qt.TextColorRole:
-                masked = self._cellMask(index)
-                if not is_an_array(masked) and masked:
+                formattedCell = self._formattedCell(index)
+                if formattedCell is not None and formattedCell[1]:
                     return self.missingColor
                 else:
                     return self.dataColor
 
             elif role == Qt.TextAlignmentRole:
                 if self.horAlignment == ALIGN_SMART:
-                    cellContainsNumber = isinstance(self._cellValue(index), numbers.Number)
+                    formattedCell = self._formattedCell(index)
+                    cellContainsNumber = formattedCell is not None and formattedCell[2]
                     horAlign = Qt.AlignRight if cellContainsNumber else Qt.AlignLeft
                     return horAlign | self.verAlignment
                 else:
@@ -552,7 +839,8 @@ class TableInspectorModel(QtCore.QAbstractTableModel):
 
     def headerData(self, section, orientation, role):
         """ Returns the header for a section (row or column depending on orientation).
-            Reimplemented from QAbstractTableModel to make the headers start at 0.
+            Reimplemented from QAbstractTableModel to make the headers start at 0, or at the
+            start of the sub range that is selected in the collector.
         """
         if role == Qt.DisplayRole:
             if self._separateFieldOrientation == orientation:
@@ -560,15 +848,25 @@ class TableInspectorModel(QtCore.QAbstractTableModel):
                 nFields = len(self._fieldNames)
                 varNr = section // nFields
                 fieldNr = section % nFields
-                header = str(varNr) + ' : ' if self._numbersInHeader else ''
+                header = (str(self._headerNumber(varNr, orientation)) + ' : '
+                          if self._numbersInHeader else '')
                 header += self._fieldNames[fieldNr]
                 return header
             else:
-                return str(section)
+                return str(self._headerNumber(section, orientation))
         else:
             return None
 
 
+    def _headerNumber(self, section, orientation):
+        """ Returns the index in the complete array of a row or column of the sliced array.
+            These differ when a sub range is selected in the collector.
+        """
+        rowStartAndStep, colStartAndStep = self._headerStartsAndSteps
+        start, step = colStartAndStep if orientation == Qt.Horizontal else rowStartAndStep
+        return start + section * step
+
+
     def rowCount(self, parent=None):
         """ The number of rows of the sliced array.
             The 'parent' parameter can be a QModelIndex. It is ignored since the number of
@@ -108,7 +108,7 @@ class TextInspector(AbstractInspector):
         logger.debug("TextInspector._drawContents: {}".format(self))
         self._clearContents()
 
-        slicedArray = self.collector.getSlicedArray()
+        slicedArray = self.collector.getSlicedArray(copy=False)
 
         if slicedArray is None:
             return
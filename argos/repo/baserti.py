@@ -20,6 +20,7 @@
 """
 import logging
 import os
+import threading
 
 from argos.external import six
 from argos.info import DEBUGGING
@@ -29,6 +30,23 @@ from argos.utils.cls import check_class, is_a_sequence
 
 logger = logging.getLogger(__name__)
 
+# Not all libraries that are used by the RTIs are thread-safe (e.g. netCDF4), so all reads of
+# RTI data that may happen outside the GUI thread must hold this lock. Opening and closing the
+# underlying resources holds it as well, so that a file is never closed during such a read.
+RTI_READ_LOCK = threading.RLock()
+
+# Functions that are called with the file name and node path of an RTI when it is closed. This
+# allows, for example, the collector to remove the cached slices of the RTI.
+_CLOSE_HOOKS = []
+
+
+def addCloseHook(hook):
+    """ Registers a function that is called with the (fileName, nodePath) of an RTI when the RTI
+        is closed. Adding a function that is already registered has no effect.
+    """
+    if hook not in _CLOSE_HOOKS:
+        _CLOSE_HOOKS.append(hook)
+
 
 class BaseRti(AbstractLazyLoadTreeItem):
     """ TreeItem for use in a RepositoryTreeModel. (RTI = Repository TreeItem)
@@ -96,15 +114,16 @@ class BaseRti(AbstractLazyLoadTreeItem):
         """
         self.clearException()
         try:
-            if self._isOpen:
-                logger.warn("Resources already open. Closing them first before opening.")
-                self._closeResources()
-                self._isOpen = False
+            with RTI_READ_LOCK:
+                if self._isOpen:
+                    logger.warn("Resources already open. Closing them first before opening.")
+                    self._closeResources()
+                    self._isOpen = False
 
-            assert not self._isOpen, "Sanity check failed: _isOpen should be false"
-            logger.debug("Opening {}".format(self))
-            self._openResources()
-            self._isOpen = True
+                assert not self._isOpen, "Sanity check failed: _isOpen should be false"
+                logger.debug("Opening {}".format(self))
+                self._openResources()
+                self._isOpen = True
 
             if self.model:
                 self.model.sigItemChanged.emit(self)
@@ -131,15 +150,25 @@ class BaseRti(AbstractLazyLoadTreeItem):
             Any exception that occurs is caught and put in the exception property.
             This method calls _closeResources, which does the actual resource cleanup. Descendants
             should typically override the latter instead of this one.
+
+            The functions that are registered with addCloseHook are called first. An exception in
+            one of them is handled like the other errors during closing; the resources are still
+            closed.
         """
         self.clearException()
         try:
-            if self._isOpen:
-                logger.debug("Closing {}".format(self))
-                self._closeResources()
-                self._isOpen = False
-            else:
-                logger.debug("Resources already closed (ignored): {}".format(self))
+            try:
+                for hook in list(_CLOSE_HOOKS):
+                    hook(self.fileName, self.nodePath)
+            finally:
+                # The resources are closed, even if a hook fails.
+                if self._isOpen:
+                    logger.debug("Closing {}".format(self))
+                    with RTI_READ_LOCK: # Waits until the reads in other threads are finished.
+                        self._closeResources()
+                        self._isOpen = False
+                else:
+                    logger.debug("Resources already closed (ignored): {}".format(self))
 
             if self.model:
                 self.model.sigItemChanged.emit(self)
@@ -210,7 +239,8 @@ class BaseRti(AbstractLazyLoadTreeItem):
 
             childItems = []
             try:
-                childItems = self._fetchAllChildren()
+                with RTI_READ_LOCK: # Reads the attributes of the file in the library.
+                    childItems = self._fetchAllChildren()
                 assert is_a_sequence(childItems), "ChildItems must be a sequence"
 
             except Exception as ex:
@@ -313,6 +343,27 @@ class BaseRti(AbstractLazyLoadTreeItem):
         raise NotImplemented("Override for slicable arrays")
 
 
+    @property
+    def chunkShape(self):
+        """ Returns the shape of the blocks in which the array is stored in the file, or None if
+            the storage is not chunked (or unknown).
+
+            Reading along chunk boundaries is more efficient, e.g. when a dimension is projected.
+            The base implementation returns None. Descendants can override this.
+        """
+        return None
+
+
+    def refreshShape(self):
+        """ Re-reads the shape of the underlying array, which may have grown if the file is still
+            being written. Returns True if the shape has changed.
+
+            The base implementation returns False. Descendants that can follow growing arrays
+            should override this.
+        """
+        return False
+
+
     @property
     def elementTypeName(self):
         """ String representation of the element type.
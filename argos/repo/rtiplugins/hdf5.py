@@ -127,6 +127,24 @@ def dataSetMissingValue(h5Dataset):
     return None
 
 
+def dataSetRefresh(h5Dataset):
+    """ Refreshes the metadata of the dataset so that elements that have been appended by a
+        process that writes the file in SWMR (single writer multiple reader) mode become visible.
+
+        Returns True if the shape of the dataset has changed. Returns False if the dataset can't
+        be refreshed, e.g. because the file is not opened in SWMR mode.
+    """
+    try:
+        oldShape = h5Dataset.shape
+        h5Dataset.refresh()
+        return h5Dataset.shape != oldShape
+    except Exception as ex:
+        # The exception type depends on the h5py version (older versions have no refresh) and
+        # on whether the file has been closed.
+        logger.debug("Unable to refresh dataset: {}".format(ex))
+        return False
+
+
 
 class H5pyScalarRti(BaseRti):
     """ Repository Tree Item (RTI) that contains a scalar HDF-5 variable.
@@ -285,6 +303,12 @@ class H5pyFieldRti(BaseRti):
         return self._h5Dataset.shape + self._subArrayShape
 
 
+    def refreshShape(self):
+        """ Re-reads the shape of the dataset. Returns True if it has changed.
+        """
+        return dataSetRefresh(self._h5Dataset)
+
+
     @property
     def elementTypeName(self):
         """ String representation of the element type.
@@ -390,6 +414,19 @@ class H5pyDatasetRti(BaseRti):
         return self._h5Dataset.shape
 
 
+    def refreshShape(self):
+        """ Re-reads the shape of the dataset. Returns True if it has changed.
+        """
+        return dataSetRefresh(self._h5Dataset)
+
+
+    @property
+    def chunkShape(self):
+        """ Returns the chunk shape of the HDF-5 dataset (None if the dataset is contiguous).
+        """
+        return self._h5Dataset.chunks
+
+
     @property
     def elementTypeName(self):
         """ String representation of the element type.
@@ -513,7 +550,18 @@ class H5pyFileRti(H5pyGroupRti):
         """ Opens the root Dataset.
         """
         logger.info("Opening: {}".format(self._fileName))
-        self._h5Group = h5py.File(self._fileName, 'r')
+
+        # A file that another process is writing in SWMR (single writer multiple reader) mode
+        # can't be opened normally. It is then opened in SWMR mode, so that the data that is
+        # appended to it can be followed (see refreshShape).
+        try:
+            self._h5Group = h5py.File(self._fileName, 'r')
+        except (IOError, OSError) as ex:
+            logger.debug("Unable to open {}, retrying in SWMR mode: {}".format(self._fileName, ex))
+            try:
+                self._h5Group = h5py.File(self._fileName, 'r', libver='latest', swmr=True)
+            except (IOError, OSError, ValueError, TypeError):
+                raise ex
 
 
     def _closeResources(self):
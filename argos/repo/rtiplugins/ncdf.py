@@ -302,6 +302,16 @@ class NcdfVariableRti(BaseRti):
         return self._ncVar.shape
 
 
+    @property
+    def chunkShape(self):
+        """ Returns the chunk sizes of the variable (None if the variable is contiguous).
+        """
+        chunking = self._ncVar.chunking()
+        if chunking == 'contiguous' or chunking is None:
+            return None
+        return tuple(chunking)
+
+
     @property
     def attributes(self):
         """ The attributes dictionary.
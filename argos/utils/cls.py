@@ -220,6 +220,26 @@ def to_string(var, masked=None, decode_bytes='utf-8', maskFormat='', strFormat='
     return result
 
 
+def format_numbers(array, fmt):
+    """ Formats all elements of an integer or double precision array with the format string.
+
+        Gives the same strings as to_string gives for the (unmasked) elements, but is much faster
+        because the elements are converted to Python numbers in one pass and no type checks are
+        needed per element.
+
+        Returns a list with the strings of the flattened array (in C order). Raises a TypeError
+        for other types of arrays. Exceptions of the format string are not caught.
+
+        :param array: numpy array of integers or doubles.
+        :param fmt: new style format string, e.g. '{:8.3f}'.
+    """
+    if not (array.dtype.kind in 'iu' or array.dtype == np.float64):
+        raise TypeError("Can only format integer or double arrays, got: {}".format(array.dtype))
+
+    formatValue = fmt.format
+    return [formatValue(value) for value in array.ravel().tolist()]
+
+
 def is_a_string(var, allow_none=False):
     """ Returns True if var is a string (ascii or unicode)
 
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Min/max envelope of long 1D arrays, for plotting them with a limited number of points.
+
+    The array is divided into buckets and the minimum and maximum of each bucket are plotted.
+    This way the extremes remain visible, no matter how many samples fall into a pixel. The
+    minima and maxima are precomputed for a pyramid of levels with increasing bucket sizes, so
+    that the level that matches the zoom level can be selected without going over the data.
+"""
+from __future__ import division
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Each level has buckets that are this many times larger than the buckets of the previous level.
+ENVELOPE_FACTOR = 4
+
+# The last level has at most this many buckets.
+MAX_TOP_LEVEL_BUCKETS = 1024
+
+# The first level is calculated from blocks of (about) this many samples, so that only the
+# block has to be converted to floating point at once.
+BLOCK_SIZE = 1024 * 1024
+
+
+def _reduceBuckets(values, bucketSize, ufunc, valid=None, dtype=None):
+    """ Returns ufunc.reduce of each bucket of bucketSize consecutive values. NaNs and the values
+        where valid is False are ignored. The result is NaN for buckets without valid values.
+
+        :param ufunc: np.fmin or np.fmax (which ignore NaNs).
+    """
+    dtype = values.dtype if dtype is None else dtype
+    numBuckets = -(-len(values) // bucketSize)
+    result = np.empty(numBuckets, dtype=dtype)
+
+    blockBuckets = max(1, BLOCK_SIZE // bucketSize)
+    for firstBucket in range(0, numBuckets, blockBuckets):
+        lastBucket = min(firstBucket + blockBuckets, numBuckets)
+        start, stop = firstBucket * bucketSize, lastBucket * bucketSize
+
+        # The last bucket is padded with NaNs
+        block = np.full(stop - start, np.nan, dtype=dtype)
+        block[:min(stop, len(values)) - start] = values[start:stop]
+        if valid is not None:
+            block[:min(stop, len(values)) - start][~valid[start:stop]] = np.nan
+
+        # Combining strided views is much faster than reducing along a short axis.
+        out = result[firstBucket:lastBucket]
+        out[:] = block[0::bucketSize]
+        for offset in range(1, bucketSize):
+            ufunc(out, block[offset::bucketSize], out=out)
+    return result
+
+
+
+class MinMaxEnvelope(object):
+    """ The minimum and maximum per bucket of a 1D array, for a pyramid of bucket sizes.
+
+        Level 0 contains the samples themselves. Level n has buckets of ENVELOPE_FACTOR**n
+        samples. The levels are calculated in the constructor and extended when samples are
+        appended.
+    """
+    def __init__(self, data, valid=None, factor=ENVELOPE_FACTOR,
+                 maxTopLevelBuckets=MAX_TOP_LEVEL_BUCKETS):
+        """ Constructor.
+
+            :param data: 1D array with integer or floating point values.
+            :param valid: boolean array that is False for the samples that must be ignored (e.g.
+                masked or infinite values). If None, all non-NaN samples are used.
+            :param factor: the ratio of the bucket sizes of consecutive levels.
+            :param maxTopLevelBuckets: levels are added until a level has at most this many
+                buckets.
+        """
+        if data.ndim != 1:
+            raise ValueError("Data must be 1D, got: {} dimensions".format(data.ndim))
+        if factor < 2:
+            raise ValueError("Factor must be at least 2, got: {}".format(factor))
+
+        self._data = data
+        self._valid = valid
+        self._factor = factor
+        self._maxTopLevelBuckets = maxTopLevelBuckets
+
+        self._minima = [None] # Per level, level 0 is the data itself.
+        self._maxima = [None]
+        self._calculateLevels(0)
+
+        logger.debug("Envelope of {} samples has {} levels".format(len(data), self.numLevels))
+
+
+    def _calculateLevels(self, firstSample):
+        """ Calculates the buckets of all levels that contain the samples from firstSample on.
+            The buckets before them are kept. Levels are added until a level has at most
+            maxTopLevelBuckets buckets.
+        """
+        factor = self._factor
+
+        # The minima and maxima can be NaN, so they are floats that can hold the data exactly.
+        dtype = np.result_type(self._data.dtype, np.float32)
+
+        first = firstSample # The first element of the previous level that has changed.
+        level = 0
+        numBuckets = len(self._data)
+        while numBuckets > self._maxTopLevelBuckets:
+            level += 1
+            isNewLevel = level >= len(self._minima)
+            first = 0 if isNewLevel else first // factor # First bucket that changes.
+            start = first * factor
+
+            if level == 1:
+                valid = None if self._valid is None else self._valid[start:]
+                minima = _reduceBuckets(self._data[start:], factor, np.fmin, valid=valid,
+                                        dtype=dtype)
+                maxima = _reduceBuckets(self._data[start:], factor, np.fmax, valid=valid,
+                                        dtype=dtype)
+            else:
+                minima = _reduceBuckets(self._minima[level - 1][start:], factor, np.fmin)
+                maxima = _reduceBuckets(self._maxima[level - 1][start:], factor, np.fmax)
+
+            if isNewLevel:
+                self._minima.append(minima)
+                self._maxima.append(maxima)
+            else:
+                self._minima[level] = np.concatenate((self._minima[level][:first], minima))
+                self._maxima[level] = np.concatenate((self._maxima[level][:first], maxima))
+            numBuckets = len(self._minima[level])
+
+
+    def extend(self, data, valid=None):
+        """ Updates the envelope after samples have been appended to the data. Only the buckets
+            that contain appended samples are calculated.
+
+            :param data: the complete data. Its first samples must be the current data.
+            :param valid: the valid array of the complete data (see the constructor).
+        """
+        numSamples = len(self._data)
+        if len(data) < numSamples:
+            raise ValueError("Data can only be extended, got {} samples, had {}"
+                             .format(len(data), numSamples))
+        self._data = data
+        self._valid = valid
+        self._calculateLevels(numSamples)
+        logger.debug("Envelope extended to {} samples, has {} levels"
+                     .format(len(data), self.numLevels))
+
+
+    @property
+    def numLevels(self):
+        """ The number of levels, including level 0.
+        """
+        return len(self._minima)
+
+
+    def bucketSize(self, level):
+        """ Returns the number of samples per bucket of a level.
+        """
+        return self._factor ** level
+
+
+    def levelForScale(self, samplesPerPixel):
+        """ Returns the level with the largest buckets that contain at most samplesPerPixel
+            samples. Since the minimum and maximum of each bucket are plotted, this gives at least
+            one point per pixel.
+        """
+        level = 0
+        while level + 1 < self.numLevels and self.bucketSize(level + 1) <= samplesPerPixel:
+            level += 1
+        return level
+
+
+    def _segments(self, level, start, stop):
+        """ Returns a list of (level, firstBucket, lastBucket) tuples that cover all samples.
+
+            The samples from start to stop are covered by buckets of the level, the samples
+            before and after it by buckets of increasingly higher levels.
+        """
+        numSamples = len(self._data)
+        topLevel = self.numLevels - 1
+        size = self.bucketSize(level)
+        detailStart = (start // size) * size
+        detailStop = min(numSamples, -(-stop // size) * size)
+
+        segments = []
+
+        # From the first sample to the detail region, from the highest level down.
+        pos = 0
+        for coarseLevel in range(topLevel, level, -1):
+            coarseSize = self.bucketSize(coarseLevel)
+            end = (detailStart // coarseSize) * coarseSize
+            if end > pos:
+                segments.append((coarseLevel, pos // coarseSize, end // coarseSize))
+                pos = end
+
+        # The detail region
+        segments.append((level, pos // size, -(-detailStop // size)))
+
+        # From the detail region to the last sample, from the level up.
+        pos = detailStop
+        for coarseLevel in range(level + 1, topLevel + 1):
+            coarseSize = self.bucketSize(coarseLevel)
+            fineSize = self.bucketSize(coarseLevel - 1)
+            end = min(numSamples, -(-pos // coarseSize) * coarseSize)
+            if end > pos:
+                segments.append((coarseLevel - 1, pos // fineSize, -(-end // fineSize)))
+                pos = end
+        if pos < numSamples:
+            topSize = self.bucketSize(topLevel)
+            segments.append((topLevel, pos // topSize, -(-numSamples // topSize)))
+
+        return segments
+
+
+    def plotData(self, level, start, stop):
+        """ Returns the data for plotting the envelope as (indices, values, connected) tuple.
+
+            The samples from start to stop are plotted at the level, the samples before and after
+            it at increasingly higher levels. The plot therefore always spans all samples, and
+            contains their extremes, with a limited number of points.
+
+            A bucket is plotted as two points, its minimum and its maximum, at the index of the
+            middle sample of the bucket. Buckets without valid values and invalid samples are NaN
+            and not connected.
+
+            :param level: the level of the samples between start and stop.
+            :param start: index of the first sample that is plotted in detail.
+            :param stop: index of the sample after the last sample that is plotted in detail.
+        """
+        numSamples = len(self._data)
+        allIndices = []
+        allValues = []
+        for segmentLevel, firstBucket, lastBucket in self._segments(level, start, stop):
+            if segmentLevel == 0:
+                indices = np.arange(firstBucket, lastBucket, dtype=np.float64)
+                values = np.array(self._data[firstBucket:lastBucket],
+                                  dtype=np.result_type(self._data.dtype, np.float32))
+                if self._valid is not None:
+                    values[~self._valid[firstBucket:lastBucket]] = np.nan
+            else:
+                size = self.bucketSize(segmentLevel)
+                middles = np.arange(firstBucket, lastBucket, dtype=np.float64) * size
+                middles += (size - 1) / 2
+                np.minimum(middles, numSamples - 1, out=middles)
+                indices = np.repeat(middles, 2)
+
+                values = np.empty(2 * (lastBucket - firstBucket),
+                                  dtype=self._minima[segmentLevel].dtype)
+                values[0::2] = self._minima[segmentLevel][firstBucket:lastBucket]
+                values[1::2] = self._maxima[segmentLevel][firstBucket:lastBucket]
+
+            allIndices.append(indices)
+            allValues.append(values)
+
+        indices = np.concatenate(allIndices)
+        values = np.concatenate(allValues)
+        return indices, values, np.isfinite(values)
@@ -35,6 +35,168 @@ class ConsistencyError(Exception):
     pass
 
 
+class PackedMask(object):
+    """ Boolean mask that is stored with 8 elements per byte (see np.packbits).
+
+        Can be used as the mask of an ArrayWithMask for very large slices, where a mask with one
+        byte per element would occupy as much memory as an 8-bit image itself.
+
+        The bits are packed along the last dimension of the mask as it was created (the storage
+        order). Transposing only permutes the axes and shares the packed bits. Indexing with
+        integers and slices (e.g. getting a single row or column) unpacks only the bytes that
+        contain the selected elements.
+    """
+    def __init__(self, packed, storageShape, axes=None):
+        """ Constructor. Use fromArray to create a PackedMask from a boolean array.
+
+            :param packed: uint8 array with the bits packed along the last dimension.
+            :param storageShape: the shape of the unpacked mask in storage order.
+            :param axes: permutation of the storage axes, i.e. axis i of the mask is storage
+                axis axes[i]. If None the mask is in storage order.
+        """
+        check_class(packed, np.ndarray)
+        assert packed.dtype == np.uint8, "Packed mask must be uint8, got: {}".format(packed.dtype)
+        storageShape = tuple(storageShape)
+        assert len(storageShape) >= 1, "Zero-dimensional masks can't be packed"
+        assert packed.shape == storageShape[:-1] + ((storageShape[-1] + 7) // 8, ), \
+            "Shape mismatch: packed={}, storage={}".format(packed.shape, storageShape)
+
+        if axes is None:
+            axes = tuple(range(len(storageShape)))
+        assert sorted(axes) == list(range(len(storageShape))), "Invalid axes: {}".format(axes)
+
+        self._packed = packed
+        self._storageShape = storageShape
+        self._axes = tuple(axes)
+
+
+    @classmethod
+    def fromArray(cls, mask):
+        """ Creates a PackedMask from a boolean array with at least one dimension.
+        """
+        check_class(mask, np.ndarray)
+        assert mask.dtype == np.bool_, "Mask must be boolean, got: {}".format(mask.dtype)
+        return cls(np.packbits(mask, axis=-1), mask.shape)
+
+
+    @property
+    def shape(self):
+        """ The shape of the (unpacked) mask.
+        """
+        return tuple(self._storageShape[axis] for axis in self._axes)
+
+
+    @property
+    def ndim(self):
+        """ The number of dimensions of the mask.
+        """
+        return len(self._storageShape)
+
+
+    @property
+    def nbytes(self):
+        """ The number of bytes of the packed bits.
+        """
+        return self._packed.nbytes
+
+
+    def copy(self):
+        """ Returns a copy. The packed bits are copied.
+        """
+        return PackedMask(np.copy(self._packed), self._storageShape, self._axes)
+
+
+    def asReadOnly(self):
+        """ Returns a PackedMask with a read-only view on the packed bits.
+        """
+        packed = self._packed.view()
+        packed.setflags(write=False)
+        return PackedMask(packed, self._storageShape, self._axes)
+
+
+    def transpose(self, *axes):
+        """ Returns the transposed mask. Has the same parameters as np.transpose.
+            The packed bits are not copied.
+        """
+        if len(axes) == 1 and not isinstance(axes[0], (int, np.integer)):
+            axes = axes[0] # A sequence was given.
+        if not axes:
+            axes = tuple(reversed(range(self.ndim)))
+        return PackedMask(self._packed, self._storageShape, [self._axes[axis] for axis in axes])
+
+
+    def unpack(self):
+        """ Returns the complete mask as a boolean array.
+        """
+        numBits = self._storageShape[-1]
+        mask = np.unpackbits(self._packed, axis=-1)[..., :numBits].view(np.bool_)
+        return np.transpose(mask, self._axes)
+
+
+    def __getitem__(self, index):
+        """ Returns the mask at an index that consists of integers and slices (one per dimension,
+            missing trailing dimensions are selected completely).
+
+            Only the bytes that contain the selected elements are unpacked.
+            Returns a boolean if all dimensions are indexed with integers, otherwise a boolean array.
+
+            The index can also be a tuple with an integer array per dimension (e.g. the result of
+            np.unravel_index) to get the mask at a number of separate elements.
+        """
+        if not isinstance(index, tuple):
+            index = (index, )
+
+        if len(index) == self.ndim and all(isinstance(idx, np.ndarray) for idx in index):
+            storageIndex = [None] * self.ndim
+            for idx, axis in zip(index, self._axes):
+                storageIndex[axis] = idx
+            lastIndex = storageIndex[-1]
+            packedBytes = self._packed[tuple(storageIndex[:-1]) + (lastIndex // 8, )]
+            return ((packedBytes >> (7 - lastIndex % 8)) & 1).astype(np.bool_)
+        if len(index) > self.ndim:
+            raise IndexError("Too many indices for mask with {} dimensions: {}"
+                             .format(self.ndim, index))
+        index = index + (slice(None), ) * (self.ndim - len(index))
+
+        # Put the index in storage order
+        storageIndex = [None] * self.ndim
+        for idx, axis in zip(index, self._axes):
+            if not isinstance(idx, (slice, int, np.integer)):
+                raise IndexError("Only integers and slices are supported, got: {!r}".format(idx))
+            storageIndex[axis] = idx
+
+        # Unpack only the bytes that contain the selected bits of the last storage axis.
+        lastIndex = storageIndex[-1]
+        numBits = self._storageShape[-1]
+        outerIndex = tuple(storageIndex[:-1])
+        if isinstance(lastIndex, slice):
+            start, stop, step = lastIndex.indices(numBits)
+            selection = np.arange(start, stop, step)
+        else:
+            if lastIndex < 0:
+                lastIndex += numBits
+            if not 0 <= lastIndex < numBits:
+                raise IndexError("Index {} out of bounds for axis with size {}"
+                                 .format(lastIndex, numBits))
+            selection = lastIndex
+
+        packedBytes = self._packed[outerIndex][..., selection // 8]
+        result = ((packedBytes >> (7 - selection % 8)) & 1).astype(np.bool_)
+
+        if result.ndim == 0:
+            return bool(result)
+
+        # The dimensions of the result are in storage order, put them in the order of the mask.
+        slicedAxes = [axis for idx, axis in zip(index, self._axes) if isinstance(idx, slice)]
+        storageOrder = sorted(slicedAxes)
+        return np.transpose(result, [storageOrder.index(axis) for axis in slicedAxes])
+
+
+    def __repr__(self):
+        return "<PackedMask shape={}, nbytes={}>".format(self.shape, self.nbytes)
+
+
+
 class ArrayWithMask(object):
     """ Class for storing an arrays together with a mask.
 
@@ -44,11 +206,11 @@ class ArrayWithMask(object):
         """ Constructor
 
             :param data:
-            :param mask: array with mask or single boolean for the complete mask
+            :param mask: array with mask, PackedMask, or single boolean for the complete mask
             :param fill_value:
         """
         check_is_an_array(data)
-        check_class(mask, (np.ndarray, bool, np.bool_))
+        check_class(mask, (np.ndarray, PackedMask, bool, np.bool_))
 
         # Init fields
         self._data = None
@@ -76,14 +238,14 @@ class ArrayWithMask(object):
 
     @property
     def mask(self):
-        """ The mask values. Will be an array or a boolean scalar."""
+        """ The mask values. Will be an array, a PackedMask or a boolean scalar."""
         return self._mask
 
 
     @mask.setter
     def mask(self, mask):
-        """ The mask values. Must be an array or a boolean scalar."""
-        check_class(mask, (np.ndarray, bool, np.bool_))
+        """ The mask values. Must be an array, a PackedMask or a boolean scalar."""
+        check_class(mask, (np.ndarray, PackedMask, bool, np.bool_))
         if isinstance(mask, (bool, np.bool_)):
             self._mask = bool(mask)
         else:
@@ -102,12 +264,20 @@ class ArrayWithMask(object):
         self._fill_value = fill_value
 
 
+    @property
+    def hasMask(self):
+        """ False if there is no mask, i.e. if the mask is the boolean False. No mask array needs
+            to be processed in that case.
+        """
+        return self._mask is not False
+
+
     def checkIsConsistent(self):
         """ Raises a ConsistencyError if the mask has an incorrect shape.
         """
-        if is_an_array(self.mask) and self.mask.shape != self.data.shape:
+        if not isinstance(self.mask, bool) and self.mask.shape != self.data.shape:
             raise ConsistencyError("Shape mismatch mask={}, data={}"
-                                   .format(self.mask.shape != self.data.shape))
+                                   .format(self.mask.shape, self.data.shape))
 
 
     @classmethod
@@ -127,13 +297,54 @@ class ArrayWithMask(object):
         # https://docs.scipy.org/doc/numpy/reference/maskedarray.baseclass.html#numpy.ma.masked
         fill_value = getattr(masked_arr, 'fill_value', None)
 
-        return cls(masked_arr.data, masked_arr.mask, fill_value)
+        # Regular arrays have no mask (ma.nomask). A boolean mask array without masked elements
+        # is replaced by False so that the inspectors can skip the masking altogether. Structured
+        # masks (of compound data) have a boolean per field and are kept as they are.
+        mask = ma.getmask(masked_arr)
+        if is_an_array(mask) and mask.dtype == np.bool_ and not np.any(mask):
+            mask = False
+
+        return cls(ma.getdata(masked_arr), mask, fill_value)
+
+
+    def packMask(self):
+        """ Replaces the mask array by a PackedMask, which uses one bit per element.
+            Does nothing if the mask is a boolean, is already packed, or if the array is
+            zero-dimensional or structured.
+        """
+        mask = self.mask
+        if is_an_array(mask) and mask.ndim >= 1 and mask.dtype == np.bool_:
+            self.mask = PackedMask.fromArray(mask)
+
+
+    def copy(self):
+        """ Returns a copy of the ArrayWithMask. The data and the mask array are copied.
+        """
+        mask = self.mask if isinstance(self.mask, bool) else self.mask.copy()
+        return ArrayWithMask(np.copy(self.data), mask, self.fill_value)
+
+
+    def asReadOnly(self):
+        """ Returns an ArrayWithMask with read-only views on the data and the mask. No data is
+            copied. Use copy() to get an array that can be modified.
+        """
+        data = self.data.view()
+        data.setflags(write=False)
+        if is_an_array(self.mask):
+            mask = self.mask.view()
+            mask.setflags(write=False)
+        elif isinstance(self.mask, PackedMask):
+            mask = self.mask.asReadOnly()
+        else:
+            mask = self.mask
+        return ArrayWithMask(data, mask, self.fill_value)
 
 
     def asMaskedArray(self):
         """ Creates converts to a masked array
         """
-        return ma.masked_array(data=self.data, mask=self.mask, fill_value=self.fill_value)
+        mask = self.mask.unpack() if isinstance(self.mask, PackedMask) else self.mask
+        return ma.masked_array(data=self.data, mask=mask, fill_value=self.fill_value)
 
 
     def maskAt(self, index):
@@ -141,6 +352,9 @@ class ArrayWithMask(object):
 
             It the mask is a boolean it is returned since this boolean representes the mask for
             all array elements.
+
+            The index may also select a row or column (e.g. (row, slice(None))). For a PackedMask
+            only the selected elements are then unpacked.
         """
         if isinstance(self.mask, bool):
             return self.mask
@@ -155,6 +369,8 @@ class ArrayWithMask(object):
         """
         if isinstance(self.mask, bool):
             return np.full(self.data.shape, self.mask, dtype=np.bool)
+        elif isinstance(self.mask, PackedMask):
+            return self.mask.unpack()
         else:
             return self.mask
 
@@ -188,10 +404,29 @@ class ArrayWithMask(object):
             :return: copy/view with transposed
         """
         tdata = np.transpose(self.data, *args, **kwargs)
-        tmask = np.transpose(self.mask, *args, **kwargs) if is_an_array(self.mask) else self.mask
+        if isinstance(self.mask, bool):
+            tmask = self.mask
+        elif isinstance(self.mask, PackedMask):
+            tmask = self.mask.transpose(*args, **kwargs)
+        else:
+            tmask = np.transpose(self.mask, *args, **kwargs)
         return ArrayWithMask(tdata, tmask, self.fill_value)
 
 
+    def concatenate(self, other, axis=0):
+        """ Returns a new ArrayWithMask with the elements of other appended along the axis.
+            The data and masks are copied. The fill_value is that of this array.
+
+            :param other: ArrayWithMask that has the same shape except along the axis.
+        """
+        data = np.concatenate((self.data, other.data), axis=axis)
+        if self.mask is False and other.mask is False:
+            mask = False
+        else:
+            mask = np.concatenate((self.maskIndex(), other.maskIndex()), axis=axis)
+        return ArrayWithMask(data, mask, self.fill_value)
+
+
     def replaceMaskedValue(self, replacementValue):
         """ Replaces values where the mask is True with the replacement value.
         """
@@ -200,7 +435,7 @@ class ArrayWithMask(object):
         elif self.mask is True:
             self.data[:] = replacementValue
         else:
-            self.data[self.mask] = replacementValue
+            self.data[self.maskIndex()] = replacementValue
 
 
     def replaceMaskedValueWithNan(self):
@@ -221,7 +456,7 @@ class ArrayWithMask(object):
         elif self.mask is True:
             self.data[:] = np.NaN
         else:
-            self.data[self.mask] = np.NaN
+            self.data[self.maskIndex()] = np.NaN
 
 
 #############
@@ -233,19 +468,20 @@ def replaceMaskedValue(data, mask, replacementValue, copyOnReplace=True):
 
         :copyOnReplace makeCopy: If True (the default) it makes a copy if data is replaced.
     """
+    if isinstance(mask, PackedMask):
+        mask = mask.unpack()
+
     if mask is False:
         result = data
     elif mask is True:
         result = np.copy(data) if copyOnReplace else data
         result[:] = replacementValue
+    elif not np.any(mask):
+        # Nothing is replaced. Don't assign so that this works with read-only arrays.
+        result = data
     else:
         #logger.debug("############ count_nonzero: {}".format(np.count_nonzero(mask)))
-        if copyOnReplace and np.any(mask):
-            #logger.debug("Making copy")
-            result = np.copy(data)
-        else:
-            result = data
-
+        result = np.copy(data) if copyOnReplace else data
         result[mask] = replacementValue
 
     return result
@@ -271,6 +507,48 @@ def replaceMaskedValueWithFloat(data, mask, replacementValue, copyOnReplace=True
 
 
 
+def replaceMaskedAndInfWithNan(data, mask, dtype=np.float32, out=None):
+    """ Returns the data as a float array in which the masked and infinite values are NaN.
+
+        The data is converted to the dtype and the masked and infinite values are replaced in a
+        single pass. The result is written in the out array, if it has the correct shape and
+        dtype, so that the same buffer can be reused for every image. The out array must not
+        share memory with the data.
+
+        If the data already has the dtype and contains no masked or infinite values, the data
+        itself is returned, no copy is made. The data is never modified.
+
+        :param data: numpy array with integer or floating point values.
+        :param mask: array with mask, PackedMask, or single boolean for the complete mask.
+        :param dtype: the floating point type of the result.
+        :param out: optional buffer for the result.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError("dtype must be a floating point type, got: {}".format(dtype))
+    if isinstance(mask, PackedMask):
+        mask = mask.unpack()
+
+    hasMask = mask is True or is_an_array(mask)
+
+    # No conversion and nothing to replace: return the data itself.
+    if data.dtype == dtype and not hasMask and not np.any(np.isinf(data)):
+        return data
+
+    if out is None or out.shape != data.shape or out.dtype != dtype:
+        out = np.empty(data.shape, dtype=dtype)
+
+    # Find the infinities after the conversion, large finite values can overflow to inf when
+    # they are cast to a smaller floating point type (e.g. a 1e300 fill value to float32).
+    np.copyto(out, data, casting='unsafe')
+    invalid = np.isinf(out)
+    if hasMask:
+        np.logical_or(invalid, mask, out=invalid)
+    np.copyto(out, np.nan, where=invalid)
+    return out
+
+
+
 def maskedNanPercentile(maskedArray, percentiles, *args, **kwargs):
     """ Calculates np.nanpercentile on the non-masked values
     """
@@ -278,10 +556,12 @@ def maskedNanPercentile(maskedArray, percentiles, *args, **kwargs):
     #https://docs.scipy.org/doc/numpy/reference/maskedarray.generic.html#accessing-the-data
     awm = ArrayWithMask.createFromMaskedArray(maskedArray)
 
-    maskIdx = awm.maskIndex()
-    validData = awm.data[~maskIdx]
+    if awm.hasMask:
+        validData = awm.data[~awm.maskIndex()]
+    else:
+        validData = awm.data # No need to make a copy of the valid elements.
 
-    if len(validData) >= 1:
+    if validData.size >= 1:
         result = np.nanpercentile(validData, percentiles, *args, **kwargs)
     else:
         # If np.nanpercentile on an empty list only returns a single Nan. We correct this here.
@@ -343,6 +623,9 @@ def maskedEqual(array, missingValue):
 
         If the data is a structured array the mask is applied for every field (i.e. forming a
         logical-and). Otherwise ma.masked_equal is called.
+
+        If the missingValue is None, or if no element equals it, the result has no mask
+        (i.e. ma.nomask) so that no boolean array is kept next to the data. No copy is made.
     """
     if array_is_structured(array):
         # Enforce the array to be masked
@@ -360,8 +643,16 @@ def maskedEqual(array, missingValue):
 
         check_class(array, ma.MaskedArray) # post-condition check
         return array
+    elif missingValue is None:
+        # Nothing can be equal to None so no mask is needed.
+        return ma.MaskedArray(array, copy=False)
     else:
-        # masked_equal works with missing is None
-        result = ma.masked_equal(array, missingValue, copy=False)
+        condition = np.equal(ma.getdata(array), missingValue)
+        if np.any(condition):
+            result = ma.masked_where(condition, array, copy=False)
+        else:
+            result = ma.MaskedArray(array, copy=False)
+        del condition
+        result.fill_value = missingValue
         check_class(result, ma.MaskedArray) # post-condition check
         return result
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Percentiles of sliced arrays, as used by the auto-range methods of the inspectors.
+
+    The color range, histogram range and axes ranges of an inspector all discard a percentage of
+    the lowest and highest values of the same sliced array. All percentiles that these auto-range
+    methods can use are therefore calculated at once, with a single np.partition call, and
+    remembered for as long as the sliced array exists.
+
+    For very large arrays an exact calculation takes seconds. The percentiles can then be
+    estimated from a random sample of the array, which takes a fixed amount of time and memory.
+"""
+from __future__ import division
+
+import logging
+import math
+import weakref
+
+import numpy as np
+
+from argos.utils.masks import ArrayWithMask, maskedNanPercentile
+
+logger = logging.getLogger(__name__)
+
+# The percentages that the auto-range methods can discard at both ends of the data.
+DISCARD_PERCENTAGES = (0.0, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20)
+
+# Number of elements that are used to estimate the percentiles of large arrays.
+SAMPLE_SIZE = 1024 * 1024
+
+# The seed of the random sample, so that the estimate doesn't change between redraws.
+SAMPLE_SEED = 0
+
+# Statistics per ArrayWithMask object. They are removed when the array is garbage collected.
+_STATISTICS = weakref.WeakKeyDictionary()
+
+
+class PercentileStatistics(object):
+    """ Percentiles of the valid (i.e. not masked and not NaN) elements of an array.
+
+        The percentiles are calculated in the constructor. They are the same as the result of
+        maskedNanPercentile (i.e. np.nanpercentile with linear interpolation), unless they are
+        estimated from a sample (see isApproximate).
+    """
+    def __init__(self, array, percentages=DISCARD_PERCENTAGES, maxExactElements=None):
+        """ Constructor.
+
+            :param array: ArrayWithMask, masked array or numpy array.
+            :param percentages: the percentages p for which the p and 100-p percentiles are
+                calculated.
+            :param maxExactElements: if the array has more elements, the percentiles are
+                estimated from a random sample of SAMPLE_SIZE elements. If None or 0 the
+                percentiles are always exact.
+        """
+        awm = ArrayWithMask.createFromMaskedArray(array)
+
+        self._isApproximate = bool(maxExactElements) and awm.data.size > max(maxExactElements,
+                                                                              SAMPLE_SIZE)
+        if self._isApproximate:
+            validData = self._sample(awm, SAMPLE_SIZE)
+        elif awm.hasMask:
+            validData = awm.data[~awm.maskIndex()]
+        else:
+            # The data is copied because np.partition reorders the elements.
+            validData = np.array(awm.data, copy=True).ravel()
+
+        numValid = validData.size
+        if validData.dtype.kind in 'fc':
+            numValid -= np.count_nonzero(np.isnan(validData)) # NaNs are partitioned to the end
+
+        percentiles = set()
+        for percentage in percentages:
+            percentiles.add(percentage)
+            percentiles.add(100 - percentage)
+
+        self._numValid = numValid
+        self._values = {}
+
+        if numValid == 0:
+            for percentile in percentiles:
+                self._values[percentile] = np.nan
+            return
+
+        positions = {percentile: self._position(percentile) for percentile in percentiles}
+        kth = set()
+        for lowIdx, highIdx, _fraction in positions.values():
+            kth.add(lowIdx)
+            kth.add(highIdx)
+
+        validData.partition(sorted(kth))
+
+        for percentile, (lowIdx, highIdx, fraction) in positions.items():
+            low = float(validData[lowIdx])
+            if fraction == 0.0:
+                self._values[percentile] = low
+            else:
+                high = float(validData[highIdx])
+                self._values[percentile] = low + fraction * (high - low)
+
+
+    @staticmethod
+    def _sample(awm, numSamples):
+        """ Returns the valid elements of a random sample (with replacement) of the array.
+        """
+        logger.debug("Sampling {} of {} elements".format(numSamples, awm.data.size))
+        randomState = np.random.RandomState(SAMPLE_SEED)
+        flatIndices = np.sort(randomState.randint(0, awm.data.size, size=numSamples))
+        index = np.unravel_index(flatIndices, awm.data.shape)
+        sample = awm.data[index]
+        if awm.hasMask:
+            sample = sample[~np.broadcast_to(awm.maskAt(index), sample.shape)]
+        return sample
+
+
+    def _position(self, percentile):
+        """ Returns the indices of the order statistics that are interpolated, and the fraction
+            of the second one, for a percentile.
+        """
+        position = percentile / 100.0 * (self._numValid - 1)
+        lowIdx = int(math.floor(position))
+        highIdx = min(lowIdx + 1, self._numValid - 1)
+        return lowIdx, highIdx, position - lowIdx
+
+
+    @property
+    def numValid(self):
+        """ The number of elements that are not masked and not NaN (in the sample if the
+            percentiles are approximate).
+        """
+        return self._numValid
+
+
+    @property
+    def isApproximate(self):
+        """ True if the percentiles are estimated from a sample of the array.
+        """
+        return self._isApproximate
+
+
+    def hasPercentile(self, percentile):
+        """ Returns True if the percentile has been calculated.
+        """
+        return percentile in self._values
+
+
+    def percentiles(self, percentiles):
+        """ Returns a list with the values of the percentiles.
+
+            Raises a KeyError if a percentile has not been calculated.
+        """
+        return [self._values[percentile] for percentile in percentiles]
+
+
+
+def percentileStatistics(awm, maxExactElements=None):
+    """ Returns the PercentileStatistics of an ArrayWithMask. They are calculated only the first
+        time that they are requested for this ArrayWithMask object, or when exact percentiles are
+        requested while the previous ones were approximate.
+
+        :param maxExactElements: see the PercentileStatistics constructor.
+    """
+    statistics = _STATISTICS.get(awm)
+    if statistics is None or (statistics.isApproximate and
+                              not (maxExactElements and awm.data.size > maxExactElements)):
+        logger.debug("Calculating percentiles of array: {}".format(id(awm)))
+        statistics = PercentileStatistics(awm, maxExactElements=maxExactElements)
+        _STATISTICS[awm] = statistics
+    return statistics
+
+
+def setPercentileStatistics(awm, statistics):
+    """ Sets the PercentileStatistics of an ArrayWithMask, e.g. after they have been calculated
+        in a worker thread. They replace the statistics that were calculated before.
+    """
+    _STATISTICS[awm] = statistics
+
+
+def hasApproximatePercentiles(awm):
+    """ Returns True if the percentiles of the ArrayWithMask have been estimated from a sample.
+    """
+    statistics = _STATISTICS.get(awm)
+    return statistics is not None and statistics.isApproximate
+
+
+def discardedRange(awm, percentage, maxExactElements=None):
+    """ Returns the range of an ArrayWithMask after discarding percentage of the lowest and
+        percentage of the highest values. Masked values and NaNs are ignored.
+
+        Uses the shared PercentileStatistics of the array if the percentage is one of the
+        DISCARD_PERCENTAGES. These are estimated if the array has more than maxExactElements.
+    """
+    percentiles = (percentage, 100 - percentage)
+    statistics = percentileStatistics(awm, maxExactElements=maxExactElements)
+    if statistics.hasPercentile(percentage):
+        return statistics.percentiles(percentiles)
+    else:
+        return maskedNanPercentile(awm, percentiles)
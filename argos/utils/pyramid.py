@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Multi-resolution pyramid of an image.
+
+    Each level of the pyramid halves the resolution of the previous one by aggregating blocks of
+    2 x 2 elements. When an image is much larger than the screen, only the region that is visible
+    has to be rendered, at the level that matches the resolution of the screen. The regions are
+    aligned to a grid of tiles so that small pans don't require a new region.
+
+    The levels are built on demand, one after another, and can be built in a worker thread.
+"""
+from __future__ import division
+
+import logging
+import math
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The functions that combine the elements of a 2 x 2 block. NaNs are ignored.
+PYRAMID_AGGREGATIONS = ('mean', 'max', 'min')
+
+# The rendered regions are aligned to tiles of this size (in elements of the level).
+TILE_SIZE = 256
+
+
+def _reducePairs(array, ufunc):
+    """ Combines the pairs of consecutive elements of both dimensions of a 2D array with ufunc.
+        If a dimension has an odd length, its last element is kept as is.
+    """
+    for axis in range(array.ndim):
+        index = [slice(None)] * array.ndim
+        index[axis] = slice(0, None, 2)
+        reduced = np.array(array[tuple(index)], copy=True)
+        index[axis] = slice(1, None, 2)
+        second = array[tuple(index)]
+        index[axis] = slice(0, second.shape[axis])
+        head = reduced[tuple(index)]
+        ufunc(head, second, out=head)
+        array = reduced
+    return array
+
+
+def reducedLevel(image, aggregation):
+    """ Returns an image with half the resolution of image, in which each element is the
+        aggregation of a block of 2 x 2 elements. NaNs are ignored. The mean of integers is
+        rounded down.
+
+        If a dimension has an odd length, the blocks of its last element are only one element
+        wide.
+
+        :param image: 2D float or integer array.
+        :param aggregation: one of the PYRAMID_AGGREGATIONS.
+    """
+    if aggregation == 'max':
+        return _reducePairs(image, np.fmax)
+    elif aggregation == 'min':
+        return _reducePairs(image, np.fmin)
+    elif aggregation != 'mean':
+        raise ValueError("aggregation must be one of {}, got: {!r}"
+                         .format(PYRAMID_AGGREGATIONS, aggregation))
+
+    if image.dtype.kind == 'f':
+        valid = ~np.isnan(image)
+        sums = _reducePairs(np.where(valid, image, 0), np.add)
+        counts = _reducePairs(valid.view(np.uint8), np.add)
+        return np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
+    else:
+        sums = _reducePairs(image.astype(np.result_type(image.dtype, np.int64)), np.add)
+        counts = _reducePairs(np.ones(image.shape, dtype=np.uint8), np.add)
+        return (sums // counts).astype(image.dtype)
+
+
+
+class ImagePyramid(object):
+    """ The levels of reduced resolution of an image.
+
+        Level 0 is the image itself, element [i, j] of level n covers the elements
+        [i * 2**n : (i+1) * 2**n, j * 2**n : (j+1) * 2**n] of the image. Each level is built from
+        the previous one, so the mean of a level is the mean of the means of the previous level.
+        The last level is the first one that fits in a single tile.
+
+        The image must not be changed while the pyramid is in use.
+    """
+    def __init__(self, image, aggregation='mean', tileSize=TILE_SIZE):
+        """ Constructor. The levels are only built when they are requested.
+
+            :param image: 2D float or integer array. Masked values must have been replaced by
+                NaNs (see replaceMaskedAndInfWithNan).
+            :param aggregation: one of the PYRAMID_AGGREGATIONS.
+            :param tileSize: the regions are aligned to tiles of this many elements.
+        """
+        if aggregation not in PYRAMID_AGGREGATIONS:
+            raise ValueError("aggregation must be one of {}, got: {!r}"
+                             .format(PYRAMID_AGGREGATIONS, aggregation))
+        if image.ndim != 2:
+            raise ValueError("Image must be 2D, got: {} dimensions".format(image.ndim))
+
+        self._aggregation = aggregation
+        self._tileSize = tileSize
+        self._levels = [image]
+        self._buildLock = threading.Lock() # Held while a level is built.
+        self._cancelled = False
+
+        numLevels = 1
+        while max(self.levelShape(numLevels - 1)) > tileSize:
+            numLevels += 1
+        self._numLevels = numLevels
+
+
+    @property
+    def aggregation(self):
+        """ The function that combines the elements of the 2 x 2 blocks.
+        """
+        return self._aggregation
+
+
+    @property
+    def tileSize(self):
+        """ The regions are aligned to tiles of this many elements.
+        """
+        return self._tileSize
+
+
+    @property
+    def shape(self):
+        """ The shape of the image (level 0).
+        """
+        return self._levels[0].shape
+
+
+    @property
+    def numLevels(self):
+        """ The number of levels, including level 0.
+        """
+        return self._numLevels
+
+
+    def levelShape(self, level):
+        """ Returns the shape of a level. The level doesn't have to be built.
+        """
+        factor = 2 ** level
+        return tuple(-(-length // factor) for length in self.shape)
+
+
+    def hasLevel(self, level):
+        """ Returns True if the level has been built.
+        """
+        return level < len(self._levels)
+
+
+    def level(self, level):
+        """ Returns the array of a level. The levels up to it are built if necessary, which may
+            take a while for large images. Is thread-safe.
+
+            Returns None if the pyramid has been cancelled before the level was built.
+        """
+        if not 0 <= level < self._numLevels:
+            raise IndexError("Level must be between 0 and {}, got: {}"
+                             .format(self._numLevels - 1, level))
+        with self._buildLock:
+            while len(self._levels) <= level:
+                if self._cancelled:
+                    logger.debug("Pyramid cancelled before building level {}".format(level))
+                    return None
+                logger.debug("Building pyramid level {}: {}"
+                             .format(len(self._levels), self.levelShape(len(self._levels))))
+                self._levels.append(reducedLevel(self._levels[-1], self._aggregation))
+        return self._levels[level]
+
+
+    def cancel(self):
+        """ Stops the building of levels (after the level that is currently being built).
+        """
+        self._cancelled = True
+
+
+    def levelForScale(self, elementsPerPixel):
+        """ Returns the coarsest level that has at least one element per pixel.
+
+            :param elementsPerPixel: the number of image elements per screen pixel.
+        """
+        if elementsPerPixel <= 1:
+            return 0
+        level = int(math.floor(math.log(elementsPerPixel, 2)))
+        return min(level, self._numLevels - 1)
+
+
+    def tileRegion(self, level, regionSlices):
+        """ Returns the slices of a level that contain a region of the image, extended to tile
+            boundaries.
+
+            :param level: the level.
+            :param regionSlices: (row, column) slices of the region in image (level 0) elements.
+                The start and stop must be explicit, steps are ignored.
+            :returns: tuple with a slice per dimension, in elements of the level.
+        """
+        factor = 2 ** level
+        tileSize = self._tileSize
+        tileSlices = []
+        for slc, length in zip(regionSlices, self.levelShape(level)):
+            start = (slc.start // factor // tileSize) * tileSize
+            stop = -(-slc.stop // factor // tileSize) * tileSize
+            tileSlices.append(slice(min(start, length), min(max(start, stop), length)))
+        return tuple(tileSlices)
+
+
+    def preview(self, level, levelSlices):
+        """ Returns a region of a level, taken with a stride from the image instead of by
+            aggregation. This can be shown until the level has been built.
+
+            The result has the same shape as the region of the level and is a view on the image.
+
+            :param levelSlices: (row, column) slices (without step) in elements of the level.
+        """
+        factor = 2 ** level
+        return self._levels[0][tuple(slice(slc.start * factor, slc.stop * factor, factor)
+                                     for slc in levelSlices)]
@@ -47,6 +47,7 @@ from argos.utils.misc import string_to_identifier
 from argos.widgets.aboutdialog import AboutDialog
 from argos.widgets.constants import CENTRAL_MARGIN, CENTRAL_SPACING
 from argos.widgets.pluginsdialog import PluginsDialog
+from argos.widgets.redraw import RedrawScheduler, mergeRedrawRequests
 import logging
 
 
@@ -81,6 +82,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self._argosApplication = argosApplication
         self._configTreeModel = ConfigTreeModel()
         self._inspectorsNonDefaults = {}  # non-default values for all used plugins
+        self._pendingDraw = None # (reason, origin) of the draw that waits for the slice to load
+
+        # Merges the redraw requests of the collector and config tree that are made in quick
+        # succession.
+        self._redrawScheduler = RedrawScheduler(parent=self)
 
         self.setCorner(Qt.TopLeftCorner, Qt.LeftDockWidgetArea)
         self.setCorner(Qt.BottomLeftCorner, Qt.LeftDockWidgetArea)
@@ -109,11 +115,18 @@ class MainWindow(QtWidgets.QMainWindow):
         logger.debug("Finalizing: {}".format(self))
 
         # Disconnect signals
+        self._redrawScheduler.cancel()
+        self._redrawScheduler.sigRedraw.disconnect(self.drawInspectorContents)
         self.collector.sigContentsChanged.disconnect(self.collectorContentsChanged)
+        self.collector.sigSliceLoaded.disconnect(self.sliceLoaded)
+        self.collector.sigBusyChanged.disconnect(self.setInspectorBusy)
+        self.collector.sigLoadProgress.disconnect(self.setInspectorProgress)
         self._configTreeModel.sigItemChanged.disconnect(self.configContentsChanged)
         self.sigInspectorChanged.disconnect(self.inspectorSelectionPane.updateFromInspectorRegItem)
         self.customContextMenuRequested.disconnect(self.showContextMenu)
 
+        self.collector.finalize()
+
 
     def __setupViews(self):
         """ Creates the UI widgets.
@@ -132,6 +145,16 @@ class MainWindow(QtWidgets.QMainWindow):
         layout.setSpacing(CENTRAL_SPACING)
         self.setCentralWidget(widget)
 
+        # The collector settings are the first top level item of the config tree.
+        self._configTreeModel.insertItem(self.collector.config)
+
+        self._redrawScheduler.sigRedraw.connect(self.drawInspectorContents)
+
+        # The inspector is drawn when the collector has loaded the slice.
+        self.collector.sigSliceLoaded.connect(self.sliceLoaded)
+        self.collector.sigBusyChanged.connect(self.setInspectorBusy)
+        self.collector.sigLoadProgress.connect(self.setInspectorProgress)
+
         # Must be after setInspector since that already draws the inspector
         self.collector.sigContentsChanged.connect(self.collectorContentsChanged)
         self._configTreeModel.sigItemChanged.connect(self.configContentsChanged)
@@ -590,7 +613,7 @@ class MainWindow(QtWidgets.QMainWindow):
         """ Slot that updates the UI whenever the contents of the collector has changed.
         """
         logger.debug("collectorContentsChanged()")
-        self.drawInspectorContents(reason=reason)
+        self._redrawScheduler.schedule(reason)
 
 
     @QtSlot(AbstractCti)
@@ -599,19 +622,67 @@ class MainWindow(QtWidgets.QMainWindow):
             Will draw the window contents.
         """
         logger.debug("configContentsChanged: {}".format(configTreeItem))
-        self.drawInspectorContents(reason=UpdateReason.CONFIG_CHANGED,
-                                   origin=configTreeItem)
+
+        # Changes in the collector settings are applied to the collector. The inspector contents
+        # don't depend on these settings so no redraw is necessary.
+        rootItem = configTreeItem
+        while rootItem.parentItem is not None and rootItem is not self.collector.config:
+            rootItem = rootItem.parentItem
+        if rootItem is self.collector.config:
+            self._applyCollectorConfig()
+            return
+
+        self._redrawScheduler.schedule(UpdateReason.CONFIG_CHANGED, origin=configTreeItem)
+
+
+    def _applyCollectorConfig(self):
+        """ Applies the settings in the collector config tree item.
+        """
+        self.collector.config.updateTarget()
+        self._redrawScheduler.frameTime = self.collector.frameTime
 
 
     def drawInspectorContents(self, reason, origin=None):
         """ Draws all contents of this window's inspector.
             The reason and origin parameters are passed on to the inspector's updateContents method.
 
+            The slice is first loaded by the collector in a worker thread, the inspector is drawn
+            when the collector emits sigSliceLoaded. If a new draw is requested in the mean time,
+            the previous one is cancelled. The requests are merged; the strongest reason is kept.
+
             :param reason: string describing the reason for the redraw.
                 Should preferably be one of the UpdateReason enumeration class, but new values may
                 be used (which are then ignored by existing inspectors).
             :param origin: object with extra infor on the reason
         """
+        if self.inspector:
+            self._pendingDraw = mergeRedrawRequests(self._pendingDraw, (reason, origin))
+            if self._pendingDraw[0] == UpdateReason.CONFIG_CHANGED:
+                # The data has not changed, inspectors reuse their data so no slice is loaded.
+                self.sliceLoaded(None)
+            elif (self._pendingDraw[0] == UpdateReason.DATA_APPENDED and
+                      self.inspector.appendsData()):
+                # The inspector reads only the appended elements.
+                self.sliceLoaded(None)
+            else:
+                reason = self._pendingDraw[0]
+                self.collector.requestSlicedArray(comboSlices=self.inspector.comboSlices(reason))
+        else:
+            logger.debug("No inspector selected")
+
+
+    @QtSlot(object)
+    def sliceLoaded(self, _slicedArray):
+        """ Slot that draws the inspector when the collector has loaded the slice.
+
+            The inspector gets the slice from the collector, which returns the loaded slice.
+            If the slice could not be loaded the inspector reads it again and shows the error.
+        """
+        if self._pendingDraw is None:
+            return
+        reason, origin = self._pendingDraw
+        self._pendingDraw = None
+
         logger.debug("")
         logger.debug("-------- Drawing inspector of window: {} --------".format(self.windowTitle()))
         if self.inspector:
@@ -621,6 +692,22 @@ class MainWindow(QtWidgets.QMainWindow):
         logger.debug("Finished draw inspector.\n")
 
 
+    @QtSlot(bool)
+    def setInspectorBusy(self, busy):
+        """ Shows the busy indicator of the inspector while the collector loads a slice.
+        """
+        if self.inspector:
+            self.inspector.setBusy(busy)
+
+
+    @QtSlot(float)
+    def setInspectorProgress(self, fraction):
+        """ Shows the progress of a long read (e.g. a projection) in the busy indicator.
+        """
+        if self.inspector:
+            self.inspector.setProgress(fraction)
+
+
     # TODO: to repotreemodel? Note that the functionality will be common to selectors.
     @QtSlot()
     def openFiles(self, fileNames=None, rtiRegItem=None, caption=None, fileMode=None):
@@ -705,6 +792,11 @@ class MainWindow(QtWidgets.QMainWindow):
         finally:
             settings.endGroup()
 
+        json = settings.value('cfg_collector', None)
+        if json:
+            self.collector.config.setValuesFromDict(ctiLoads(json))
+        self._applyCollectorConfig()
+
         identifier = settings.value("inspector", None)
         try:
             if identifier:
@@ -731,6 +823,12 @@ class MainWindow(QtWidgets.QMainWindow):
         finally:
             settings.endGroup()
 
+        collectorNonDefaults = self.collector.config.getNonDefaultsDict()
+        if collectorNonDefaults:
+            settings.setValue('cfg_collector', ctiDumps(collectorNonDefaults))
+        else:
+            settings.remove('cfg_collector')
+
         self.configWidget.configTreeView.saveProfile("config_tree/header_state", settings)
         self.repoWidget.repoTreeView.saveProfile("repo_tree/header_state", settings)
 
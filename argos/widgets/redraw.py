@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of Argos.
+#
+# Argos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Argos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Argos. If not, see <http://www.gnu.org/licenses/>.
+
+""" Coalescing of redraw requests
+"""
+import logging
+
+from argos.inspector.abstract import UpdateReason
+from argos.qt import QtCore, QtSignal, QtSlot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRAME_TIME = 30 # Minimum time in ms between the start of two redraws (0 = no limit)
+
+
+def mergeRedrawRequests(request1, request2):
+    """ Merges two redraw requests into one. A request is a (reason, origin) tuple.
+
+        The result has the strongest of both reasons. If the reasons are equally strong, the most
+        recent request (request2) wins. Either request may be None.
+    """
+    if request1 is None:
+        return request2
+    if request2 is None:
+        return request1
+
+    reason1, _origin1 = request1
+    reason2, _origin2 = request2
+    if UpdateReason.strongest(reason1, reason2) == reason2:
+        return request2
+    else:
+        return request1
+
+
+
+class RedrawScheduler(QtCore.QObject):
+    """ Coalesces redraw requests so that the inspector is drawn at most once per event-loop turn.
+
+        All requests that are made before the scheduler fires are merged into a single request
+        that has the strongest reason. Intermediate requests are dropped. Furthermore, the redraws
+        are spaced at least frameTime milliseconds apart, so that e.g. the auto-repeat of a spin
+        box doesn't queue a full read-and-render cycle for every step.
+    """
+    # Emitted with the reason and origin of the merged request.
+    sigRedraw = QtSignal(object, object)
+
+    def __init__(self, frameTime=DEFAULT_FRAME_TIME, parent=None):
+        """ Constructor
+
+            :param frameTime: minimum time in ms between the start of two redraws.
+        """
+        super(RedrawScheduler, self).__init__(parent=parent)
+        self.frameTime = frameTime
+
+        self._pendingRequest = None # (reason, origin) tuple
+        self._lastRedrawTimer = QtCore.QElapsedTimer()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._redraw)
+
+
+    @property
+    def isPending(self):
+        """ True if a redraw has been scheduled but not yet emitted.
+        """
+        return self._pendingRequest is not None
+
+
+    def schedule(self, reason, origin=None):
+        """ Schedules a redraw. It is merged with the pending redraw (if any).
+        """
+        self._pendingRequest = mergeRedrawRequests(self._pendingRequest, (reason, origin))
+
+        if not self._timer.isActive():
+            delay = 0
+            if self.frameTime > 0 and self._lastRedrawTimer.isValid():
+                delay = max(0, self.frameTime - self._lastRedrawTimer.elapsed())
+            self._timer.start(delay)
+
+
+    def cancel(self):
+        """ Discards the pending redraw.
+        """
+        self._timer.stop()
+        self._pendingRequest = None
+
+
+    @QtSlot()
+    def _redraw(self):
+        """ Emits sigRedraw with the merged request.
+        """
+        if self._pendingRequest is None:
+            return
+        reason, origin = self._pendingRequest
+        self._pendingRequest = None
+        self._lastRedrawTimer.start()
+
+        logger.debug("Scheduled redraw, reason: {}".format(reason))
+        self.sigRedraw.emit(reason, origin)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+""" Benchmark of the memory that PyQtGraph allocates to render an image in the 2D image plot.
+
+    Compares rendering a transposed view in column-major order, as the image plot did before,
+    with rendering the image as it is in row-major order (see PgImagePlot2d._showImage). The image
+    is converted from the slice as in PgImagePlot2d._setImageFromSlicedArray. Prints the peak
+    number of bytes that are allocated by ImageItem.render per frame, as measured by tracemalloc.
+
+    Needs Qt and PyQtGraph, but doesn't show any windows. Run with Python 3.4 or higher from the
+    development directory:
+
+        python benchmark_render.py
+"""
+from __future__ import print_function
+
+import sys, os.path
+import tracemalloc
+
+import numpy as np
+
+# Add the parent directory to the system path so that the package can be imported.
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.realpath(os.path.join(scriptDir, '..')))
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from argos.inspector.pgplugins.imageplot2d import NATIVE_IMAGE_TYPES
+from argos.inspector.pgplugins.pgimageitem import ArgosImageItem
+from argos.qt import QtWidgets, initQApplication
+from argos.utils.masks import ArrayWithMask, replaceMaskedAndInfWithNan
+
+NUM_ROWS, NUM_COLS = 2048, 2048
+
+
+def imageFromSlice(awm):
+    """ Returns the image array (in the order of the slice) that the image plot renders.
+    """
+    if not awm.hasMask and awm.dtype in NATIVE_IMAGE_TYPES:
+        return awm.data
+    else:
+        return replaceMaskedAndInfWithNan(awm.data, awm.mask)
+
+
+def measureRender(imageItem, image):
+    """ Sets the image in the image item and returns the peak number of bytes that are allocated
+        while rendering it.
+    """
+    imageItem.setImage(image, autoLevels=False, levels=(np.nanmin(image), np.nanmax(image)))
+    tracemalloc.start()
+    try:
+        imageItem.render()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def createSlices():
+    """ Returns a list of (description, ArrayWithMask) tuples with typical slices.
+    """
+    randomState = np.random.RandomState(0)
+    shape = (NUM_ROWS, NUM_COLS)
+
+    detector = randomState.randint(0, 4096, size=shape).astype(np.uint16)
+    floats = randomState.rand(*shape).astype(np.float32)
+    withInfs = floats.copy()
+    withInfs[::100, ::100] = np.inf
+    mask = np.zeros(shape, dtype=bool)
+    mask[:, :10] = True
+
+    return [
+        ("uint16", ArrayWithMask(detector, False, None)),
+        ("uint16, masked", ArrayWithMask(detector, mask, None)),
+        ("uint16, transposed", ArrayWithMask(detector.T, False, None)),
+        ("float32", ArrayWithMask(floats, False, None)),
+        ("float32 with infs", ArrayWithMask(withInfs, False, None)),
+        ("float32, masked", ArrayWithMask(floats, mask, None)),
+    ]
+
+
+def main():
+    _app = QtWidgets.QApplication.instance() or initQApplication()
+    colMajorItem = ArgosImageItem(axisOrder='col-major')
+    rowMajorItem = ArgosImageItem(axisOrder='row-major')
+
+    print("Bytes allocated by ImageItem.render per {} x {} frame (peak).\n"
+          .format(NUM_ROWS, NUM_COLS))
+    print("{:20s} {:>18s} {:>18s}".format("slice", "col-major view", "row-major"))
+
+    for description, awm in createSlices():
+        image = imageFromSlice(awm)
+        colMajorBytes = measureRender(colMajorItem, image.transpose())
+        rowMajorBytes = measureRender(rowMajorItem, image)
+        print("{:20s} {:18,d} {:18,d}".format(description, colMajorBytes, rowMajorBytes))
+
+
+if __name__ == "__main__":
+    main()
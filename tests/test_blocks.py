@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests reading arrays in blocks
+
+"""
+
+import unittest
+import numpy as np
+import numpy.ma as ma
+
+from argos.collect.blocks import BlockedArray, blockShapeForChunks
+from argos.utils.masks import ArrayWithMask
+
+
+class TestBlocks(unittest.TestCase):
+
+    def setUp(self):
+        data = np.arange(1000 * 50).reshape(1000, 50)
+        self.awm = ArrayWithMask.createFromMaskedArray(ma.masked_equal(data, 777))
+        self.reads = []
+
+
+    def readBlock(self, blockSlices):
+        """ Reads a block of self.awm and remembers which blocks were read.
+        """
+        self.reads.append(blockSlices)
+        return ArrayWithMask(self.awm.data[blockSlices], self.awm.maskAt(blockSlices),
+                             self.awm.fill_value)
+
+
+    def test_blockShape(self):
+        """ Blocks are a multiple of the chunks, unless they would become too large
+        """
+        self.assertEqual(blockShapeForChunks(None, (256, 32)), (256, 32))
+        self.assertEqual(blockShapeForChunks((100, None), (256, 32)), (300, 32))
+        self.assertEqual(blockShapeForChunks((1000, 1000), (256, 32), maxElements=10000),
+                         (256, 32))
+
+
+    def test_values(self):
+        """ Values are read per block and the most recently used blocks are kept
+        """
+        blocked = BlockedArray(self.awm.shape, self.readBlock, blockShape=(100, 20), maxBlocks=2)
+        self.assertEqual(blocked.numBlocks, (10, 3))
+        self.assertEqual(blocked.blockSlices((9, 2)), (slice(900, 1000), slice(40, 50)))
+
+        self.assertEqual(blocked.valueAt(15, 45), self.awm.data[15, 45])
+        self.assertEqual(blocked.valueAt(16, 44), self.awm.data[16, 44])
+        self.assertTrue(blocked.maskAt(15, 27))
+        self.assertFalse(blocked.maskAt(15, 28))
+        self.assertEqual(len(self.reads), 2)
+
+        blocked.valueAt(500, 0)
+        self.assertEqual(len(self.reads), 3)
+        self.assertTrue(blocked.hasBlock((0, 1)))
+        self.assertFalse(blocked.hasBlock((0, 2)))
+        self.assertEqual(blocked.dtype, self.awm.dtype)
+
+
+    def test_blocksAround(self):
+        """ The blocks of the region come first, then the blocks around it
+        """
+        blocked = BlockedArray.fromArray(self.awm, blockShape=(100, 20))
+        self.assertEqual(blocked.blocksAround((0, 50), (0, 10), margin=1),
+                         [(0, 0), (0, 1), (1, 0), (1, 1)])
+
+        indices = blocked.blocksAround((450, 650), (20, 30), margin=1)
+        self.assertEqual(indices[:3], [(4, 1), (5, 1), (6, 1)])
+        self.assertEqual(len(indices), 5 * 3)
+        self.assertEqual(blocked.valueAt(999, 49), self.awm.data[999, 49])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
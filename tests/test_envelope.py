@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the min/max envelope of long line plots
+
+"""
+
+import unittest
+import numpy as np
+
+from argos.utils.envelope import MinMaxEnvelope
+
+
+class TestEnvelope(unittest.TestCase):
+
+    def setUp(self):
+        randomState = np.random.RandomState(0)
+        self.data = randomState.randint(-1000, 1000, size=10000).astype(np.int16)
+        self.valid = np.ones(len(self.data), dtype=bool)
+        self.valid[5000:5200] = False # A gap, e.g. a masked region
+        self.data[1234] = 30000       # A spike that must remain visible
+
+
+    def test_levels(self):
+        """ The levels contain the minimum and maximum per bucket
+        """
+        envelope = MinMaxEnvelope(self.data, valid=self.valid, factor=4, maxTopLevelBuckets=100)
+        self.assertEqual(envelope.numLevels, 5) # buckets of 1, 4, 16, 64 and 256 samples
+        self.assertEqual(envelope.levelForScale(0.5), 0)
+        self.assertEqual(envelope.levelForScale(20), 2)
+        self.assertEqual(envelope.levelForScale(1e6), 4)
+
+        indices, values, connected = envelope.plotData(4, 0, len(self.data))
+        self.assertEqual(len(values), 2 * 40)
+        self.assertEqual(np.nanmax(values), 30000)
+        self.assertEqual(np.nanmin(values), self.data[self.valid].min())
+
+        # The bucket of samples 5056 to 5120 lies completely in the gap.
+        indices, values, connected = envelope.plotData(3, 0, len(self.data))
+        self.assertFalse(connected[2 * (5056 // 64)])
+        self.assertTrue(np.all(np.isnan(values[~connected])))
+
+
+    def test_detailRegion(self):
+        """ The detail region is plotted at full resolution, the rest of the data at a lower one.
+        """
+        envelope = MinMaxEnvelope(self.data, valid=self.valid, factor=4, maxTopLevelBuckets=100)
+        indices, values, connected = envelope.plotData(0, 1000, 1500)
+
+        self.assertTrue(np.all(np.diff(indices) >= 0))
+        self.assertLess(indices[0], 256)
+        self.assertGreater(indices[-1], len(self.data) - 256)
+        self.assertEqual(np.nanmax(values), 30000)
+
+        detail = (indices >= 1000) & (indices < 1500)
+        np.testing.assert_array_equal(indices[detail], np.arange(1000, 1500))
+        np.testing.assert_array_equal(values[detail], self.data[1000:1500])
+
+
+    def test_extend(self):
+        """ Extending the envelope gives the same levels as calculating it from all data
+        """
+        envelope = MinMaxEnvelope(self.data[:1001], valid=self.valid[:1001], factor=4,
+                                  maxTopLevelBuckets=100)
+        self.assertEqual(envelope.numLevels, 3)
+        envelope.extend(self.data, valid=self.valid)
+        self.assertEqual(envelope.numLevels, 5)
+        self.assertRaises(ValueError, envelope.extend, self.data[:10])
+
+        expected = MinMaxEnvelope(self.data, valid=self.valid, factor=4, maxTopLevelBuckets=100)
+        for level in range(expected.numLevels):
+            for actualData, expectedData in zip(envelope.plotData(level, 2000, 3000),
+                                                expected.plotData(level, 2000, 3000)):
+                np.testing.assert_array_equal(actualData, expectedData)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
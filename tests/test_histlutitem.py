@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the histogram cache of the HistogramLUTItem
+
+"""
+
+import unittest
+import numpy as np
+
+from argos.qt import QtWidgets, initQApplication
+from argos.inspector.pgplugins.pghistlutitem import HistogramLUTItem, imageHistogram
+import pyqtgraph as pg
+
+
+class TestHistogramLUTItem(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QtWidgets.QApplication.instance() or initQApplication()
+        self.imageItem = pg.ImageItem()
+        self.histLutItem = HistogramLUTItem()
+        self.histLutItem.setImageItem(self.imageItem)
+
+
+    def test_precomputedHistogram(self):
+        """ The precomputed histogram is plotted and not calculated again
+        """
+        def failingGetHistogram(*args, **kwargs):
+            self.fail("The histogram is calculated again")
+
+        self.imageItem.getHistogram = failingGetHistogram
+
+        image = np.arange(12, dtype=np.float32).reshape(3, 4)
+        histogram = imageHistogram(image)
+        self.histLutItem.setImageHistogram(histogram)
+        self.imageItem.setImage(image, autoLevels=False)
+
+        x, y = self.histLutItem.plot.getData()
+        np.testing.assert_array_equal(x, histogram[0])
+        np.testing.assert_array_equal(y, histogram[1])
+
+        # The cached histogram is reused when only the levels change.
+        self.histLutItem.imageChanged()
+        x, y = self.histLutItem.plot.getData()
+        np.testing.assert_array_equal(x, histogram[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the shared percentile statistics of the auto-range methods
+
+"""
+
+import unittest
+import numpy as np
+
+from argos.utils import percentiles
+from argos.utils.masks import ArrayWithMask, maskedNanPercentile
+from argos.utils.percentiles import (DISCARD_PERCENTAGES, PercentileStatistics,
+                                     percentileStatistics, setPercentileStatistics,
+                                     hasApproximatePercentiles, discardedRange)
+
+
+class TestPercentiles(unittest.TestCase):
+
+    def setUp(self):
+        data = np.random.RandomState(0).randn(37, 23)
+        data[3, 4] = np.nan
+        mask = np.zeros(data.shape, dtype=bool)
+        mask[10:20, 5] = True
+        self.awm = ArrayWithMask(data, mask, None)
+
+
+    def test_sameAsNanPercentile(self):
+        """ The percentiles must be the same as those of maskedNanPercentile
+        """
+        for awm in (self.awm, ArrayWithMask(self.awm.data, False, None)):
+            statistics = PercentileStatistics(awm)
+            for percentage in DISCARD_PERCENTAGES:
+                np.testing.assert_allclose(
+                    statistics.percentiles((percentage, 100 - percentage)),
+                    maskedNanPercentile(awm, (percentage, 100 - percentage)))
+
+
+    def test_shared(self):
+        """ The statistics are calculated once per array object
+        """
+        self.assertIs(percentileStatistics(self.awm), percentileStatistics(self.awm))
+        np.testing.assert_allclose(discardedRange(self.awm, 3),
+                                   maskedNanPercentile(self.awm, (3, 97)))
+
+        allMasked = ArrayWithMask(self.awm.data, True, None)
+        self.assertTrue(np.all(np.isnan(discardedRange(allMasked, 1))))
+
+
+    def test_approximate(self):
+        """ Percentiles of large arrays are estimated from a sample, until exact ones are requested
+        """
+        oldSampleSize = percentiles.SAMPLE_SIZE
+        percentiles.SAMPLE_SIZE = 500
+        try:
+            statistics = percentileStatistics(self.awm, maxExactElements=100)
+            self.assertTrue(statistics.isApproximate)
+            self.assertLessEqual(statistics.numValid, 500)
+            low, high = statistics.percentiles((5, 95))
+            expectedLow, expectedHigh = maskedNanPercentile(self.awm, (5, 95))
+            self.assertAlmostEqual(low, expectedLow, delta=0.5)
+            self.assertAlmostEqual(high, expectedHigh, delta=0.5)
+
+            # Asking for exact percentiles replaces the approximate ones.
+            self.assertFalse(percentileStatistics(self.awm).isApproximate)
+            self.assertFalse(percentileStatistics(self.awm, maxExactElements=100).isApproximate)
+        finally:
+            percentiles.SAMPLE_SIZE = oldSampleSize
+
+
+    def test_setStatistics(self):
+        """ Statistics that are calculated elsewhere (e.g. in a worker thread) can be set
+        """
+        oldSampleSize = percentiles.SAMPLE_SIZE
+        percentiles.SAMPLE_SIZE = 500
+        try:
+            approximate = PercentileStatistics(self.awm, maxExactElements=1)
+        finally:
+            percentiles.SAMPLE_SIZE = oldSampleSize
+        setPercentileStatistics(self.awm, approximate)
+        self.assertTrue(hasApproximatePercentiles(self.awm))
+
+        exact = PercentileStatistics(self.awm)
+        setPercentileStatistics(self.awm, exact)
+        self.assertFalse(hasApproximatePercentiles(self.awm))
+        self.assertIs(percentileStatistics(self.awm, maxExactElements=1), exact)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
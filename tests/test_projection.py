@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the streaming projections of the collector
+
+"""
+
+import unittest
+import numpy as np
+import numpy.ma as ma
+
+from argos.collect.projection import ProjectionAccumulator, projectSlice
+
+
+class FakeRti(object):
+    """ Minimal stand-in for an RTI that counts the number of elements that are read at once.
+    """
+    def __init__(self, array, chunkShape=None):
+        self.array = array
+        self.chunkShape = chunkShape
+        self.maxElementsRead = 0
+
+    @property
+    def arrayShape(self):
+        return self.array.shape
+
+    def __getitem__(self, index):
+        result = self.array[index]
+        self.maxElementsRead = max(self.maxElementsRead, np.size(result))
+        return result
+
+
+
+class TestProjection(unittest.TestCase):
+
+    def setUp(self):
+        data = np.arange(5 * 4 * 3, dtype=np.float32).reshape(5, 4, 3) % 7
+        mask = np.zeros(data.shape, dtype=bool)
+        mask[1, 2, :] = True
+        mask[:, 3, 0] = True # An element that is masked for all time steps.
+        data[2, 1, 1] = np.nan
+        self.masked = ma.masked_array(data, mask=mask)
+        self.expected = ma.masked_invalid(self.masked)
+
+
+    def test_accumulator(self):
+        """ Adding blocks one by one must give the same result as reducing the whole array
+        """
+        reference = {'max': ma.max, 'min': ma.min, 'mean': ma.mean, 'std': ma.std,
+                     'sum': ma.sum, 'count': ma.count}
+        for function, refFunction in reference.items():
+            accumulator = ProjectionAccumulator(function)
+            for blockStart in range(0, 5, 2):
+                accumulator.add(self.masked[blockStart:blockStart+2], 0)
+            result = accumulator.result()
+            expected = refFunction(self.expected, axis=0)
+
+            np.testing.assert_allclose(ma.filled(result, 0), ma.filled(expected, 0), rtol=1e-6,
+                                       err_msg=function)
+            if function not in ('sum', 'count'):
+                np.testing.assert_array_equal(ma.getmaskarray(result),
+                                              ma.getmaskarray(expected), err_msg=function)
+
+
+    def test_projectSlice(self):
+        """ The projected dimension is read in blocks and reduced
+        """
+        rti = FakeRti(self.masked, chunkShape=(2, 4, 3))
+        progress = []
+        result = projectSlice(rti, [slice(None), slice(None), 1], [(0, 'max')],
+                              maxBlockBytes=2 * 4 * 4, progress=progress.append)
+
+        np.testing.assert_array_equal(result, ma.max(self.expected[:, :, 1], axis=0))
+        self.assertLessEqual(rti.maxElementsRead, 2 * 4)
+        self.assertEqual(progress[-1], 1.0)
+
+        # A range with a step and two projected dimensions
+        result = projectSlice(rti, [slice(1, 5, 2), slice(None), slice(None)],
+                              [(0, 'mean'), (2, 'max')])
+        expected = ma.mean(ma.max(self.expected[1:5:2], axis=2), axis=0)
+        np.testing.assert_allclose(result, expected)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the multi-resolution image pyramid
+
+"""
+
+import unittest
+import numpy as np
+
+from argos.utils.pyramid import ImagePyramid, reducedLevel
+
+
+class TestPyramid(unittest.TestCase):
+
+    def test_reducedLevel(self):
+        """ Blocks of 2 x 2 elements are aggregated, NaNs are ignored
+        """
+        image = np.array([[1, 3, 5],
+                          [np.nan, 5, 7],
+                          [np.nan, np.nan, 9]], dtype=np.float32)
+
+        np.testing.assert_array_equal(reducedLevel(image, 'mean'), [[3, 6], [np.nan, 9]])
+        np.testing.assert_array_equal(reducedLevel(image, 'max'), [[5, 7], [np.nan, 9]])
+        np.testing.assert_array_equal(reducedLevel(image, 'min'), [[1, 5], [np.nan, 9]])
+        self.assertEqual(reducedLevel(image, 'mean').dtype, np.float32)
+
+        # The mean of integers doesn't overflow
+        image = np.array([[255, 255], [254, 255]], dtype=np.uint8)
+        np.testing.assert_array_equal(reducedLevel(image, 'mean'), [[254]])
+        self.assertEqual(reducedLevel(image, 'mean').dtype, np.uint8)
+
+        self.assertRaises(ValueError, reducedLevel, image, 'median')
+
+
+    def test_levels(self):
+        """ The levels are built on demand
+        """
+        image = np.arange(100 * 70, dtype=np.float64).reshape(100, 70)
+        pyramid = ImagePyramid(image, 'max', tileSize=16)
+        self.assertEqual(pyramid.numLevels, 4)
+        self.assertEqual(pyramid.levelShape(3), (13, 9))
+        self.assertFalse(pyramid.hasLevel(1))
+
+        level = pyramid.level(2)
+        self.assertTrue(pyramid.hasLevel(1))
+        self.assertEqual(level.shape, pyramid.levelShape(2))
+        np.testing.assert_array_equal(level[:, :-1], image[3::4, 3::4]) # Maximum of 4 x 4 blocks
+        self.assertRaises(IndexError, pyramid.level, 4)
+
+        pyramid.cancel()
+        self.assertIsNone(pyramid.level(3))
+
+
+    def test_regions(self):
+        """ Regions are aligned to tiles and the preview has the same shape
+        """
+        image = np.zeros((1000, 600), dtype=np.float32)
+        pyramid = ImagePyramid(image, tileSize=64)
+        self.assertEqual(pyramid.levelForScale(0.5), 0)
+        self.assertEqual(pyramid.levelForScale(5.0), 2)
+        self.assertEqual(pyramid.levelForScale(1000.0), pyramid.numLevels - 1)
+
+        tileSlices = pyramid.tileRegion(2, (slice(300, 310), slice(0, 600)))
+        self.assertEqual(tileSlices, (slice(64, 128), slice(0, 150)))
+        self.assertEqual(pyramid.preview(2, tileSlices).shape,
+                         pyramid.level(2)[tileSlices].shape)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,8 @@ import numpy as np
 
 from numpy.testing import assert_array_equal
 from argos import configBasicLogging
+from argos.repo import baserti
+from argos.repo.baserti import addCloseHook
 from argos.repo.memoryrtis import ArrayRti
 
 
@@ -35,6 +37,24 @@ class TestUntypedCtis(unittest.TestCase):
         slices = [slice(2, None), 1]
         assert_array_equal(self.rti[slices], self.arr[slices])
 
+
+    def test_failingCloseHook(self):
+        """ An exception in a close hook is stored and the RTI is still closed
+        """
+        def failingHook(fileName, nodePath):
+            raise ValueError("Hook failed")
+
+        addCloseHook(failingHook)
+        try:
+            self.rti.open()
+            self.assertTrue(self.rti.isOpen)
+            self.rti.close()
+        finally:
+            baserti._CLOSE_HOOKS.remove(failingHook)
+
+        self.assertFalse(self.rti.isOpen)
+        self.assertIsInstance(self.rti.exception, ValueError)
+
         slices = tuple([slice(2), slice(1)])
         assert_array_equal(self.rti[slices], self.arr[slices])
 
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests the slice cache and the decimation functions of the collector
+
+"""
+
+import time
+import unittest
+import numpy as np
+
+from argos.collect.decimation import decimatedSlices, intersectSlices, slicesCover
+from argos.collect.slicecache import (SliceCache, FrameRingBuffer, invalidateSliceCaches,
+                                      MAX_INVALIDATIONS)
+from argos.collect.sliceloader import SliceLoader
+from argos.collect.slicereader import ReadAheadWorker
+from argos.qt import QtWidgets, initQApplication
+from argos.repo.baserti import RTI_READ_LOCK
+from argos.utils.masks import ArrayWithMask
+
+
+def createAwm(numElements):
+    """ Creates an ArrayWithMask of numElements bytes (without a mask array).
+    """
+    return ArrayWithMask(np.zeros(numElements, dtype=np.uint8), False, None)
+
+
+class TestSliceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SliceCache(maxBytes=100)
+
+
+    def test_createKey(self):
+        """ Slices must be converted to a hashable key
+        """
+        key1 = SliceCache.createKey('f.h5', '/f.h5/var', [slice(None), 3], np.array([1, 0]))
+        key2 = SliceCache.createKey('f.h5', '/f.h5/var', (slice(None), 3), [1, 0])
+        self.assertEqual(key1, key2)
+        self.assertEqual(hash(key1), hash(key2))
+
+        key3 = SliceCache.createKey('f.h5', '/f.h5/var', (slice(None), 4), [1, 0])
+        self.assertNotEqual(key1, key3)
+
+
+    def test_lruEviction(self):
+        """ The least recently used slices are evicted first.
+        """
+        self.cache.put('a', createAwm(40))
+        self.cache.put('b', createAwm(40))
+        self.assertIsNotNone(self.cache.get('a')) # a is now the most recently used
+        self.cache.put('c', createAwm(40))
+
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('c', self.cache)
+        self.assertEqual(self.cache.numBytes, 80)
+
+
+    def test_tooLarge(self):
+        """ Slices larger than the budget are not cached
+        """
+        self.cache.put('a', createAwm(40))
+        self.cache.put('huge', createAwm(101))
+        self.assertNotIn('huge', self.cache)
+        self.assertIn('a', self.cache)
+
+
+    def test_disabled(self):
+        """ A budget of zero disables the cache and shrinking the budget evicts entries
+        """
+        self.cache.put('a', createAwm(40))
+        self.cache.maxBytes = 0
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.numBytes, 0)
+
+        self.cache.put('b', createAwm(1))
+        self.assertEqual(len(self.cache), 0)
+
+
+    def test_invalidate(self):
+        """ Closing an RTI removes its slices and those of its descendants.
+        """
+        keyVar = SliceCache.createKey('f.h5', '/f.h5/var', (0, ), [0])
+        keyField = SliceCache.createKey('f.h5', '/f.h5/var/field', (0, ), [0])
+        keyOther = SliceCache.createKey('f.h5', '/f.h5/variable', (0, ), [0])
+        keyFile2 = SliceCache.createKey('g.h5', '/g.h5/var', (0, ), [0])
+        for key in (keyVar, keyField, keyOther, keyFile2):
+            self.cache.put(key, createAwm(10))
+
+        invalidateSliceCaches('f.h5', '/f.h5/var')
+        self.assertNotIn(keyVar, self.cache)
+        self.assertNotIn(keyField, self.cache)
+        self.assertIn(keyOther, self.cache)
+        self.assertIn(keyFile2, self.cache)
+
+        self.cache.invalidate('g.h5')
+        self.assertNotIn(keyFile2, self.cache)
+        self.assertEqual(self.cache.numBytes, 10)
+
+
+    def test_staleGeneration(self):
+        """ Slices read before their RTI was invalidated are not stored.
+            Invalidating other files or nodes does not affect them.
+        """
+        key = SliceCache.createKey('stale.h5', '/stale.h5/var', (0, ), [0])
+        generation = self.cache.generation()
+        invalidateSliceCaches('other.h5')
+        invalidateSliceCaches('stale.h5', '/stale.h5/variable')
+        self.assertFalse(self.cache.isStale(key, generation))
+
+        invalidateSliceCaches('stale.h5', '/stale.h5')
+        self.cache.put(key, createAwm(10), generation=generation)
+        self.assertNotIn(key, self.cache)
+
+        self.cache.put(key, createAwm(10), generation=self.cache.generation())
+        self.assertIn(key, self.cache)
+
+        generation = self.cache.generation()
+        self.cache.clear()
+        self.cache.put(key, createAwm(10), generation=generation)
+        self.assertNotIn(key, self.cache)
+
+
+    def test_forgottenInvalidations(self):
+        """ Only the most recent invalidations are remembered, older reads are considered stale.
+        """
+        key = SliceCache.createKey('f.h5', '/f.h5/var', (0, ), [0])
+        generation = self.cache.generation()
+        for nr in range(MAX_INVALIDATIONS):
+            self.cache.invalidate('other{}.h5'.format(nr))
+        self.assertFalse(self.cache.isStale(key, generation))
+
+        self.cache.invalidate('other.h5')
+        self.assertTrue(self.cache.isStale(key, generation))
+        self.assertFalse(self.cache.isStale(key, self.cache.generation()))
+
+
+    def test_readAhead(self):
+        """ The read-ahead worker stores the slices in the cache
+        """
+        keyA = SliceCache.createKey('f.h5', '/f.h5/var', (0, ), [0])
+        keyB = SliceCache.createKey('f.h5', '/f.h5/var', (1, ), [0])
+        worker = ReadAheadWorker(self.cache)
+        try:
+            worker.schedule([(keyA, lambda: createAwm(10)), (keyB, lambda: createAwm(20))])
+            for _ in range(100):
+                if keyA in self.cache and keyB in self.cache:
+                    break
+                time.sleep(0.01)
+            self.assertIn(keyA, self.cache)
+            self.assertIn(keyB, self.cache)
+        finally:
+            worker.stop()
+
+
+    def test_loadClosedRti(self):
+        """ Loading a slice of a closed RTI cancels the request instead of reporting an error
+        """
+        app = QtWidgets.QApplication.instance() or initQApplication()
+        loader = SliceLoader(self.cache)
+        loaded, reads = [], []
+        loader.sigSliceLoaded.connect(lambda key, awm: loaded.append(awm))
+
+        key = SliceCache.createKey('f.h5', '/f.h5/var', (0, ), [0])
+        with RTI_READ_LOCK: # Keeps the read from starting until the file is closed.
+            loader.load(key, lambda: reads.append(key) or createAwm(10))
+            invalidateSliceCaches('f.h5') # Called by the close hook when the file is closed.
+        loader._threadPool.waitForDone()
+        app.processEvents()
+        self.assertFalse(loader.isBusy)
+        self.assertEqual(reads, [])
+        self.assertEqual(loaded, [])
+
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+
+    def test_capacity(self):
+        """ The oldest frame is dropped when the buffer is full, taken frames are removed
+        """
+        buffer = FrameRingBuffer(capacity=3)
+        for idx in range(4):
+            buffer.put(('f.h5', '/f.h5/var', (idx, ), (0, )), createAwm(1000))
+
+        self.assertEqual(len(buffer), 3)
+        self.assertNotIn(('f.h5', '/f.h5/var', (0, ), (0, )), buffer)
+        self.assertIsNotNone(buffer.take(('f.h5', '/f.h5/var', (1, ), (0, ))))
+        self.assertIsNone(buffer.take(('f.h5', '/f.h5/var', (1, ), (0, ))))
+        self.assertEqual(len(buffer), 2)
+
+        invalidateSliceCaches('f.h5')
+        self.assertEqual(len(buffer), 0)
+
+
+
+class TestDecimation(unittest.TestCase):
+
+    def test_decimatedSlices(self):
+        """ The step is chosen so that the result is at most the target size
+        """
+        slices = decimatedSlices((40000, 1000), (800, 2000))
+        self.assertEqual(slices, [slice(0, 40000, 50), slice(0, 1000, 1)])
+        self.assertEqual(len(np.zeros(40000)[slices[0]]), 800)
+
+        slices = decimatedSlices((40000, 1000), (800, 2000), [slice(1000, 3000), None])
+        self.assertEqual(slices, [slice(1000, 3000, 3), slice(0, 1000, 1)])
+
+
+    def test_slicesCover(self):
+        """ A region must be read again if it is outside the loaded region or needs more detail
+        """
+        overview = decimatedSlices((40000, 40000), (800, 800))
+        zoomed = decimatedSlices((40000, 40000), (800, 800), [slice(0, 4000), slice(0, 4000)])
+        self.assertFalse(slicesCover(overview, zoomed))
+        self.assertTrue(slicesCover(zoomed, zoomed))
+        self.assertFalse(slicesCover(zoomed, overview))
+
+
+    def test_subRange(self):
+        """ Decimation and intersection stay within the sub range and on its step
+        """
+        region = [slice(100, 1100, 2)]
+        self.assertEqual(decimatedSlices((40000, ), (1000, ), region), [slice(100, 1100, 2)])
+        self.assertEqual(decimatedSlices((40000, ), (100, ), region), [slice(100, 1100, 10)])
+
+        visible = [slice(0, 500, 1)]
+        self.assertEqual(intersectSlices(visible, region), [slice(100, 500, 2)])
+        visible = [slice(201, 300, 1)]
+        self.assertEqual(intersectSlices(visible, region), [slice(200, 300, 2)])
+        visible = [slice(2000, 3000, 1)]
+        self.assertEqual(intersectSlices(visible, region), region)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,9 +9,12 @@ import unittest
 from json import loads
 
 from argos import configBasicLogging
-from argos.utils.cls import is_a_string, is_text, is_binary
+from argos.utils.cls import is_a_string, is_text, is_binary, to_string, format_numbers
+from argos.utils.masks import (ArrayWithMask, PackedMask, replaceMaskedValueWithFloat,
+                               replaceMaskedAndInfWithNan, maskedEqual)
 from argos.utils.misc import python2
 import numpy as np
+import numpy.ma as ma
 
 
 class TestStringTypeDetection(unittest.TestCase):
@@ -107,6 +110,136 @@ class TestStringTypeDetection(unittest.TestCase):
         pass
 
 
+
+class TestFormatNumbers(unittest.TestCase):
+
+    def test_sameAsToString(self):
+        """ The numbers are formatted the same as with to_string
+        """
+        ints = np.array([[-3, 0, 7], [1000, 65, 12]], dtype=np.int32)
+        for fmt in ['{}', '{:d}', '{:#x}', '{!r}', '{:8d}', '{:_>10}', 'int: {}']:
+            self.assertEqual(format_numbers(ints, fmt),
+                             [to_string(value, intFormat=fmt) for value in ints.flat])
+
+        doubles = np.array([1.5, np.nan, 1e20, -0.1])
+        for fmt in ['{}', '{:f}', '{:g}', '{:%}', '{!r}', '{:8.3e}', '{:#8.4g}']:
+            self.assertEqual(format_numbers(doubles, fmt),
+                             [to_string(value, numFormat=fmt) for value in doubles.flat])
+
+        self.assertRaises(TypeError, format_numbers, doubles.astype(np.float32), '{}')
+        self.assertRaises(TypeError, format_numbers, np.array(['a', 'b']), '{}')
+
+
+
+class TestArrayWithMask(unittest.TestCase):
+
+    def setUp(self):
+        self.awm = ArrayWithMask(np.arange(6.0).reshape(2, 3),
+                                 np.array([[False, True, False], [False, False, False]]), None)
+
+
+    def test_asReadOnly(self):
+        """ The read-only view shares the memory but cannot be modified.
+        """
+        readOnly = self.awm.asReadOnly()
+        self.assertTrue(np.may_share_memory(readOnly.data, self.awm.data))
+        self.assertFalse(readOnly.data.flags.writeable)
+        self.assertFalse(readOnly.mask.flags.writeable)
+        self.assertTrue(self.awm.data.flags.writeable)
+
+        with self.assertRaises(ValueError):
+            readOnly.data[0, 0] = 1.0
+
+
+    def test_replaceReadOnly(self):
+        """ Replacing masked values of a read-only array makes a copy only when needed.
+        """
+        readOnly = self.awm.asReadOnly()
+        result = replaceMaskedValueWithFloat(readOnly.data, readOnly.mask, np.nan)
+        self.assertTrue(np.isnan(result[0, 1]))
+        self.assertEqual(self.awm.data[0, 1], 1.0)
+
+        row = readOnly.data[1, :]
+        self.assertIs(replaceMaskedValueWithFloat(row, np.isinf(row), np.nan), row)
+
+
+    def test_replaceMaskedAndInfWithNan(self):
+        """ Integers are converted to float32 and masked values become NaN in the reused buffer.
+        """
+        data = np.arange(6, dtype=np.uint16).reshape(2, 3)
+        result = replaceMaskedAndInfWithNan(data, self.awm.mask)
+        self.assertEqual(result.dtype, np.float32)
+        self.assertTrue(np.isnan(result[0, 1]))
+        self.assertEqual(np.count_nonzero(np.isnan(result)), 1)
+
+        reused = replaceMaskedAndInfWithNan(data, False, out=result)
+        self.assertIs(reused, result)
+        np.testing.assert_array_equal(reused, data)
+
+        floats = np.array([1.0, np.inf, -np.inf], dtype=np.float32)
+        self.assertEqual(np.count_nonzero(np.isnan(replaceMaskedAndInfWithNan(floats, False))), 2)
+        self.assertTrue(np.isinf(floats[1])) # The data is not modified
+
+        finite = floats[:1] # No copy is needed
+        self.assertIs(replaceMaskedAndInfWithNan(finite, False), finite)
+
+        # Finite float64 values above the float32 maximum must not become inf after the cast.
+        large = np.array([[1.0, 1e39], [np.inf, 2.0]])
+        result = replaceMaskedAndInfWithNan(large, False)
+        self.assertFalse(np.any(np.isinf(result)))
+        np.testing.assert_array_equal(np.isnan(result), [[False, True], [True, False]])
+
+
+    def test_noMask(self):
+        """ A mask is only stored if elements are actually masked.
+        """
+        data = self.awm.data
+        for missingValue in (None, -1.0):
+            maskedArray = maskedEqual(data, missingValue)
+            self.assertIs(maskedArray.mask, ma.nomask)
+            awm = ArrayWithMask.createFromMaskedArray(maskedArray)
+            self.assertFalse(awm.hasMask)
+            self.assertIs(awm.transpose().mask, False)
+
+        awm = ArrayWithMask.createFromMaskedArray(maskedEqual(data, 1.0))
+        self.assertTrue(awm.hasMask)
+        np.testing.assert_array_equal(awm.mask, self.awm.mask)
+
+
+    def test_structuredMask(self):
+        """ The mask of structured arrays (e.g. compound HDF5 datasets) has a field per field.
+        """
+        data = np.array([(1, 2.0), (-1, 3.0)], dtype=[('a', np.int32), ('b', np.float64)])
+        for missingValue, masked in ((None, False), (-1, True)):
+            maskedArray = maskedEqual(data, missingValue)
+            awm = ArrayWithMask.createFromMaskedArray(maskedArray)
+            self.assertEqual(awm.mask.dtype.names, ('a', 'b'))
+            self.assertEqual(bool(awm.mask['a'][1]), masked)
+            self.assertFalse(np.any(awm.mask['b']))
+
+
+    def test_packedMask(self):
+        """ Rows, columns and elements of a packed (and transposed) mask are unpacked separately.
+        """
+        mask = np.random.RandomState(0).rand(5, 19) > 0.5
+        packed = PackedMask.fromArray(mask)
+        self.assertEqual(packed.nbytes, 5 * 3)
+        np.testing.assert_array_equal(packed.unpack(), mask)
+
+        transposed = packed.transpose()
+        self.assertEqual(transposed.shape, (19, 5))
+        for index in [(3, slice(None)), (slice(None), 2), (slice(2, 17, 3), slice(1, None))]:
+            np.testing.assert_array_equal(transposed[index], mask.T[index])
+        self.assertEqual(transposed[18, 4], mask[4, 18])
+
+        awm = ArrayWithMask(np.zeros(mask.shape), mask, None)
+        awm.packMask()
+        self.assertIsInstance(awm.mask, PackedMask)
+        np.testing.assert_array_equal(awm.transpose().maskIndex(), mask.T)
+        np.testing.assert_array_equal(awm.maskAt((1, slice(None))), mask[1, :])
+
+
+
 if __name__ == '__main__':
     configBasicLogging(level='DEBUG')
     unittest.main()